@@ -0,0 +1,239 @@
+"""Benchmark the minimap caching and layout code on synthetic node trees.
+
+Run from Blender with:
+    blender file_with_a_node_editor.blend --python benchmarks/run_benchmarks.py -- --output results.json
+
+Or from plain python, using the stand-in bpy module in benchmarks/standin:
+    python benchmarks/run_benchmarks.py --output results.json
+
+The results are written as JSON, and can be compared to a previous run with --compare to check for regressions.
+See benchmarks/README.md for more details."""
+import sys
+import json
+import platform
+import argparse
+import importlib
+from pathlib import Path
+from datetime import datetime
+from statistics import mean, median
+from time import perf_counter
+
+BENCHMARK_DIR = Path(__file__).parent
+ADDON_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+try:
+    import bpy
+except ImportError:
+    # Not running in Blender, so use the stand-in modules instead
+    sys.path.insert(0, str(BENCHMARK_DIR / "standin"))
+    import bpy
+import synthetic_trees  # noqa
+
+DEFAULT_SIZES = [100, 1000, 5000, 20000]
+
+
+def parse_args():
+    # Blender passes its own arguments, so only look at the ones after "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="The node counts to test")
+    parser.add_argument(
+        "--trees",
+        nargs="+",
+        default=list(synthetic_trees.TREE_TYPES.keys()),
+        choices=list(synthetic_trees.TREE_TYPES.keys()),
+        help="The types of synthetic tree to test",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="How many times to run each case")
+    parser.add_argument("--output", default="benchmark_results.json", help="The file to write the results to")
+    parser.add_argument("--compare", default="", help="A previous results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The fraction slower than the previous results that counts as a regression",
+    )
+    return parser.parse_args(argv)
+
+
+def enable_addon():
+    """Import and register the addon, and return the package"""
+    sys.path.insert(0, str(ADDON_DIR.parent))
+    import addon_utils
+    addon_utils.enable(ADDON_DIR.name, default_set=True)
+    return importlib.import_module(ADDON_DIR.name)
+
+
+def find_node_editor_area():
+    screen = bpy.context.screen
+    if not screen:
+        return None
+    for area in screen.areas:
+        if area.type == "NODE_EDITOR":
+            return area
+    return None
+
+
+def time_case(func, repeats, setup=None):
+    """Run func repeats times, and return the timings in milliseconds.
+    setup is called before each run, and is not included in the timings."""
+    times = []
+    for i in range(repeats):
+        if setup:
+            setup(i)
+        start = perf_counter()
+        func()
+        times.append((perf_counter() - start) * 1000)
+    return {"min_ms": min(times), "median_ms": median(times), "mean_ms": mean(times), "repeats": repeats}
+
+
+def run_tree_cases(addon, tree, area, repeats):
+    """Run all of the benchmark cases for a single tree"""
+    functions = importlib.import_module(addon.__name__ + ".shared.functions")
+    shader_cache = importlib.import_module(addon.__name__ + ".node_minimap.shader_cache")
+    minimap_functions = importlib.import_module(addon.__name__ + ".node_minimap.minimap_functions")
+    layout = importlib.import_module(addon.__name__ + ".node_minimap.layout")
+
+    context = bpy.context
+    results = {}
+    results["get_node_area"] = time_case(lambda: functions.get_node_area(tree), repeats)
+    results["read_node_records"] = time_case(lambda: minimap_functions.get_node_records(tree), repeats)
+    records = minimap_functions.get_node_records(tree)
+    results["build_layout"] = time_case(
+        lambda: layout.build_layout(records, 1600, 900, layout.LayoutPrefs()),
+        repeats,
+    )
+
+    if not area:
+        return results
+    area.spaces[0].node_tree = tree
+
+    caches = []
+    results["area_cache_init"] = time_case(
+        lambda: caches.append(shader_cache.AreaCache(context, area)),
+        repeats,
+    )
+    area_cache = caches[-1]
+    def first_update():
+        # the first update creates all of the node caches, which for big trees is spread over several redraws
+        area_cache.update(context, tree)
+        area_cache.build()
+
+    results["area_cache_first_update"] = time_case(first_update, 1)
+    results["tree_fingerprint"] = time_case(lambda: minimap_functions.get_tree_fingerprint(tree), repeats)
+    results["update_idle"] = time_case(lambda: area_cache.update(context, tree), repeats)
+
+    nodes = list(tree.nodes)
+    results["update_move_one"] = time_case(
+        lambda: area_cache.update(context, tree),
+        repeats,
+        setup=lambda i: synthetic_trees.move_nodes(nodes[len(nodes) // 2:len(nodes) // 2 + 1], 10),
+    )
+    results["update_move_all"] = time_case(
+        lambda: area_cache.update(context, tree),
+        repeats,
+        setup=lambda i: synthetic_trees.move_nodes(nodes, 10),
+    )
+    moved = nodes[len(nodes) // 2]
+
+    def relayout_move_one():
+        # The same as moving a node, without finding out which nodes have moved
+        node_cache = area_cache.node_lookup.get(moved.name)
+        if node_cache:
+            area_cache.relayout_moved(context, [node_cache])
+
+    results["relayout_move_one"] = time_case(
+        relayout_move_one,
+        repeats,
+        setup=lambda i: synthetic_trees.move_nodes([moved], 10),
+    )
+    area_cache.update(context, tree)
+    results["update_recolor_all"] = time_case(
+        lambda: area_cache.update(context, tree),
+        repeats,
+        setup=lambda i: synthetic_trees.recolor_nodes(nodes, (i / repeats, 0.5, 0.5)),
+    )
+
+    results["update_links"] = time_case(lambda: area_cache.update_links(context, tree), repeats)
+    results["search_query"] = time_case(lambda: area_cache.search_index.query("math"), repeats)
+
+    def zoom_cull():
+        # Zoom into the middle of the tree, and cull everything outside of the window, without anything being cached
+        area_cache.set_zoom(16, area_cache.node_area.center)
+        area_cache.zoom_key = None
+        area_cache.update_zoom()
+
+    results["zoom_cull"] = time_case(zoom_cull, repeats)
+    area_cache.set_zoom(1, None)
+    area_cache.update_zoom()
+
+    def layout_labels():
+        for node_cache in area_cache.all_nodes:
+            node_cache.draw_label()
+
+    results["label_layout"] = time_case(layout_labels, repeats)
+    return results
+
+
+def run(args):
+    addon = enable_addon()
+    area = find_node_editor_area()
+    if not area:
+        print("No node editor area found, only running cases that don't need one")
+
+    results = {}
+    for tree_type in args.trees:
+        for size in args.sizes:
+            tree = synthetic_trees.TREE_TYPES[tree_type](size)
+            print(f"Running {tree_type} ({size} nodes)")
+            for case, timings in run_tree_cases(addon, tree, area, args.repeats).items():
+                results[f"{tree_type}/{size}/{case}"] = timings
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "blender": bpy.app.version_string,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(results, previous, threshold):
+    """Print the change in median time for every case in both result sets, and return the names of regressions"""
+    regressions = []
+    for name, timings in results["results"].items():
+        prev = previous["results"].get(name)
+        if not prev:
+            continue
+        ratio = timings["median_ms"] / max(prev["median_ms"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  <- regression"
+        print(f"{name}: {' ' * (45 - len(name))}{prev['median_ms']:10.3f} -> {timings['median_ms']:10.3f} ms "
+              f"({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions found")
+            sys.exit(1)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
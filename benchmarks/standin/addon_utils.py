@@ -0,0 +1,15 @@
+"""Stand-in for Blender's addon_utils, only supporting enabling and disabling addons"""
+import sys
+import importlib
+
+
+def enable(module_name, default_set=False, persistent=False, handle_error=None):
+    mod = importlib.import_module(module_name)
+    mod.register()
+    return mod
+
+
+def disable(module_name, default_set=False, handle_error=None):
+    mod = sys.modules.get(module_name)
+    if mod:
+        mod.unregister()
@@ -0,0 +1,30 @@
+"""A stand-in for the blf module. Text dimensions are approximated from the font size,
+and every draw is appended to blf.log"""
+
+log = []
+_state = {"size": 11, "position": (0, 0, 0), "color": (1, 1, 1, 1)}
+
+
+def reset():
+    log.clear()
+
+
+def size(fontid, size, dpi=72):
+    _state["size"] = size * dpi / 72
+
+
+def color(fontid, r, g, b, a):
+    _state["color"] = (r, g, b, a)
+
+
+def position(fontid, x, y, z):
+    _state["position"] = (x, y, z)
+
+
+def dimensions(fontid, text):
+    size = _state["size"]
+    return (len(text) * size * 0.5, size if text else 0)
+
+
+def draw(fontid, text):
+    log.append(("text", text, _state["position"], _state["size"]))
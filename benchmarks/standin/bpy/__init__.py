@@ -0,0 +1,227 @@
+"""A lightweight stand-in for Blender's bpy module, so that the addon can be imported and driven from plain CPython.
+bpy.data and bpy.context only implement what the addon uses, with a single window containing one node editor."""
+from contextlib import contextmanager
+from types import SimpleNamespace
+from . import types, props, app, utils, ops, path  # noqa
+
+# Data
+#################################################
+
+
+class _IDCollection():
+    """The collections in bpy.data, such as bpy.data.node_groups"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = {}
+
+    def new(self, name, *args):
+        base = name
+        i = 0
+        while name in self._items:
+            i += 1
+            name = f"{base}.{i:03d}"
+        item = self._factory(name, *args)
+        self._items[name] = item
+        return item
+
+    def remove(self, item):
+        del self._items[item.name]
+
+    def clear(self):
+        self._items.clear()
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def keys(self):
+        return self._items.keys()
+
+    def values(self):
+        return self._items.values()
+
+    def items(self):
+        return self._items.items()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self._items.values())[key]
+        return self._items[key]
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+
+class BlendData():
+
+    def __init__(self):
+        self.node_groups = _IDCollection(types.NodeTree)
+        self.materials = _IDCollection(types.Material)
+        self.worlds = _IDCollection(types.World)
+        self.scenes = _IDCollection(types.Scene)
+        self.filepath = ""
+
+    def clear(self):
+        for collection in (self.node_groups, self.materials, self.worlds, self.scenes):
+            collection.clear()
+        self.scenes.new("Scene")
+
+
+data = BlendData()
+
+# Preferences
+#################################################
+
+
+class _Addons():
+
+    def __init__(self):
+        self._addons = {}
+
+    def _add(self, name, preferences):
+        self._addons[name] = SimpleNamespace(module=name, preferences=preferences)
+
+    def _remove(self, name):
+        self._addons.pop(name, None)
+
+    def get(self, name, default=None):
+        return self._addons.get(name, default)
+
+    def keys(self):
+        return self._addons.keys()
+
+    def __getitem__(self, name):
+        return self._addons[name]
+
+    def __contains__(self, name):
+        return name in self._addons
+
+
+def _theme():
+    node_editor = SimpleNamespace(
+        grid=(0.11, 0.11, 0.11),
+        node_backdrop=(0.2, 0.2, 0.2, 0.94),
+        node_active=(1.0, 1.0, 1.0),
+        node_selected=(0.93, 0.55, 0.12),
+        wire=(0.1, 0.1, 0.1),
+        wire_select=(1.0, 1.0, 1.0),
+        converter_node=(0.25, 0.5, 0.6),
+        geometry_node=(0.0, 0.41, 0.33),
+        vector_node=(0.39, 0.39, 0.78),
+        shader_node=(0.39, 0.78, 0.39),
+        texture_node=(0.9, 0.4, 0.25),
+        color_node=(0.78, 0.78, 0.16),
+        attribute_node=(0.19, 0.11, 0.37),
+        input_node=(0.9, 0.2, 0.2),
+        output_node=(0.4, 0.0, 0.0),
+        group_socket_node=(0.24, 0.24, 0.24),
+        group_node=(0.23, 0.4, 0.16),
+        frame_node=(0.16, 0.16, 0.16, 0.5),
+        filter_node=(0.38, 0.16, 0.54),
+        matte_node=(0.59, 0.25, 0.25),
+        distor_node=(0.29, 0.45, 0.45),
+        script_node=(0.03, 0.21, 0.21),
+        layout_node=(0.42, 0.42, 0.42),
+    )
+    user_interface = SimpleNamespace(wcol_text=SimpleNamespace(text=(0.9, 0.9, 0.9)))
+    return SimpleNamespace(node_editor=node_editor, user_interface=user_interface)
+
+
+class Preferences():
+
+    def __init__(self):
+        self.addons = _Addons()
+        self.themes = [_theme()]
+        self.system = SimpleNamespace(dpi=72, pixel_size=1.0, ui_scale=1.0)
+        self.view = SimpleNamespace(smooth_view=0)
+        self.edit = SimpleNamespace(undo_steps=32)
+
+
+# Context
+#################################################
+
+
+class Context(types.Context):
+    """bpy.context. Unlike in Blender, the attributes can be set, which is how temp_override works"""
+
+    def __init__(self):
+        self.preferences = Preferences()
+        self.window_manager = types.WindowManager()
+        self.window = types.Window()
+        self.window_manager.windows.append(self.window)
+        self.area = None
+        self.region = None
+        self.space_data = None
+        self.scene = None
+        self.blend_data = data
+
+    @property
+    def screen(self):
+        return self.window.screen if self.window else None
+
+    @property
+    def active_node(self):
+        space = self.space_data
+        tree = getattr(space, "edit_tree", None)
+        return tree.nodes.active if tree else None
+
+    @property
+    def selected_nodes(self):
+        space = self.space_data
+        tree = getattr(space, "edit_tree", None)
+        return [n for n in tree.nodes if n.select] if tree else []
+
+    @contextmanager
+    def temp_override(self, **kwargs):
+        if "space" in kwargs:
+            kwargs["space_data"] = kwargs.pop("space")
+        if "window" in kwargs and "screen" in kwargs:
+            kwargs.pop("screen")
+        previous = {name: getattr(self, name) for name in kwargs}
+        try:
+            for name, value in kwargs.items():
+                setattr(self, name, value)
+            yield self
+        finally:
+            for name, value in previous.items():
+                setattr(self, name, value)
+
+    def copy(self):
+        return {
+            "area": self.area,
+            "region": self.region,
+            "space_data": self.space_data,
+            "window": self.window,
+            "screen": self.screen,
+        }
+
+
+context = Context()
+
+
+def reset():
+    """Clear all data, handlers and registered classes, and create a single window with one node editor area"""
+    data.clear()
+    context.scene = data.scenes["Scene"]
+    context.window_manager = types.WindowManager()
+    context.window = types.Window()
+    context.window_manager.windows.append(context.window)
+    context.window.screen.areas.append(types.Area("NODE_EDITOR"))
+    context.area = None
+    context.region = None
+    context.space_data = None
+    types.SpaceNodeEditor._draw_handlers.clear()
+    app.timers.clear()
+    for handlers in vars(app.handlers).values():
+        if isinstance(handlers, list):
+            handlers.clear()
+    ops.clear()
+
+
+reset()
@@ -0,0 +1,28 @@
+"""Stand-in for bpy.app"""
+from types import SimpleNamespace
+from . import timers  # noqa
+
+version = (3, 6, 0)
+version_string = "3.6.0 (stand-in)"
+background = False
+binary_path = ""
+
+
+def _persistent(func):
+    func._bpy_persistent = True
+    return func
+
+
+handlers = SimpleNamespace(
+    persistent=_persistent,
+    load_pre=[],
+    load_post=[],
+    save_pre=[],
+    save_post=[],
+    undo_pre=[],
+    undo_post=[],
+    redo_pre=[],
+    redo_post=[],
+    depsgraph_update_pre=[],
+    depsgraph_update_post=[],
+)
@@ -0,0 +1,91 @@
+"""Stand-in for bpy.ops. Every call is appended to bpy.ops.log.
+Registered operators are run, and the few builtin operators that the addon uses to move the view are emulated."""
+log = []
+_operators = {}
+
+
+def _register_operator(cls):
+    _operators[cls.bl_idname] = cls
+
+
+def _unregister_operator(cls):
+    _operators.pop(cls.bl_idname, None)
+
+
+def _view_all(context, **kwargs):
+    region = context.region
+    tree = context.space_data.edit_tree if context.space_data else None
+    if not region or not tree or not len(tree.nodes):
+        return
+    xs = [n.location.x for n in tree.nodes]
+    ys = [n.location.y for n in tree.nodes]
+    region.view2d.fit(min(xs), min(ys) - 200, max(xs) + 200, max(ys))
+
+
+def _pan(context, deltax=0, deltay=0):
+    context.region.view2d.pan(deltax, deltay)
+
+
+def _zoom_border(context, xmin=0, xmax=0, ymin=0, ymax=0, wait_for_input=True, zoom_out=False):
+    view2d = context.region.view2d
+    vmin = view2d.region_to_view(min(xmin, xmax), min(ymin, ymax))
+    vmax = view2d.region_to_view(max(xmin, xmax), max(ymin, ymax))
+    view2d.fit(vmin[0], vmin[1], vmax[0], vmax[1])
+
+
+BUILTIN = {
+    "node.view_all": _view_all,
+    "view2d.pan": _pan,
+    "view2d.zoom_border": _zoom_border,
+}
+
+
+class _Operator():
+
+    def __init__(self, idname):
+        self.idname = idname
+
+    def poll(self):
+        return True
+
+    def __call__(self, *args, **kwargs):
+        from . import context, types
+        exec_context = args[0] if args else "EXEC_DEFAULT"
+        log.append((self.idname, exec_context, kwargs))
+
+        builtin = BUILTIN.get(self.idname)
+        if builtin:
+            builtin(context, **kwargs)
+            return {'FINISHED'}
+
+        cls = _operators.get(self.idname)
+        if not cls:
+            return {'FINISHED'}
+
+        op = cls()
+        op._init_properties(**kwargs)
+        if exec_context.startswith("INVOKE") and hasattr(op, "invoke"):
+            return op.invoke(context, types.Event())
+        if hasattr(op, "execute"):
+            return op.execute(context)
+        return {'FINISHED'}
+
+
+class _Category():
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, name):
+        return _Operator(f"{self.name}.{name}")
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return _Category(name)
+
+
+def clear():
+    log.clear()
+
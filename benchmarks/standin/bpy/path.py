@@ -0,0 +1,13 @@
+"""The parts of bpy.path that the addon uses"""
+import os
+
+
+def ensure_ext(filepath, ext, case_sensitive=False):
+    root, current = os.path.splitext(filepath)
+    if (current if case_sensitive else current.lower()) == (ext if case_sensitive else ext.lower()):
+        return filepath
+    return filepath + ext
+
+
+def abspath(path, start=None, library=None):
+    return os.path.abspath(path[2:] if path.startswith("//") else path)
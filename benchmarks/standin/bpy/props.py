@@ -0,0 +1,73 @@
+"""Stand-in for bpy.props. Each property function returns a _PropertyDeferred, like in Blender 2.93+"""
+
+
+class _PropertyDeferred():
+
+    def __init__(self, function, keywords):
+        self.function = function
+        self.keywords = keywords
+
+    def __repr__(self):
+        return f"<_PropertyDeferred, {self.function.__name__}, {self.keywords}>"
+
+    # Properties can also be added to existing types by assigning them to the class,
+    # e.g. bpy.types.WindowManager.my_prop = StringProperty(), in which case they act as descriptors
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        values = instance.__dict__.setdefault("_dynamic_properties", {})
+        if id(self) not in values:
+            values[id(self)] = self.default_value()
+        return values[id(self)]
+
+    def __set__(self, instance, value):
+        instance.__dict__.setdefault("_dynamic_properties", {})[id(self)] = value
+        update = self.keywords.get("update")
+        if update:
+            from . import context
+            update(instance, context)
+
+    def default_value(self):
+        keywords = self.keywords
+        name = self.function.__name__
+        if "default" in keywords:
+            default = keywords["default"]
+            if isinstance(default, (list, tuple)):
+                return list(default)
+            return default
+        if name == "EnumProperty":
+            items = keywords.get("items", ())
+            return items[0][0] if items and not callable(items) else ""
+        size = keywords.get("size", 3)
+        defaults = {
+            "BoolProperty": False,
+            "IntProperty": 0,
+            "FloatProperty": 0.0,
+            "StringProperty": "",
+            "BoolVectorProperty": [False] * size,
+            "IntVectorProperty": [0] * size,
+            "FloatVectorProperty": [0.0] * size,
+        }
+        return defaults.get(name)
+
+
+def _make_property(name):
+
+    def prop(**keywords):
+        return _PropertyDeferred(prop, keywords)
+
+    prop.__name__ = name
+    return prop
+
+
+BoolProperty = _make_property("BoolProperty")
+BoolVectorProperty = _make_property("BoolVectorProperty")
+IntProperty = _make_property("IntProperty")
+IntVectorProperty = _make_property("IntVectorProperty")
+FloatProperty = _make_property("FloatProperty")
+FloatVectorProperty = _make_property("FloatVectorProperty")
+StringProperty = _make_property("StringProperty")
+EnumProperty = _make_property("EnumProperty")
+PointerProperty = _make_property("PointerProperty")
+CollectionProperty = _make_property("CollectionProperty")
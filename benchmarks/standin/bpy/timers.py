@@ -0,0 +1,39 @@
+"""Stand-in for bpy.app.timers. Timers only run when run_timers is called,
+with a fake clock that moves forward by the given amount"""
+
+_timers = {}
+_clock = [0.0]
+
+
+def register(function, first_interval=0, persistent=False):
+    _timers[function] = _clock[0] + first_interval
+
+
+def unregister(function):
+    if function not in _timers:
+        raise ValueError("Error: function is not registered")
+    del _timers[function]
+
+
+def is_registered(function):
+    return function in _timers
+
+
+def run_timers(elapsed=1 / 60):
+    """Move the clock forward, and run every timer that is due. Returns the number of timers run"""
+    _clock[0] += elapsed
+    ran = 0
+    for function, due in list(_timers.items()):
+        if due > _clock[0] or function not in _timers:
+            continue
+        ran += 1
+        interval = function()
+        if interval is None:
+            _timers.pop(function, None)
+        else:
+            _timers[function] = _clock[0] + interval
+    return ran
+
+
+def clear():
+    _timers.clear()
@@ -0,0 +1,853 @@
+"""Stand-in versions of the bpy types used by the addon.
+The registrable base classes (Operator, Panel etc.) are empty apart from property handling,
+and the data types (NodeTree, Node, Area etc.) are plain python objects that behave like their RNA equivalents."""
+from mathutils import Vector, Color
+
+# Registrable types
+#################################################
+
+
+class bpy_struct():
+
+    def as_pointer(self):
+        return id(self)
+
+
+class _PropertyOwner(bpy_struct):
+    """Gives classes that can have bpy.props annotations default values, and runs their update callbacks"""
+
+    _property_cache = {}
+
+    @classmethod
+    def _bpy_properties(cls):
+        props = _PropertyOwner._property_cache.get(cls)
+        if props is not None:
+            return props
+        from .props import _PropertyDeferred
+        props = {}
+        for base in reversed(cls.__mro__):
+            for name, value in base.__dict__.get("__annotations__", {}).items():
+                if isinstance(value, _PropertyDeferred):
+                    props[name] = value
+        _PropertyOwner._property_cache[cls] = props
+        return props
+
+    def _init_properties(self, **values):
+        for name, prop in self._bpy_properties().items():
+            object.__setattr__(self, name, values.get(name, prop.default_value()))
+
+    def __getattr__(self, name):
+        # Properties are set lazily, so that instances created without _init_properties still work
+        prop = type(self)._bpy_properties().get(name)
+        if prop is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = prop.default_value()
+        object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        prop = type(self)._bpy_properties().get(name)
+        if prop is not None and prop.keywords.get("update"):
+            from . import context
+            prop.keywords["update"](self, context)
+
+
+class Operator(_PropertyOwner):
+    bl_idname = ""
+    bl_label = ""
+    bl_options = set()
+
+    def report(self, type, message):
+        print(f"{', '.join(type)}: {message}")
+
+
+class Macro(Operator):
+    pass
+
+
+class PropertyGroup(_PropertyOwner):
+    pass
+
+
+class AddonPreferences(_PropertyOwner):
+    bl_idname = ""
+
+
+class Panel(bpy_struct):
+    pass
+
+
+class Header(bpy_struct):
+    pass
+
+
+class Menu(bpy_struct):
+    pass
+
+
+class UIList(bpy_struct):
+    pass
+
+
+class RenderEngine(bpy_struct):
+    pass
+
+
+class Gizmo(bpy_struct):
+    pass
+
+
+class GizmoGroup(bpy_struct):
+    pass
+
+
+class NodeSocket(bpy_struct):
+    pass
+
+
+class UILayout(bpy_struct):
+    pass
+
+
+class KeyMapItem(bpy_struct):
+    pass
+
+
+class _Appendable():
+    """Classes like NODE_HT_header, that draw functions can be appended to"""
+    _draw_funcs = []
+
+    @classmethod
+    def append(cls, func):
+        cls._draw_funcs.append(func)
+
+    @classmethod
+    def prepend(cls, func):
+        cls._draw_funcs.insert(0, func)
+
+    @classmethod
+    def remove(cls, func):
+        cls._draw_funcs.remove(func)
+
+
+class NODE_HT_header(Header, _Appendable):
+    _draw_funcs = []
+
+
+class NODE_MT_editor_menus(Menu, _Appendable):
+    _draw_funcs = []
+
+
+# Screen types
+#################################################
+
+
+class View2D(bpy_struct):
+    """The 2D view of a region. cur is the visible rectangle in view space as [xmin, ymin, xmax, ymax]"""
+
+    def __init__(self, region):
+        self.region = region
+        self.cur = [0.0, 0.0, float(region.width), float(region.height)]
+
+    def region_to_view(self, x, y):
+        xmin, ymin, xmax, ymax = self.cur
+        region = self.region
+        return (
+            xmin + x / max(region.width, 1) * (xmax - xmin),
+            ymin + y / max(region.height, 1) * (ymax - ymin),
+        )
+
+    def view_to_region(self, x, y, clip=True):
+        xmin, ymin, xmax, ymax = self.cur
+        region = self.region
+        rx = (x - xmin) / (xmax - xmin) * region.width
+        ry = (y - ymin) / (ymax - ymin) * region.height
+        if clip and not (0 <= rx <= region.width and 0 <= ry <= region.height):
+            # This is what Blender returns for clipped coordinates
+            return (12000, 12000)
+        return (int(rx), int(ry))
+
+    def pan(self, deltax, deltay):
+        xmin, ymin, xmax, ymax = self.cur
+        region = self.region
+        dx = deltax * (xmax - xmin) / max(region.width, 1)
+        dy = deltay * (ymax - ymin) / max(region.height, 1)
+        self.cur = [xmin + dx, ymin + dy, xmax + dx, ymax + dy]
+
+    def fit(self, xmin, ymin, xmax, ymax):
+        """Show the given view space rectangle, keeping the aspect ratio of the region"""
+        region = self.region
+        aspect = region.width / max(region.height, 1)
+        width = max(xmax - xmin, 1e-6)
+        height = max(ymax - ymin, 1e-6)
+        if width / height > aspect:
+            height = width / aspect
+        else:
+            width = height * aspect
+        cx = (xmin + xmax) / 2
+        cy = (ymin + ymax) / 2
+        self.cur = [cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2]
+
+
+class Region(bpy_struct):
+
+    def __init__(self, type="WINDOW", width=0, height=0, x=0, y=0):
+        self.type = type
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.view2d = View2D(self)
+        self.redraw_count = 0
+
+    def tag_redraw(self):
+        self.redraw_count += 1
+
+
+class SpaceNodeOverlay(bpy_struct):
+
+    def __init__(self):
+        self.show_context_path = True
+        self.show_overlays = True
+
+
+class SpaceNodeEditorPath(bpy_struct):
+    """The breadcrumbs of the node editor. Each element has a node_tree attribute"""
+
+    class PathElement():
+
+        def __init__(self, node_tree):
+            self.node_tree = node_tree
+            self.name = node_tree.name if node_tree else ""
+
+    def __init__(self):
+        self._elements = []
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __iter__(self):
+        return iter(self._elements)
+
+    def __getitem__(self, i):
+        return self._elements[i]
+
+    def start(self, node_tree):
+        self._elements = [self.PathElement(node_tree)] if node_tree else []
+
+    def append(self, node_tree, node=None):
+        self._elements.append(self.PathElement(node_tree))
+
+    def pop(self):
+        if len(self._elements) > 1:
+            self._elements.pop()
+
+    def clear(self):
+        self._elements.clear()
+
+    def to_string(self):
+        return "/".join(e.name for e in self._elements)
+
+
+class SpaceNodeEditor(bpy_struct):
+    """Both the space data of node editor areas, and the class that draw handlers are added to"""
+
+    _draw_handlers = []
+
+    def __init__(self, node_tree=None):
+        self.type = "NODE_EDITOR"
+        self.overlay = SpaceNodeOverlay()
+        self.path = SpaceNodeEditorPath()
+        self.tree_type = "GeometryNodeTree"
+        self.node_tree = node_tree
+
+    @property
+    def node_tree(self):
+        return self._node_tree
+
+    @node_tree.setter
+    def node_tree(self, tree):
+        self._node_tree = tree
+        self.path.start(tree)
+        if tree:
+            self.tree_type = tree.bl_idname
+
+    @property
+    def edit_tree(self):
+        if len(self.path):
+            return self.path[-1].node_tree
+        return self._node_tree
+
+    @classmethod
+    def draw_handler_add(cls, callback, args, region_type, draw_type):
+        handler = (callback, tuple(args), region_type, draw_type)
+        # Wrap in a list so that identical handlers are still distinct objects
+        handle = [handler]
+        cls._draw_handlers.append(handle)
+        return handle
+
+    @classmethod
+    def draw_handler_remove(cls, handle, region_type):
+        for i, h in enumerate(cls._draw_handlers):
+            if h is handle:
+                del cls._draw_handlers[i]
+                return
+        raise ValueError("draw_handler_remove(handler): handler not found")
+
+
+class Area(bpy_struct):
+
+    def __init__(self, type="NODE_EDITOR", x=0, y=0, width=1600, height=900, node_tree=None):
+        self.type = type
+        self.ui_type = "GeometryNodeTree" if type == "NODE_EDITOR" else type
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        header_height = 26
+        ui_width = 0
+        # The order of regions is the same as in Blender: header, tool header/ui..., window last
+        self.regions = [
+            Region("HEADER", width, header_height, x, y + height - header_height),
+            Region("UI", ui_width, height - header_height, x + width - ui_width, y),
+            Region("TOOLS", 0, height - header_height, x, y),
+            Region("WINDOW", width, height - header_height, x, y),
+        ]
+        self.spaces = [SpaceNodeEditor(node_tree) if type == "NODE_EDITOR" else bpy_struct()]
+        self.redraw_count = 0
+
+    def tag_redraw(self):
+        self.redraw_count += 1
+
+
+class Screen(bpy_struct):
+
+    def __init__(self, name="Layout"):
+        self.name = name
+        self.areas = []
+
+
+class Window(bpy_struct):
+
+    def __init__(self, screen=None):
+        self.screen = screen or Screen()
+        self.cursor = "DEFAULT"
+        self.width = 1920
+        self.height = 1080
+        # Only the operators that tests add themselves, e.g. to pretend that nodes are being moved
+        self.modal_operators = []
+
+    def cursor_modal_set(self, cursor):
+        self.cursor = cursor
+
+    def cursor_modal_restore(self):
+        self.cursor = "DEFAULT"
+
+    def cursor_set(self, cursor):
+        self.cursor = cursor
+
+
+class Timer(bpy_struct):
+
+    def __init__(self, time_step, window=None):
+        self.time_step = time_step
+        self.window = window
+        self.time_duration = 0.0
+
+
+class WindowManager(bpy_struct):
+    """Stores the modal handlers and timers of running operators"""
+
+    def __init__(self):
+        self.windows = []
+        self.modal_handlers = []
+        self.timers = []
+
+    def modal_handler_add(self, operator):
+        self.modal_handlers.append(operator)
+        return True
+
+    def event_timer_add(self, time_step, window=None):
+        timer = Timer(time_step, window)
+        self.timers.append(timer)
+        return timer
+
+    def event_timer_remove(self, timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+
+
+class Event(bpy_struct):
+
+    def __init__(
+        self,
+        type="NONE",
+        value="NOTHING",
+        mouse_region_x=0,
+        mouse_region_y=0,
+        mouse_x=0,
+        mouse_y=0,
+        shift=False,
+        ctrl=False,
+        alt=False,
+        oskey=False,
+    ):
+        self.type = type
+        self.value = value
+        self.mouse_region_x = mouse_region_x
+        self.mouse_region_y = mouse_region_y
+        self.mouse_x = mouse_x
+        self.mouse_y = mouse_y
+        self.mouse_prev_x = mouse_x
+        self.mouse_prev_y = mouse_y
+        self.shift = shift
+        self.ctrl = ctrl
+        self.alt = alt
+        self.oskey = oskey
+        self.is_repeat = False
+
+
+# Node types
+#################################################
+
+# bl_idname: (type, default name, input socket types, output socket types, height)
+NODE_INFO = {
+    "ShaderNodeMath": ("MATH", "Math", ["VALUE", "VALUE", "VALUE"], ["VALUE"], 150),
+    "ShaderNodeVectorMath": ("VECT_MATH", "Vector Math", ["VECTOR", "VECTOR"], ["VECTOR", "VALUE"], 150),
+    "ShaderNodeMapRange": ("MAP_RANGE", "Map Range", ["VALUE"] * 5, ["VALUE"], 240),
+    "ShaderNodeValue": ("VALUE", "Value", [], ["VALUE"], 80),
+    "ShaderNodeMixRGB": ("MIX_RGB", "Mix", ["VALUE", "RGBA", "RGBA"], ["RGBA"], 160),
+    "ShaderNodeTexImage": ("TEX_IMAGE", "Image Texture", ["VECTOR"], ["RGBA", "VALUE"], 250),
+    "ShaderNodeBsdfPrincipled": ("BSDF_PRINCIPLED", "Principled BSDF", ["RGBA"] * 20, ["SHADER"], 600),
+    "ShaderNodeOutputMaterial": ("OUTPUT_MATERIAL", "Material Output", ["SHADER", "SHADER", "VECTOR"], [], 120),
+    "GeometryNodeSetPosition": ("SET_POSITION", "Set Position", ["GEOMETRY", "BOOLEAN", "VECTOR", "VECTOR"],
+                                ["GEOMETRY"], 180),
+    "GeometryNodeMeshGrid": ("MESH_PRIMITIVE_GRID", "Grid", ["VALUE"] * 4, ["GEOMETRY"], 180),
+    "GeometryNodeGroup": ("GROUP", "Group", [], ["GEOMETRY"], 100),
+    "ShaderNodeGroup": ("GROUP", "Group", [], ["SHADER"], 100),
+    "CompositorNodeGroup": ("GROUP", "Group", [], ["RGBA"], 100),
+    "NodeGroupInput": ("GROUP_INPUT", "Group Input", [], ["GEOMETRY"], 80),
+    "NodeGroupOutput": ("GROUP_OUTPUT", "Group Output", ["GEOMETRY"], [], 80),
+    "NodeFrame": ("FRAME", "Frame", [], [], 0),
+    "NodeReroute": ("REROUTE", "Reroute", ["RGBA"], ["RGBA"], 16),
+}
+DEFAULT_NODE_INFO = ("CUSTOM", "Node", ["VALUE"], ["VALUE"], 120)
+
+FRAME_MARGIN = 30
+
+
+class NodeLink(bpy_struct):
+
+    def __init__(self, from_socket, to_socket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+        self.from_node = from_socket.node
+        self.to_node = to_socket.node
+        self.is_valid = True
+        self.is_muted = False
+        self.is_hidden = False
+
+
+class _NodeSocket(NodeSocket):
+
+    def __init__(self, node, type, index, is_output):
+        self.node = node
+        self.type = type
+        self.name = type.title()
+        self.identifier = f"{self.name}_{index:03d}"
+        self.is_output = is_output
+        self.enabled = True
+        self.hide = False
+        self.links = []
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+
+class Node(bpy_struct):
+
+    def __init__(self, tree, bl_idname, name):
+        info = NODE_INFO.get(bl_idname, DEFAULT_NODE_INFO)
+        self.id_data = tree
+        self.bl_idname = bl_idname
+        self.type = info[0]
+        self._name = name
+        self._location = Vector((0, 0))
+        self._width = 140.0
+        self._height = info[4]
+        self._parent = None
+        self._color = Color((0.608, 0.608, 0.608))
+        self.use_custom_color = False
+        self.select = True
+        self.hide = False
+        self.mute = False
+        self.label = ""
+        self.shrink = True
+        self.node_tree = None
+        self.inputs = [_NodeSocket(self, t, i, False) for i, t in enumerate(info[2])]
+        self.outputs = [_NodeSocket(self, t, i, True) for i, t in enumerate(info[3])]
+        if self.type == "REROUTE":
+            self._width = 16.0
+
+    def __repr__(self):
+        return f"bpy.data...nodes['{self._name}']"
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self.id_data.nodes._rename(self, value)
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = Vector(value)
+        self.id_data._tag_layout()
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = Color(value)
+
+    @property
+    def width(self):
+        if self.type == "FRAME" and self.shrink and self.id_data._has_children(self):
+            return self.dimensions.x
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        self._width = float(value)
+        self.id_data._tag_layout()
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+        self.id_data._tag_layout()
+
+    @property
+    def dimensions(self):
+        if self.type == "FRAME":
+            return self.id_data._frame_dimensions(self)
+        return Vector((self._width, self._height))
+
+    @property
+    def internal_links(self):
+        return []
+
+
+class Nodes(bpy_struct):
+    """The nodes collection of a node tree"""
+
+    def __init__(self, tree):
+        self.id_data = tree
+        self._nodes = []
+        self._by_name = {}
+        self._name_counts = {}
+        self.active = None
+
+    def _unique_name(self, base):
+        if base not in self._by_name:
+            return base
+        i = self._name_counts.get(base, 0)
+        while True:
+            i += 1
+            name = f"{base}.{i:03d}"
+            if name not in self._by_name:
+                self._name_counts[base] = i
+                return name
+
+    def _rename(self, node, value):
+        if value == node._name:
+            return
+        del self._by_name[node._name]
+        value = self._unique_name(value)
+        node._name = value
+        self._by_name[value] = node
+
+    def new(self, type):
+        info = NODE_INFO.get(type, DEFAULT_NODE_INFO)
+        node = Node(self.id_data, type, self._unique_name(info[1]))
+        self._nodes.append(node)
+        self._by_name[node.name] = node
+        self.id_data._tag_layout()
+        return node
+
+    def remove(self, node):
+        for link in list(self.id_data.links):
+            if link.from_node == node or link.to_node == node:
+                self.id_data.links.remove(link)
+        for other in self._nodes:
+            if other._parent == node:
+                other._parent = None
+        self._nodes.remove(node)
+        del self._by_name[node.name]
+        if self.active == node:
+            self.active = None
+        self.id_data._tag_layout()
+
+    def clear(self):
+        self.id_data.links.clear()
+        self._nodes.clear()
+        self._by_name.clear()
+        self._name_counts.clear()
+        self.active = None
+        self.id_data._tag_layout()
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def keys(self):
+        return [n.name for n in self._nodes]
+
+    def values(self):
+        return list(self._nodes)
+
+    def items(self):
+        return [(n.name, n) for n in self._nodes]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._by_name[key]
+        return self._nodes[key]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self._by_name
+        return key in self._nodes
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def foreach_get(self, attr, seq):
+        """Write the flattened values of attr for every node into seq"""
+        values = []
+        for node in self._nodes:
+            value = getattr(node, attr)
+            if isinstance(value, Vector):
+                values.extend(value)
+            else:
+                values.append(value)
+        if len(values) != len(seq):
+            raise RuntimeError(f"internal error setting the array, expected {len(values)} items, got {len(seq)}")
+        seq[:] = values
+
+    def foreach_set(self, attr, seq):
+        if not self._nodes:
+            return
+        size = len(seq) // len(self._nodes)
+        for i, node in enumerate(self._nodes):
+            value = seq[i * size:(i + 1) * size]
+            setattr(node, attr, value if size > 1 else value[0])
+
+
+class Links(bpy_struct):
+
+    def __init__(self, tree):
+        self.id_data = tree
+        self._links = []
+
+    def new(self, input, output, verify_limits=True):
+        from_socket, to_socket = (input, output) if input.is_output else (output, input)
+        link = NodeLink(from_socket, to_socket)
+        self._links.append(link)
+        from_socket.links.append(link)
+        to_socket.links.append(link)
+        self.id_data._tag_layout()
+        return link
+
+    def remove(self, link):
+        self._links.remove(link)
+        link.from_socket.links.remove(link)
+        link.to_socket.links.remove(link)
+        self.id_data._tag_layout()
+
+    def clear(self):
+        for link in list(self._links):
+            self.remove(link)
+
+    def __getitem__(self, i):
+        return self._links[i]
+
+    def __iter__(self):
+        return iter(self._links)
+
+    def __len__(self):
+        return len(self._links)
+
+
+TREE_TYPES = {
+    "GeometryNodeTree": "GEOMETRY",
+    "ShaderNodeTree": "SHADER",
+    "CompositorNodeTree": "COMPOSITING",
+    "TextureNodeTree": "TEXTURE",
+}
+
+
+class ID(bpy_struct):
+
+    def __init__(self, name):
+        self.name = name
+        self.users = 0
+        self.is_evaluated = False
+        self.session_uid = ID._next_uid
+        ID._next_uid += 1
+
+    _next_uid = 1
+
+
+class NodeTree(ID):
+
+    def __init__(self, name, bl_idname="GeometryNodeTree", owner=None):
+        super().__init__(name)
+        self.bl_idname = bl_idname
+        self.type = TREE_TYPES.get(bl_idname, "CUSTOM")
+        self.nodes = Nodes(self)
+        self.links = Links(self)
+        # The material, scene or world that this tree is embedded in, if any
+        self._owner = owner
+        self.is_embedded_data = owner is not None
+        self._layout_version = 0
+        self._frame_cache_version = -1
+        self._frame_dims = {}
+        self._children = {}
+
+    @property
+    def id_data(self):
+        return self
+
+    def __repr__(self):
+        if self._owner:
+            return f"bpy.data.{self._owner._collection_name}['{self._owner.name}'].node_tree"
+        return f"bpy.data.node_groups['{self.name}']"
+
+    def _tag_layout(self):
+        self._layout_version += 1
+
+    def _update_frames(self):
+        """Frames don't have a size of their own, so work it out from their children,
+        in the same way that Blender does when they are drawn"""
+        if self._frame_cache_version == self._layout_version:
+            return
+        self._frame_cache_version = self._layout_version
+        children = {}
+        for node in self.nodes:
+            if node._parent:
+                children.setdefault(node._parent, []).append(node)
+        self._children = children
+        self._frame_dims = {}
+        bounds = {}
+
+        def abs_location(node):
+            loc = node._location.copy()
+            parent = node._parent
+            while parent:
+                loc += parent._location
+                parent = parent._parent
+            return loc
+
+        def get_bounds(node):
+            if node in bounds:
+                return bounds[node]
+            if node.type == "FRAME":
+                kids = children.get(node)
+                if not kids:
+                    loc = abs_location(node)
+                    result = (loc.x, loc.y - 100, loc.x + node._width, loc.y)
+                else:
+                    kid_bounds = [get_bounds(k) for k in kids]
+                    result = (
+                        min(b[0] for b in kid_bounds) - FRAME_MARGIN,
+                        min(b[1] for b in kid_bounds) - FRAME_MARGIN,
+                        max(b[2] for b in kid_bounds) + FRAME_MARGIN,
+                        max(b[3] for b in kid_bounds) + FRAME_MARGIN,
+                    )
+            else:
+                loc = abs_location(node)
+                result = (loc.x, loc.y - node._height, loc.x + node._width, loc.y)
+            bounds[node] = result
+            return result
+
+        for node in self.nodes:
+            if node.type == "FRAME":
+                b = get_bounds(node)
+                self._frame_dims[node] = Vector((b[2] - b[0], b[3] - b[1]))
+
+    def _has_children(self, frame):
+        self._update_frames()
+        return frame in self._children
+
+    def _frame_dimensions(self, frame):
+        self._update_frames()
+        return self._frame_dims.get(frame, Vector((frame._width, 100))).copy()
+
+    def update_tag(self):
+        self._tag_layout()
+
+
+class Material(ID):
+    _collection_name = "materials"
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.node_tree = None
+        self._use_nodes = False
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and not self.node_tree:
+            self.node_tree = NodeTree("Shader Nodetree", "ShaderNodeTree", owner=self)
+            output = self.node_tree.nodes.new("ShaderNodeOutputMaterial")
+            output.location = (300, 300)
+            bsdf = self.node_tree.nodes.new("ShaderNodeBsdfPrincipled")
+            bsdf.location = (10, 300)
+            self.node_tree.links.new(bsdf.outputs[0], output.inputs[0])
+
+
+class World(Material):
+    _collection_name = "worlds"
+
+
+class Scene(ID):
+    _collection_name = "scenes"
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.node_tree = None
+        self._use_nodes = False
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and not self.node_tree:
+            self.node_tree = NodeTree("Compositing Nodetree", "CompositorNodeTree", owner=self)
+
+
+class Context(bpy_struct):
+    pass
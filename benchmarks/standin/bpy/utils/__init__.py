@@ -0,0 +1,30 @@
+"""Stand-in for bpy.utils"""
+from . import previews  # noqa
+
+_registered = []
+
+
+def register_class(cls):
+    from .. import types, context, ops
+    if getattr(cls, "is_registered", False):
+        raise ValueError(f"register_class(...): already registered as a subclass '{cls.__name__}'")
+    cls.is_registered = True
+    _registered.append(cls)
+    if issubclass(cls, types.AddonPreferences):
+        prefs = cls()
+        prefs._init_properties()
+        context.preferences.addons._add(cls.bl_idname, prefs)
+    elif issubclass(cls, types.Operator):
+        ops._register_operator(cls)
+
+
+def unregister_class(cls):
+    from .. import types, context, ops
+    if cls not in _registered:
+        raise RuntimeError(f"unregister_class(...): missing bl_rna attribute from '{cls.__name__}'")
+    cls.is_registered = False
+    _registered.remove(cls)
+    if issubclass(cls, types.AddonPreferences):
+        context.preferences.addons._remove(cls.bl_idname)
+    elif issubclass(cls, types.Operator):
+        ops._unregister_operator(cls)
@@ -0,0 +1,39 @@
+"""Stand-in for bpy.utils.previews"""
+
+
+class ImagePreview():
+    _next_id = 1
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.icon_id = ImagePreview._next_id
+        ImagePreview._next_id += 1
+
+
+class ImagePreviewCollection(dict):
+
+    def load(self, name, path, path_type, force_reload=False):
+        self[name] = ImagePreview(name, path)
+        return self[name]
+
+    def close(self):
+        self.clear()
+
+
+_collections = []
+
+
+def new():
+    pcoll = ImagePreviewCollection()
+    _collections.append(pcoll)
+    return pcoll
+
+
+def remove(pcoll):
+    for i, other in enumerate(_collections):
+        if other is pcoll:
+            del _collections[i]
+            pcoll.close()
+            return
+    raise KeyError("collection not found")
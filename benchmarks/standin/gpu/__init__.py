@@ -0,0 +1,9 @@
+"""A stand-in for the gpu module that records draw calls instead of drawing anything.
+Every batch draw is appended to gpu.log, so that tests and benchmarks can count them."""
+from . import types, shader, state, matrix  # noqa
+
+log = []
+
+
+def reset():
+    log.clear()
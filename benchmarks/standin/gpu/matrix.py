@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def push_pop():
+    yield
+
+
+@contextmanager
+def push_pop_projection():
+    yield
+
+
+def translate(offset):
+    return
+
+
+def scale(scale):
+    return
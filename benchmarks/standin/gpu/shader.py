@@ -0,0 +1,9 @@
+from .types import GPUShader
+
+_builtins = {}
+
+
+def from_builtin(name, config="DEFAULT"):
+    if name not in _builtins:
+        _builtins[name] = GPUShader(name=name)
+    return _builtins[name]
@@ -0,0 +1,21 @@
+state = {"blend": "NONE", "line_width": 1.0, "scissor": (0, 0, 1920, 1080)}
+
+
+def blend_set(mode):
+    state["blend"] = mode
+
+
+def line_width_set(width):
+    state["line_width"] = width
+
+
+def line_width_get():
+    return state["line_width"]
+
+
+def scissor_set(x, y, xsize, ysize):
+    state["scissor"] = (x, y, xsize, ysize)
+
+
+def scissor_get():
+    return state["scissor"]
@@ -0,0 +1,40 @@
+class GPUShader():
+
+    def __init__(self, vertexcode="", fragcode="", geocode="", name=""):
+        self.name = name
+        self.uniforms = {}
+
+    def bind(self):
+        return
+
+    def uniform_float(self, name, value):
+        self.uniforms[name] = value
+
+    def uniform_int(self, name, value):
+        self.uniforms[name] = value
+
+    def __call__(self, name, value):
+        self.uniform_float(name, value)
+
+
+class GPUBatch():
+
+    def __init__(self, type="TRIS", content=None):
+        self.type = type
+        self.content = content or {}
+
+    @property
+    def vertex_count(self):
+        pos = self.content.get("pos", ())
+        return len(pos)
+
+    def draw(self, shader=None):
+        from . import log
+        log.append(("batch", self.type, self.vertex_count, dict(shader.uniforms) if shader else {}))
+
+
+class GPUTexture():
+
+    def __init__(self, size, format="RGBA8", data=None):
+        self.size = size
+        self.format = format
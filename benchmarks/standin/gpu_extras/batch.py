@@ -0,0 +1,6 @@
+from gpu.types import GPUBatch
+
+
+def batch_for_shader(shader, type, content, indices=None):
+    content = {name: list(values) for name, values in content.items()}
+    return GPUBatch(type=type, content=content)
@@ -0,0 +1,147 @@
+"""A minimal pure python version of mathutils.Vector, with only the parts the addon uses"""
+from math import sqrt, acos
+from . import geometry  # noqa
+
+
+class Vector():
+    __slots__ = ["_data"]
+
+    def __init__(self, seq=(0, 0, 0)):
+        self._data = [float(v) for v in seq]
+
+    # component access
+    def _get(i):
+        return property(lambda self: self._data[i], lambda self, value: self._data.__setitem__(i, float(value)))
+
+    x = _get(0)
+    y = _get(1)
+    z = _get(2)
+    w = _get(3)
+    del _get
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self._data[i])
+        return self._data[i]
+
+    def __setitem__(self, i, value):
+        self._data[i] = float(value)
+
+    def __repr__(self):
+        return f"Vector(({', '.join(f'{v:.4f}' for v in self._data)}))"
+
+    def __eq__(self, other):
+        try:
+            return len(self._data) == len(other) and all(a == b for a, b in zip(self._data, other))
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def copy(self):
+        return Vector(self._data)
+
+    def to_tuple(self, precision=-1):
+        if precision == -1:
+            return tuple(self._data)
+        return tuple(round(v, precision) for v in self._data)
+
+    # arithmetic
+    def _zip(self, other, op):
+        if len(other) != len(self._data):
+            raise ValueError("Vector: vectors must have the same size")
+        return Vector(op(a, b) for a, b in zip(self._data, other))
+
+    def __add__(self, other):
+        return self._zip(other, lambda a, b: a + b)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._zip(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._zip(other, lambda a, b: b - a)
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector(a * other for a in self._data)
+        return self._zip(other, lambda a, b: a * b)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return Vector(a / other for a in self._data)
+
+    def __matmul__(self, other):
+        return self.dot(other)
+
+    def __neg__(self):
+        return Vector(-a for a in self._data)
+
+    def __iadd__(self, other):
+        return self.__add__(other)
+
+    def __isub__(self, other):
+        return self.__sub__(other)
+
+    def __imul__(self, other):
+        return self.__mul__(other)
+
+    def __itruediv__(self, other):
+        return self.__truediv__(other)
+
+    @property
+    def length(self):
+        return sqrt(sum(a * a for a in self._data))
+
+    @property
+    def length_squared(self):
+        return sum(a * a for a in self._data)
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self._data, other))
+
+    def normalized(self):
+        length = self.length
+        if length == 0:
+            return self.copy()
+        return self / length
+
+    def normalize(self):
+        self._data = self.normalized()._data
+
+    def angle(self, other, fallback=None):
+        length = self.length * Vector(other).length
+        if length == 0:
+            if fallback is not None:
+                return fallback
+            raise ValueError("Vector.angle(other): zero length vectors have no valid angle")
+        return acos(max(-1, min(1, self.dot(other) / length)))
+
+
+class Color(Vector):
+    __slots__ = []
+
+    r = Vector.x
+    g = Vector.y
+    b = Vector.z
+
+    def copy(self):
+        return Color(self._data)
+
+
+class Matrix():
+    """Only here so that imports of it work"""
+
+    def __init__(self, rows=()):
+        self.rows = [list(r) for r in rows]
@@ -0,0 +1,31 @@
+"""The few mathutils.geometry functions that the addon uses"""
+
+
+def _sign(p1, p2, p3):
+    return (p1[0] - p3[0]) * (p2[1] - p3[1]) - (p2[0] - p3[0]) * (p1[1] - p3[1])
+
+
+def intersect_point_tri_2d(pt, tri_p1, tri_p2, tri_p3):
+    d1 = _sign(pt, tri_p1, tri_p2)
+    d2 = _sign(pt, tri_p2, tri_p3)
+    d3 = _sign(pt, tri_p3, tri_p1)
+    has_neg = d1 < 0 or d2 < 0 or d3 < 0
+    has_pos = d1 > 0 or d2 > 0 or d3 > 0
+    return 0 if has_neg and has_pos else 1
+
+
+def area_tri(v1, v2, v3):
+    return abs(_sign(v1, v2, v3)) / 2
+
+
+def interpolate_bezier(knot1, handle1, handle2, knot2, resolution):
+    from . import Vector
+    points = []
+    for i in range(resolution):
+        t = i / max(resolution - 1, 1)
+        u = 1 - t
+        points.append(
+            Vector(
+                u**3 * a + 3 * u**2 * t * b + 3 * u * t**2 * c + t**3 * d
+                for a, b, c, d in zip(knot1, handle1, handle2, knot2)))
+    return points
@@ -0,0 +1,88 @@
+"""Helpers for driving the addon with the stand-in modules, doing the parts that Blender would normally do itself,
+such as redrawing areas and sending events to modal operators."""
+import bpy
+import blf
+import gpu
+
+context = bpy.context
+
+
+def reset():
+    """Clear all data, handlers and draw logs"""
+    bpy.reset()
+    gpu.reset()
+    blf.reset()
+
+
+def node_editor_areas(window=None):
+    screen = window.screen if window else context.screen
+    return [area for area in screen.areas if area.type == "NODE_EDITOR"]
+
+
+def add_window(screen_name="Layout.001"):
+    """Open another main window, with an empty screen"""
+    window = bpy.types.Window(bpy.types.Screen(screen_name))
+    context.window_manager.windows.append(window)
+    return window
+
+
+def get_area_window(area):
+    for window in context.window_manager.windows:
+        if area in window.screen.areas:
+            return window
+    return context.window
+
+
+def add_node_editor_area(node_tree=None, x=0, y=0, width=1600, height=900, window=None):
+    area = bpy.types.Area("NODE_EDITOR", x=x, y=y, width=width, height=height, node_tree=node_tree)
+    (window.screen if window else context.screen).areas.append(area)
+    return area
+
+
+def redraw(areas=None):
+    """Run the node editor draw handlers for each area, with the context set up as it would be in Blender.
+    Returns the number of gpu batches and text draws that were made."""
+    gpu_start = len(gpu.log)
+    blf_start = len(blf.log)
+    for area in areas or node_editor_areas():
+        region = area.regions[-1]
+        window = get_area_window(area)
+        with context.temp_override(window=window, area=area, region=region, space_data=area.spaces[0]):
+            for handle in list(bpy.types.SpaceNodeEditor._draw_handlers):
+                callback, args, region_type, draw_type = handle[0]
+                if region_type == region.type:
+                    callback(*args)
+    return len(gpu.log) - gpu_start, len(blf.log) - blf_start
+
+
+def send_event(type, value="NOTHING", x=0, y=0, area=None, **modifiers):
+    """Send an event to all running modal operators, in the same order as Blender.
+    x and y are relative to the main region of the area."""
+    area = area or node_editor_areas()[0]
+    region = area.regions[-1]
+    event = bpy.types.Event(
+        type,
+        value,
+        mouse_region_x=x,
+        mouse_region_y=y,
+        mouse_x=x + region.x,
+        mouse_y=y + region.y,
+        **modifiers,
+    )
+    wm = context.window_manager
+    window = get_area_window(area)
+    with context.temp_override(window=window, area=area, region=region, space_data=area.spaces[0]):
+        for op in reversed(list(wm.modal_handlers)):
+            result = op.modal(context, event)
+            if result & {"FINISHED", "CANCELLED"}:
+                wm.modal_handlers.remove(op)
+            if result & {"RUNNING_MODAL", "FINISHED"}:
+                break
+    return event
+
+
+def tick(elapsed=1 / 60):
+    """Send a timer event for every active window manager timer, and run the bpy.app.timers"""
+    for _ in list(context.window_manager.timers):
+        send_event("TIMER")
+    bpy.app.timers.run_timers(elapsed)
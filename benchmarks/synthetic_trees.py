@@ -0,0 +1,115 @@
+"""Functions for generating large synthetic node trees to benchmark the minimap with.
+These only use the public bpy api, so they work both in Blender and with the stand-in bpy."""
+import bpy
+from random import Random
+
+NODE_TYPES = ["ShaderNodeMath", "ShaderNodeVectorMath", "ShaderNodeMapRange", "ShaderNodeValue"]
+NODE_WIDTH = 140
+NODE_HEIGHT = 160
+SPACING = 60
+
+
+def grid_location(i, columns):
+    """Lay nodes out in a grid so that the tree has a realistic shape"""
+    x = (i % columns) * (NODE_WIDTH + SPACING)
+    y = -(i // columns) * (NODE_HEIGHT + SPACING)
+    return x, y
+
+
+def add_nodes(tree, count, node_types=NODE_TYPES, seed=0):
+    """Add count nodes to the tree laid out in a roughly square grid, and return them"""
+    rand = Random(seed)
+    columns = max(int(count**0.5), 1)
+    nodes = []
+    for i in range(count):
+        node = tree.nodes.new(rand.choice(node_types))
+        node.location = grid_location(i, columns)
+        node.width = NODE_WIDTH
+        node.label = f"Node {i}"
+        nodes.append(node)
+    return nodes
+
+
+def link_nodes(tree, nodes):
+    """Link the first output of each node to the first input of the next one, like a long chain of math nodes"""
+    for from_node, to_node in zip(nodes, nodes[1:]):
+        if from_node.outputs and to_node.inputs:
+            tree.links.new(from_node.outputs[0], to_node.inputs[0])
+
+
+def new_tree(name):
+    tree = bpy.data.node_groups.new(name, "GeometryNodeTree")
+    tree.nodes.clear()
+    return tree
+
+
+def make_flat_tree(count, name="Flat"):
+    """A tree of count nodes with no frames or reroutes, linked in a chain"""
+    tree = new_tree(f"{name} {count}")
+    link_nodes(tree, add_nodes(tree, count))
+    return tree
+
+
+def make_nested_frames_tree(count, depth=12, name="Nested frames"):
+    """A tree where most nodes are inside frames, which are nested up to depth levels deep.
+    Roughly one in ten nodes is a frame."""
+    tree = new_tree(f"{name} {count}")
+    frame_count = max(count // 10, 1)
+    frames = []
+    for i in range(frame_count):
+        frame = tree.nodes.new("NodeFrame")
+        frame.label = f"Frame {i} with a fairly long label"
+        if i % depth:
+            frame.parent = frames[-1]
+        frames.append(frame)
+
+    nodes = add_nodes(tree, count - frame_count)
+    for i, node in enumerate(nodes):
+        node.parent = frames[i % frame_count]
+    link_nodes(tree, nodes)
+    return tree
+
+
+def make_reroute_tree(count, name="Reroutes"):
+    """A tree where half of the nodes are reroutes, chained between the other nodes"""
+    tree = new_tree(f"{name} {count}")
+    nodes = add_nodes(tree, count // 2)
+    reroutes = add_nodes(tree, count - len(nodes), node_types=["NodeReroute"], seed=1)
+    for reroute, node in zip(reroutes, nodes):
+        reroute.location = (node.location[0] + NODE_WIDTH + SPACING / 2, node.location[1])
+    # Each node is linked to the next one through the reroute next to it
+    link_nodes(tree, [n for pair in zip(nodes, reroutes) for n in pair])
+    return tree
+
+
+def make_material_tree(count, materials=500, name="Material"):
+    """Create a lot of materials, and return the node tree of the last one with count nodes in it.
+    Material node trees don't show up in bpy.data.node_groups, so they are found by a slower path."""
+    material = None
+    for i in range(materials):
+        material = bpy.data.materials.new(f"{name} {count} {i}")
+        material.use_nodes = True
+    tree = material.node_tree
+    tree.nodes.clear()
+    add_nodes(tree, count)
+    return tree
+
+
+TREE_TYPES = {
+    "flat": make_flat_tree,
+    "nested_frames": make_nested_frames_tree,
+    "reroutes": make_reroute_tree,
+    "materials": make_material_tree,
+}
+
+
+def move_nodes(nodes, offset):
+    for node in nodes:
+        loc = node.location
+        node.location = (loc[0] + offset, loc[1] + offset)
+
+
+def recolor_nodes(nodes, color):
+    for node in nodes:
+        node.use_custom_color = True
+        node.color = color
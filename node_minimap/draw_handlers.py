@@ -2,50 +2,47 @@ from __future__ import annotations  # allow delayed annotation evaluation:
 # https://stackoverflow.com/questions/39740632/python-type-hinting-without-cyclic-imports
 
 import bpy
-from ..shared.helpers import Rectangle, get_active_tree
-from ..shared.functions import draw_lines_from_quads_2d_batch, draw_quads_2d_batch, get_area, get_prefs
-from .minimap_functions import draw_view_box, get_shader_cache
-from time import perf_counter
-from statistics import mean
+import blf
+from ..shared.helpers import Rectangle
+from contextlib import nullcontext
+from ..shared.functions import clip_to_rect, draw_lines_from_quad_2d, draw_lines_from_quads_2d_batch,\
+    draw_quads_2d_batch, get_area, get_prefs, get_window_areas, transform_2d
+from .minimap_functions import draw_performance_hud, draw_view_box, get_minimap_cache, get_shader_cache
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .operators import MINIMAP_OT_InitDrawOperators, MINIMAP_OT_DrawAreaMinimap
 
-times = []
-main_times = []
-final = 0
-
 
 def handler_create(self: MINIMAP_OT_InitDrawOperators, context: bpy.types.Context):
     """Initialize an operator for every visible node tree area that doesn have one yet"""
     screen = context.screen
-    start = perf_counter()
+    prefs = get_prefs(context)
+    minimap_cache = get_minimap_cache(context)
+    minimap_cache.set_tracing(prefs.record_trace, prefs.trace_buffer_size)
+    trace = minimap_cache.trace
+    trace.next_frame()
+    start = trace.begin()
+    cache = get_shader_cache(context)
+    if cache:
+        cache.set_timing(prefs.show_performance_hud)
+        cache.timer.switch("Area bookkeeping")
     for area in screen.areas:
         if area.type == "NODE_EDITOR" and str(area) not in self.areas:
             self.areas.append(str(area))
             bpy.ops.node.draw_area_minimap("INVOKE_DEFAULT", area=str(area), idx=len(self.areas) - 1)
 
-    remove = []
-    for area_name in self.areas:
-        for area in screen.areas:
-            if area_name == str(area):
-                break
-        else:
-            remove.append(area_name)
+    # Areas in other windows still have their operators, so only the ones that have been closed are removed
+    area_names = {str(area) for area in get_window_areas(context)}
+    remove = [area_name for area_name in self.areas if area_name not in area_names]
 
     for area_name in remove:
         self.areas.remove(area_name)
 
-    cache = get_shader_cache(context)
     if not cache:
         return
     cache.update(context)
-    global main_times
-    global final
-    main_times.append(perf_counter() - start)
-    if len(main_times) > 20:
-        final = mean(main_times)
-        main_times = []
+    cache.timer.end_frame()
+    trace.end("Draw handler", start, "draw", areas=len(cache.areas))
 
 
 def draw_callback_px(self: MINIMAP_OT_DrawAreaMinimap, context: bpy.types.Context):
@@ -57,12 +54,9 @@ def draw_callback_px(self: MINIMAP_OT_DrawAreaMinimap, context: bpy.types.Contex
         # so that the draw function only runs once per area
         return
 
-    # for measuring performance
-    start = perf_counter()
     node_tree = context.space_data.node_tree
     if not node_tree:
         return
-    node_tree = get_active_tree(context, area=area)
     prefs = get_prefs(context)
 
     theme = context.preferences.themes[0].node_editor
@@ -74,38 +68,99 @@ def draw_callback_px(self: MINIMAP_OT_DrawAreaMinimap, context: bpy.types.Contex
     if not cache:
         return
     area_cache = cache.areas[str(area)]
+    # The group being edited, which is cached by the area
+    node_tree = area_cache.node_tree
+    trace = get_minimap_cache(context).trace
+    draw_start = trace.begin()
+    timer = area_cache.timer
+    timer.switch("Change detection")
+    start = trace.begin()
     area_cache.update(context, node_tree)
+    # This comes after the update, so that the caches of any removed nodes have been removed by the time it's applied
+    area_cache.swap_layout(context)
+    area_cache.update_search(context.window_manager.minimap_search)
+    area_cache.update_zoom()
+    trace.end("Area update", start, "cache", area=area_cache.area_name)
     map_area = self.map_area = area_cache.map_area
-    node_area = self.node_area = area_cache.node_area
+    # The part of node space being shown, which is only part of the tree if the minimap is zoomed in
+    node_area = self.node_area = area_cache.zoom_window
     line_width = map_area.size.x / 250 * prefs.line_width
 
+    timer.switch("Node draw")
     draw_quads_2d_batch(area_cache.quad_batch, color)
     # draw_quads_2d(map_area.coords, color)
 
     if node_tree:
-        for node_cache in area_cache.all_nodes:
-            node_cache.draw_node(context, line_width)
-
-        if prefs.show_labels:
-            for node_cache in area_cache.all_nodes:
-                node_cache.draw_label()
+        # When zoomed in, the batches are still in the space of the whole minimap, so they are moved into place when
+        # they're drawn, and cropped to the minimap. Only the visible nodes and links are drawn
+        # Nodes can also go past the edges while they're being moved, as the bounds are only updated afterwards,
+        # and the batches are moved in the same way once they are, until the whole tree is laid out again
+        zoomed = area_cache.is_zoomed
+        scale, offsetx, offsety = area_cache.map_transform
+        transformed = area_cache.map_transform != (1, 0, 0)
+        with clip_to_rect(map_area) if zoomed or area_cache.in_transform else nullcontext():
+            with transform_2d(scale, (offsetx, offsety)) if transformed else nullcontext():
+                # Links are drawn underneath the nodes, all in one go
+                link_batch = area_cache.zoom_link_batch if zoomed else area_cache.link_batch
+                if link_batch:
+                    draw_lines_from_quads_2d_batch(link_batch, prefs.link_color, line_width)
+
+                for node_cache in area_cache.drawn_nodes:
+                    node_cache.draw_node(context, line_width)
+
+                # Outline all of the nodes that match the search, and the one that was last jumped to more thickly
+                if area_cache.search_batch:
+                    draw_lines_from_quads_2d_batch(area_cache.search_batch, prefs.search_color, line_width)
+                    current = area_cache.current_match
+                    if current and current in area_cache.index:
+                        draw_lines_from_quads_2d_batch(current.outline_batch, prefs.search_color, line_width * 2)
+
+                # Highlight the node under the mouse
+                hover_node = self.hover_node
+                if hover_node and hover_node in area_cache.index:
+                    draw_lines_from_quads_2d_batch(hover_node.outline_batch, prefs.highlight_color, line_width)
+
+            # Labels are laid out at the zoomed in size instead, so that the text isn't scaled up
+            if prefs.show_labels:
+                timer.switch("Label draw")
+                for node_cache in area_cache.drawn_nodes:
+                    node_cache.draw_label(area_cache.map_transform)
+                timer.switch("Node draw")
+
+        if self.select_box:
+            draw_lines_from_quad_2d(self.select_box.coords, prefs.highlight_color, line_width)
 
     # draw minimap outline
     draw_lines_from_quads_2d_batch(area_cache.outline_batch, prefs.outline_color, line_width)
+    if area_cache.is_building:
+        draw_build_progress(area_cache, map_area, prefs)
 
     # Draw the box representing the viewport camera
+    timer.switch("View box")
     region_to_view = context.region.view2d.region_to_view
     view_min = region_to_view(0, 0)
     view_max = region_to_view(context.region.width, context.region.height)
     view_area = Rectangle(view_min, view_max)
     self.view_area = view_area
     draw_view_box(view_area, node_area, map_area, prefs.view_outline_color, line_width)
-
-    global times
-    global final
-    times.append(perf_counter() - start)
-    if len(times) > 20:
-        # uncomment to get the averaged draw times
-        # print(mean(times))
-        # print("Total: " + str(mean(times) + final))
-        times = []
+    timer.count("Nodes", len(area_cache.all_nodes))
+    timer.end_frame()
+    trace.end("Draw area", draw_start, "draw", area=area_cache.area_name, nodes=len(area_cache.all_nodes))
+
+    if prefs.show_performance_hud:
+        draw_performance_hud(cache, area_cache, map_area, prefs)
+
+
+def draw_build_progress(area_cache, map_area, prefs):
+    """Show how much of the minimap has been built, while the node caches are still being created"""
+    text = f"Building minimap {area_cache.build_progress * 100:.0f}%"
+    if bpy.app.version < (4, 0, 0):
+        blf.size(0, 11, 72)
+    else:
+        blf.size(0, 11)
+    color = prefs.text_color
+    blf.color(0, color[0], color[1], color[2], color[3])
+    width, height = blf.dimensions(0, text)
+    center = map_area.center
+    blf.position(0, center.x - width / 2, center.y - height / 2, 0)
+    blf.draw(0, text)
@@ -0,0 +1,89 @@
+"""
+Keeps track of how much GPU memory the minimap is using. Every batch that the caches create is recorded here, along
+with its size and its owner, which is an area, a tree that has been shown in that area, and a node in that tree.
+Batches that belong to the tree as a whole (the background, outline and links) have None as the node.
+
+Only the vertex buffers are counted, as they are by far the biggest part of each batch.
+"""
+from typing import Dict, Optional
+
+# The size in bytes of each vertex in the minimap batches, which only have a 2D float position
+VERTEX_SIZE = 8
+
+# The size of the background and outline batches of the minimap, which are always 6 and 8 vertices
+MAP_BATCHES_SIZE = (6 + 8) * VERTEX_SIZE
+
+
+def get_verts_size(verts) -> int:
+    """Get the number of bytes that a batch made from the given vertices uses on the GPU"""
+    return len(verts) * VERTEX_SIZE if verts is not None else 0
+
+
+def format_size(size: int) -> str:
+    """Get a byte size as a human readable string"""
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class GPUResources():
+    """The sizes in bytes of the GPU batches owned by each area, tree and node"""
+
+    def __init__(self):
+        # area name -> tree key -> node name -> size
+        self.owners: Dict[str, Dict[object, Dict[Optional[str], int]]] = {}
+        # (area name, tree key) -> total size of the tree
+        self.tree_sizes: Dict[tuple, int] = {}
+        self.total_size = 0
+
+    def set(self, area, tree, node, size):
+        """Record the size of the batches of an owner, replacing whatever it had before"""
+        nodes = self.owners.setdefault(area, {}).setdefault(tree, {})
+        change = size - nodes.get(node, 0)
+        nodes[node] = size
+        key = (area, tree)
+        self.tree_sizes[key] = self.tree_sizes.get(key, 0) + change
+        self.total_size += change
+
+    def remove_node(self, area, tree, node):
+        nodes = self.owners.get(area, {}).get(tree)
+        if not nodes or node not in nodes:
+            return
+        size = nodes.pop(node)
+        self.tree_sizes[(area, tree)] -= size
+        self.total_size -= size
+
+    def remove_tree(self, area, tree):
+        """Forget the batches of a tree and all of its nodes"""
+        trees = self.owners.get(area)
+        if not trees or tree not in trees:
+            return
+        del trees[tree]
+        self.total_size -= self.tree_sizes.pop((area, tree), 0)
+        if not trees:
+            del self.owners[area]
+
+    def remove_area(self, area):
+        for tree in list(self.owners.get(area, ())):
+            self.remove_tree(area, tree)
+
+    def get_area_size(self, area) -> int:
+        return sum(self.tree_sizes.get((area, tree), 0) for tree in self.owners.get(area, ()))
+
+    def get_tree_size(self, area, tree) -> int:
+        return self.tree_sizes.get((area, tree), 0)
+
+    def get_owner_count(self) -> int:
+        """Get the number of owners that have batches. Each node owns two, and each tree up to three"""
+        return sum(len(nodes) for trees in self.owners.values() for nodes in trees.values())
+
+    def get_usage(self) -> dict:
+        """Get a summary of the GPU memory used, for showing in the UI or for use by scripts"""
+        return {
+            "total": self.total_size,
+            "areas": {area: self.get_area_size(area) for area in self.owners},
+            "trees": dict(self.tree_sizes),
+            "owners": self.get_owner_count(),
+        }
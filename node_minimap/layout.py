@@ -0,0 +1,542 @@
+"""
+The geometry side of the minimap, kept separate from Blender so that it only works on plain data.
+The cache (shader_cache.py) reads the node tree into a list of NodeRecords, and this works out where everything
+should be drawn from them, in a single pass over the tree.
+
+Rectangles are tuples of (x0, y0, x1, y1), or (N, 4) numpy arrays of them for the per node results.
+Node rectangles go from the top left corner of the node (its location) to the bottom right, so y1 is below y0,
+the same as the Rectangles created by the rest of the addon.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from ..shared.resources import LazyModule
+
+# Imported the first time it is used
+np = LazyModule("numpy")
+
+Rect = Tuple[float, float, float, float]
+
+# The offset between the visual location of a frame and the top left of its children
+FRAME_OFFSET = (30, -30)
+
+
+@dataclass
+class NodeRecord():
+    """The data needed to lay out a single node. parent is the index of the parent frame, or -1"""
+    name: str
+    location: Tuple[float, float]
+    width: float
+    height: float
+    parent: int = -1
+    is_frame: bool = False
+    is_reroute: bool = False
+    label: str = ""
+
+
+@dataclass
+class LayoutPrefs():
+    """The preferences that affect the size and position of the minimap"""
+    size: float = 0.2
+    min_size: float = 200
+    max_size: float = 250
+    offset: Tuple[float, float] = (20, 20)
+    anchor_corner: str = "BR"
+    show_context_path: bool = False
+
+
+@dataclass
+class Layout():
+    """The result of laying out a node tree. All arrays are in the same order as the records"""
+    node_area: Rect
+    map_area: Rect
+    scale: Tuple[float, float]
+    records: List[NodeRecord] = field(default_factory=list)
+    visual_locations: np.ndarray = field(default_factory=lambda: np.zeros((0, 2)))
+    node_rects: np.ndarray = field(default_factory=lambda: np.zeros((0, 4)))
+    map_rects: np.ndarray = field(default_factory=lambda: np.zeros((0, 4)))
+    frame_used: List[bool] = field(default_factory=list)
+    # Kept so that a few nodes can be laid out again without going through the whole tree. See relayout_nodes
+    absolute_locations: List[Tuple[float, float]] = field(default_factory=list)
+    children: List[List[int]] = field(default_factory=list)
+
+
+@dataclass
+class LabelLine():
+    text: str
+    x: float
+    y: float
+
+
+def get_node_dims(record: NodeRecord) -> Tuple[float, float]:
+    """Returns the visual node dimensions.
+    y is inverted so that the bottom corner is below the location, and multiplied by .8 to correct for
+    node.dimensions being weird"""
+    return record.width, record.height * -0.8
+
+
+def get_absolute_locations(records: List[NodeRecord]) -> List[Tuple[float, float]]:
+    """Get the location of every node relative to the tree rather than to its parent frame"""
+    count = len(records)
+    absolute = [None] * count
+
+    def get_absolute(i):
+        # Iterative rather than recursive, as frames can be nested very deeply
+        chain = []
+        while i != -1 and absolute[i] is None:
+            chain.append(i)
+            i = records[i].parent
+        x, y = absolute[i] if i != -1 else (0, 0)
+        for j in reversed(chain):
+            loc = records[j].location
+            x += loc[0]
+            y += loc[1]
+            absolute[j] = (x, y)
+
+    for i in range(count):
+        if absolute[i] is None:
+            get_absolute(i)
+    return absolute
+
+
+def get_children(records: List[NodeRecord]) -> List[List[int]]:
+    """Get the indices of the direct children of every node"""
+    children = [[] for _ in range(len(records))]
+    for i, record in enumerate(records):
+        if record.parent != -1:
+            children[record.parent].append(i)
+    return children
+
+
+def get_frame_location(i, children: List[List[int]], visual, absolute) -> Tuple[float, float]:
+    """Get the visual location of a frame from the visual locations of its children"""
+    if not children[i]:
+        return absolute[i]
+    minx = min(visual[c][0] for c in children[i])
+    maxy = max(visual[c][1] for c in children[i])
+    return minx - FRAME_OFFSET[0], maxy - FRAME_OFFSET[1]
+
+
+def get_visual_locations(records: List[NodeRecord], absolute=None, children=None)\
+        -> Tuple[List[Tuple[float, float]], List[bool]]:
+    """Get the visual location of every node, taking parent frames into account.
+    The location of a frame is worked out from its children, as it doesn't seem possible to get it directly.
+    Also returns whether each frame has any children."""
+    count = len(records)
+    absolute = absolute if absolute is not None else get_absolute_locations(records)
+    children = children if children is not None else get_children(records)
+    visual = list(absolute)
+    frame_used = [bool(c) for c in children]
+    done = [False] * count
+
+    # Frames need the visual locations of their children first, so go through them depth first
+    for start in range(count):
+        if done[start] or not records[start].is_frame:
+            continue
+        stack = [(start, False)]
+        while stack:
+            i, expanded = stack.pop()
+            if done[i]:
+                continue
+            if not expanded:
+                stack.append((i, True))
+                stack.extend((c, False) for c in children[i] if records[c].is_frame and not done[c])
+                continue
+            done[i] = True
+            visual[i] = get_frame_location(i, children, visual, absolute)
+    return visual, frame_used
+
+
+def get_dims_array(records: List[NodeRecord]) -> np.ndarray:
+    """The visual dimensions of all nodes as an (N, 2) array. See get_node_dims"""
+    dims = np.array([(r.width, r.height) for r in records], dtype=np.float64).reshape(-1, 2)
+    dims[:, 1] *= -0.8
+    return dims
+
+
+def get_node_area(visual_locations: np.ndarray, dims: np.ndarray) -> Rect:
+    """Returns a rectangle that goes from the minimum x and y of the nodes in the tree to the maximum x and y"""
+    locs = np.reshape(visual_locations, (-1, 2))
+    return (
+        float(np.min(locs[:, 0], initial=10000)),
+        float(np.min(locs[:, 1] + dims[:, 1], initial=10000)),
+        float(np.max(locs[:, 0] + dims[:, 0], initial=-1000)),
+        float(np.max(locs[:, 1], initial=-1000)),
+    )
+
+
+def get_map_area(region_width, region_height, node_area: Rect, prefs: LayoutPrefs) -> Rect:
+    """Returns a rectangle representing the size, shape and position of the minimap box in the region"""
+    size = min(max(region_width * prefs.size, prefs.min_size), prefs.max_size)
+    node_width = node_area[2] - node_area[0]
+    node_height = node_area[3] - node_area[1]
+    sizex = size
+    sizey = size * (node_height / node_width) if node_width else 0
+
+    paddingx, paddingy = prefs.offset
+    corner = prefs.anchor_corner
+    # If breadcrumbs are enabled, move the minimap down so they don't overlap
+    if corner == "TL" and prefs.show_context_path:
+        paddingy += 30
+
+    # corner is a string in ["BL", "TR", "TL", "BR"] for bottom-left, top-right, etc.
+    if "B" in corner:
+        miny = paddingy
+        maxy = miny + sizey
+    else:
+        maxy = region_height - paddingy
+        miny = maxy - sizey
+
+    if "L" in corner:
+        minx = paddingx
+        maxx = minx + sizex
+    else:
+        maxx = region_width - paddingx
+        minx = maxx - sizex
+    return minx, miny, maxx, maxy
+
+
+def get_scale(node_area: Rect, map_area: Rect) -> Tuple[float, float]:
+    """The scale factor between the node and map areas"""
+    node_width = node_area[2] - node_area[0]
+    node_height = node_area[3] - node_area[1]
+    return (
+        (map_area[2] - map_area[0]) / node_width if node_width else 0,
+        (map_area[3] - map_area[1]) / node_height if node_height else 0,
+    )
+
+
+def node_to_map(x, y, node_area: Rect, map_area: Rect) -> Tuple[float, float]:
+    """Converts coordinates from local node space to minimap space"""
+    node_width = node_area[2] - node_area[0]
+    node_height = node_area[3] - node_area[1]
+    facx = (x - node_area[0]) / node_width if node_width else 0
+    facy = (y - node_area[1]) / node_height if node_height else 0
+    return (
+        map_area[0] + facx * (map_area[2] - map_area[0]),
+        map_area[1] + facy * (map_area[3] - map_area[1]),
+    )
+
+
+def build_layout(records: List[NodeRecord], region_width, region_height, prefs: LayoutPrefs) -> Layout:
+    """Lay out a whole node tree, returning the node and minimap space rectangles of every node"""
+    absolute = get_absolute_locations(records)
+    children = get_children(records)
+    visual_locations, frame_used = get_visual_locations(records, absolute, children)
+    locs = np.array(visual_locations, dtype=np.float64).reshape(-1, 2)
+    dims = get_dims_array(records)
+    node_area = get_node_area(locs, dims)
+    map_area = get_map_area(region_width, region_height, node_area, prefs)
+    scale = get_scale(node_area, map_area)
+
+    # Both corners of every node are converted to minimap space at once
+    node_rects = np.hstack((locs, locs + dims))
+    node_min = np.tile(node_area[:2], 2)
+    map_min = np.tile(map_area[:2], 2)
+    map_rects = (node_rects - node_min) * np.tile(scale, 2) + map_min
+
+    return Layout(
+        node_area=node_area,
+        map_area=map_area,
+        scale=scale,
+        records=records,
+        visual_locations=locs,
+        node_rects=node_rects,
+        map_rects=map_rects,
+        frame_used=frame_used,
+        absolute_locations=absolute,
+        children=children,
+    )
+
+
+def get_ancestors(layout: Layout, indices) -> List[int]:
+    """Get the frames that any of the given nodes are inside, without duplicates"""
+    records = layout.records
+    ancestors = set()
+    for i in indices:
+        parent = records[i].parent
+        # Stop as soon as a frame that has already been seen is reached, as everything above it has been too
+        while parent != -1 and parent not in ancestors:
+            ancestors.add(parent)
+            parent = records[parent].parent
+    return list(ancestors)
+
+
+def get_depth(layout: Layout, i) -> int:
+    """Get how many frames a node is inside"""
+    records = layout.records
+    depth = 0
+    while records[i].parent != -1:
+        i = records[i].parent
+        depth += 1
+    return depth
+
+
+def relayout_nodes(layout: Layout, records: Dict[int, NodeRecord], bounds: Rect = None)\
+        -> Optional[Tuple[List[int], bool]]:
+    """Lay out a few nodes again, along with everything inside them and the frames that they're in, and update the
+    layout in place. records has the new record of each node that has changed, by index, and should include the
+    frames around them, as their size changes when their children move.
+
+    The minimap space rectangles are still worked out from the node and minimap areas of the layout, so nodes that
+    move past the edge of the tree are outside the minimap until the bounds are updated (see get_area_transform).
+    bounds is the current node area, if it has changed since the layout was built.
+    Returns the indices of the nodes that have changed, and whether the bounds of the tree have changed,
+    or None if a node has moved in or out of a frame, as the whole tree needs laying out again then."""
+    bounds = bounds or layout.node_area
+    old = layout.records
+    roots = []
+    for i, record in records.items():
+        if record.parent != old[i].parent or record.is_frame != old[i].is_frame:
+            return None
+        if record.location != old[i].location:
+            roots.append(i)
+        old[i] = record
+
+    # Everything inside a frame that has moved moves with it
+    absolute = layout.absolute_locations
+    children = layout.children
+    moved = set()
+    stack = roots
+    while stack:
+        i = stack.pop()
+        parent = old[i].parent
+        x, y = absolute[parent] if parent != -1 else (0, 0)
+        loc = old[i].location
+        absolute[i] = (x + loc[0], y + loc[1])
+        moved.add(i)
+        stack.extend(children[i])
+
+    changed = moved | set(records)
+    changed.update(get_ancestors(layout, records))
+    visual = layout.visual_locations
+    for i in changed:
+        if not old[i].is_frame:
+            visual[i] = absolute[i]
+    # Frames depend on their children, so go from the innermost frames outwards
+    frames = sorted((i for i in changed if old[i].is_frame), key=lambda i: get_depth(layout, i), reverse=True)
+    for i in frames:
+        visual[i] = get_frame_location(i, children, visual, absolute)
+
+    idx = np.fromiter(changed, dtype=np.int64, count=len(changed))
+    locs = visual[idx]
+    dims = get_dims_array([old[i] for i in idx])
+    node_rects = np.hstack((locs, locs + dims))
+    # The bounds can only have changed if one of these nodes was on the edge of the tree, or has gone past it.
+    # This means that the rest of the tree doesn't need looking at to find out
+    bounds_changed = touches_bounds(layout.node_rects[idx], bounds) or not inside_bounds(node_rects, bounds)
+    layout.node_rects[idx] = node_rects
+    node_min = np.tile(layout.node_area[:2], 2)
+    map_min = np.tile(layout.map_area[:2], 2)
+    layout.map_rects[idx] = (node_rects - node_min) * np.tile(layout.scale, 2) + map_min
+    return idx.tolist(), bounds_changed
+
+
+def touches_bounds(rects: np.ndarray, bounds: Rect) -> bool:
+    """Whether any of the rectangles are on the edge of the bounds"""
+    mins = np.minimum(rects[:, :2], rects[:, 2:])
+    maxs = np.maximum(rects[:, :2], rects[:, 2:])
+    return bool((mins <= bounds[:2]).any() or (maxs >= bounds[2:]).any())
+
+
+def inside_bounds(rects: np.ndarray, bounds: Rect) -> bool:
+    """Whether all of the rectangles are completely inside the bounds"""
+    mins = np.minimum(rects[:, :2], rects[:, 2:])
+    maxs = np.maximum(rects[:, :2], rects[:, 2:])
+    return bool((mins >= bounds[:2]).all() and (maxs <= bounds[2:]).all())
+
+
+def get_rects_area(node_rects: np.ndarray) -> Rect:
+    """Get the node area of a tree from the node rectangles of its layout, in the same way as get_node_area"""
+    rects = np.reshape(node_rects, (-1, 4))
+    return (
+        float(np.min(rects[:, 0], initial=10000)),
+        float(np.min(rects[:, 3], initial=10000)),
+        float(np.max(rects[:, 2], initial=-1000)),
+        float(np.max(rects[:, 1], initial=-1000)),
+    )
+
+
+def get_area_transform(from_node_area: Rect, from_map_area: Rect, node_area: Rect, map_area: Rect)\
+        -> Tuple[float, float, float]:
+    """Get the (scale, offset x, offset y) that moves minimap space positions worked out from one node and map area to
+    where they would be with another, in the same form as get_zoom_transform. Minimap positions are just scaled and
+    moved node positions, so this is the same for every node, and the batches can be drawn with it rather than being
+    made again when the bounds of the tree change. The map area keeps the shape of the node area, so x and y are
+    always scaled by the same amount"""
+    from_scale = get_scale(from_node_area, from_map_area)[0]
+    scale = get_scale(node_area, map_area)[0] / from_scale if from_scale else 1
+    # The min corner of the old map area is where the min corner of the old node area is drawn
+    x, y = node_to_map(from_node_area[0], from_node_area[1], node_area, map_area)
+    return scale, x - from_map_area[0] * scale, y - from_map_area[1] * scale
+
+
+def filter_links(links: np.ndarray, visible: np.ndarray) -> np.ndarray:
+    """Remove the links where either node isn't visible"""
+    links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+    visible = np.asarray(visible, dtype=bool)
+    return links[visible[links[:, 0]] & visible[links[:, 1]]]
+
+
+def collapse_reroutes(links: np.ndarray, is_reroute: np.ndarray) -> np.ndarray:
+    """Replace chains of reroutes with single links between the nodes at either end.
+    links is an (N, 2) array of the (from, to) node indices of each link.
+    Links into reroutes are removed, and the sources of links out of reroutes are followed back through the chain.
+    Reroutes that aren't connected to anything at the start are dropped, along with everything after them."""
+    links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+    is_reroute = np.asarray(is_reroute, dtype=bool)
+    if not is_reroute.any():
+        return links
+    into_reroute = is_reroute[links[:, 1]]
+    # Reroutes only have one input, so each one has at most one source
+    reroute_source = np.full(len(is_reroute), -1, dtype=np.int64)
+    reroute_source[links[into_reroute, 1]] = links[into_reroute, 0]
+
+    links = links[~into_reroute].copy()
+    sources = links[:, 0]
+    # Step every link back one reroute at a time, so this is done once per reroute in the longest chain
+    for _ in range(len(is_reroute)):
+        on_reroute = is_reroute[sources]
+        if not on_reroute.any():
+            break
+        sources[on_reroute] = reroute_source[sources[on_reroute]]
+        links = links[sources != -1]
+        sources = links[:, 0]
+    # Reroutes with several outputs going to the same node would otherwise give duplicate links
+    _, unique = np.unique(links[:, 0] * len(is_reroute) + links[:, 1], return_index=True)
+    return links[np.sort(unique)]
+
+
+def get_link_verts(links: np.ndarray, map_rects: np.ndarray, visible: np.ndarray = None, min_size=1) -> np.ndarray:
+    """Get the line vertices of the links between nodes in minimap space, as an (N * 2, 2) float32 array.
+    Links go from the middle of the right side of the from node to the middle of the left side of the to node.
+    Links where both nodes are smaller than min_size pixels, or where either node is not visible, are culled,
+    as they would just add noise to the minimap."""
+    links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+    rects = np.asarray(map_rects, dtype=np.float64).reshape(-1, 4)
+    mins = np.minimum(rects[:, :2], rects[:, 2:])
+    maxs = np.maximum(rects[:, :2], rects[:, 2:])
+    sizes = maxs - mins
+
+    small = (sizes < min_size).all(axis=1)
+    keep = ~(small[links[:, 0]] & small[links[:, 1]])
+    if visible is not None:
+        visible = np.asarray(visible, dtype=bool)
+        keep &= visible[links[:, 0]] & visible[links[:, 1]]
+    links = links[keep]
+
+    center_y = (mins[:, 1] + maxs[:, 1]) / 2
+    verts = np.empty((len(links), 2, 2), dtype=np.float32)
+    verts[:, 0, 0] = maxs[links[:, 0], 0]
+    verts[:, 0, 1] = center_y[links[:, 0]]
+    verts[:, 1, 0] = mins[links[:, 1], 0]
+    verts[:, 1, 1] = center_y[links[:, 1]]
+    return verts.reshape(-1, 2)
+
+
+def crop_rect(rect: Rect, bounds: Rect) -> Rect:
+    """Crop a rectangle to the inside of another one"""
+    x0 = min(max(rect[0], bounds[0]), bounds[2])
+    y0 = min(max(rect[1], bounds[1]), bounds[3])
+    x1 = max(min(rect[2], bounds[2]), bounds[0])
+    y1 = max(min(rect[3], bounds[3]), bounds[1])
+    return x0, y0, x1, y1
+
+
+def get_view_box(view_rect: Rect, node_area: Rect, map_area: Rect) -> Tuple[Rect, Rect]:
+    """Convert the rectangle of the region view from node space to minimap space.
+    Returns both the full rectangle, and the rectangle cropped to the minimap"""
+    x0, y0 = node_to_map(view_rect[0], view_rect[1], node_area, map_area)
+    x1, y1 = node_to_map(view_rect[2], view_rect[3], node_area, map_area)
+    full = (x0, y0, x1, y1)
+    return full, crop_rect(full, map_area)
+
+
+def get_zoom_window(node_area: Rect, zoom: float, center) -> Rect:
+    """Get the part of node space that the minimap shows when it is zoomed in by the given factor around center.
+    The window is kept inside the node area, so that zooming in never shows empty space past the edge of the tree"""
+    if zoom <= 1 or center is None:
+        return node_area
+    width = (node_area[2] - node_area[0]) / zoom
+    height = (node_area[3] - node_area[1]) / zoom
+    x0 = min(max(center[0] - width / 2, node_area[0]), node_area[2] - width)
+    y0 = min(max(center[1] - height / 2, node_area[1]), node_area[3] - height)
+    return x0, y0, x0 + width, y0 + height
+
+
+def get_zoom_transform(window: Rect, node_area: Rect, map_area: Rect) -> Tuple[float, float, float]:
+    """Get the transform that moves things from where they are in the whole minimap to where they are drawn
+    when only the given window of node space is shown, as (scale, offset x, offset y).
+    The window has the same aspect ratio as the node area, so the scale is the same on both axes"""
+    window_width = window[2] - window[0]
+    scale = (node_area[2] - node_area[0]) / window_width if window_width else 1
+    x0, y0 = node_to_map(window[0], window[1], node_area, map_area)
+    return scale, map_area[0] - x0 * scale, map_area[1] - y0 * scale
+
+
+def cull_link_verts(verts: np.ndarray, window: Rect) -> np.ndarray:
+    """Get the vertices of only the links that overlap the window, from the (N * 2, 2) vertices of get_link_verts.
+    Links are straight lines, so any link that goes through the window has a bounding box that overlaps it"""
+    lines = np.asarray(verts).reshape(-1, 2, 2)
+    mins = lines.min(axis=1)
+    maxs = lines.max(axis=1)
+    keep = (mins[:, 0] <= window[2]) & (maxs[:, 0] >= window[0]) & (mins[:, 1] <= window[3]) & (maxs[:, 1] >= window[1])
+    return lines[keep].reshape(-1, 2)
+
+
+def layout_label(
+    label: str,
+    map_rect: Rect,
+    measure: Callable[[str, float], Tuple[float, float]],
+    min_frame_size=20,
+    text_wrap=True,
+    min_size=50,
+) -> Tuple[float, List[LabelLine]]:
+    """Work out the font size and position of each line of a frame label.
+    measure(text, size) should return the width and height of the text at the given font size.
+    Returns the font size to draw with, and the lines to draw. If the frame is too small, no lines are returned"""
+    sizex = map_rect[2] - map_rect[0]
+    sizey = map_rect[3] - map_rect[1]
+    size = min(sizex, abs(sizey) * 5)
+    if size < min_frame_size or not label:
+        return 0, []
+    size = max(size, min_size)
+    centerx = map_rect[0] + sizex / 2
+
+    dims = measure(label, size)
+    posx = centerx - dims[0] / 2
+    posy = map_rect[1] - dims[1]
+    if not text_wrap:
+        return size, [LabelLine(label, posx, posy)]
+
+    words = label.split()
+    string = ""
+    prev_dims = (0, 0)
+    lines = []
+    heights = []
+    widths = []
+    for i, word in enumerate(words):
+        next_word = words[i + 1] if i != len(words) - 1 else ""
+        string = string + " " + word
+        dims = measure(string, size)
+
+        # check if next word will overlap with sides
+        next_dims = measure(string + next_word, size)
+        if next_dims[0] > size or i == len(words) - 1:
+            posy -= prev_dims[1] + dims[1] * 0.3
+            posx = centerx - dims[0] / 2
+            lines.append(LabelLine(string, posx, posy))
+            widths.append(dims[0])
+            heights.append(dims[1])
+            string = ""
+            prev_dims = dims
+
+    if not lines:
+        return 0, []
+    # Shrink the text if it doesn't fit in the frame
+    draw_size = size
+    if sum(heights) > sizey:
+        draw_size = max(int(abs(sizey)), min_size)
+    if max(widths) > sizex:
+        draw_size = max(int(abs(sizex)), min_size)
+    return draw_size, lines
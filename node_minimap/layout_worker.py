@@ -0,0 +1,154 @@
+"""
+Lays out node trees on a background thread, so that big rebuilds (like when moving lots of nodes in a huge tree)
+don't have to happen in the draw callback.
+
+The main thread takes a snapshot of the tree (a LayoutJob, made of plain python and numpy data, with no references
+to Blender data), and hands it to the worker. The worker lays it out and creates all of the vertex data, and stores the
+result, which the draw callback then swaps in the next time it runs. Only the newest job and result for each area are
+kept, so if the tree changes faster than it can be laid out, the old jobs are just skipped.
+"""
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from .layout import Layout, LayoutPrefs, NodeRecord, build_layout, collapse_reroutes, filter_links, get_link_verts
+from ..shared.helpers import RectArray
+
+# Trees with fewer nodes than this are laid out on the main thread, as it's fast enough that it's not worth the delay
+THREADED_LAYOUT_MIN = 1000
+
+
+@dataclass
+class LayoutJob():
+    """A snapshot of everything needed to lay out the minimap for one area"""
+    records: List[NodeRecord]
+    layout_indices: Dict[str, int]
+    region_width: int
+    region_height: int
+    prefs: LayoutPrefs
+    # The (from, to) node indices of each link, or None if links aren't shown
+    links: Optional[List[Tuple[int, int]]] = None
+    link_count: int = 0
+    # The hash of the links that the layout was made from. See get_link_key
+    link_key: Optional[int] = None
+    only_top_level: bool = False
+    # Used to ignore results that are older than the layout currently being shown
+    generation: int = 0
+
+
+@dataclass
+class LayoutResult():
+    job: LayoutJob
+    layout: Layout
+    map_rects: RectArray
+    node_rects: RectArray
+    quad_verts: object = None
+    line_verts: object = None
+    # The (from, to) node indices of the links that are drawn, after removing reroutes and hidden nodes
+    links: object = None
+    link_verts: object = None
+
+
+def compute_layout(job: LayoutJob) -> LayoutResult:
+    """Lay out the tree, and create the vertices for all nodes and links. This doesn't touch any Blender data,
+    so can be run on any thread"""
+    layout = build_layout(job.records, job.region_width, job.region_height, job.prefs)
+    map_rects = RectArray(layout.map_rects)
+    links = link_verts = None
+    if job.links:
+        links = collapse_reroutes(job.links, [record.is_reroute for record in job.records])
+        if job.only_top_level:
+            links = filter_links(links, [record.parent == -1 for record in job.records])
+        link_verts = get_link_verts(links, layout.map_rects)
+    return LayoutResult(
+        job=job,
+        layout=layout,
+        map_rects=map_rects,
+        node_rects=RectArray(layout.node_rects),
+        quad_verts=map_rects.quad_verts(),
+        line_verts=map_rects.line_verts(),
+        links=links,
+        link_verts=link_verts,
+    )
+
+
+class LayoutWorker():
+    """A single background thread that computes layouts for any number of areas"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        # The newest job that hasn't been started yet, and the newest finished result, for each area
+        self.jobs: Dict[str, LayoutJob] = {}
+        self.results: Dict[str, LayoutResult] = {}
+        self.current = None
+        self.thread = None
+        self.running = False
+
+    def submit(self, key, job: LayoutJob):
+        """Queue a job, replacing any job for the same area that hasn't been started yet"""
+        with self.condition:
+            self.jobs[key] = job
+            if not self.thread or not self.thread.is_alive():
+                self.running = True
+                self.thread = threading.Thread(target=self.run, name="Minimap layout", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def take(self, key) -> Optional[LayoutResult]:
+        """Get the newest result for an area, if there is one. This never waits for the worker,
+        if it happens to be storing a result at the same time, the result is just picked up next time"""
+        if not self.condition.acquire(blocking=False):
+            return None
+        try:
+            return self.results.pop(key, None)
+        finally:
+            self.condition.release()
+
+    def is_pending(self, key) -> bool:
+        """Whether there is a job for this area that hasn't finished yet"""
+        with self.condition:
+            return key in self.jobs or key == self.current
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.jobs:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                key, job = self.jobs.popitem()
+                self.current = key
+
+            try:
+                result = compute_layout(job)
+            except Exception:
+                traceback.print_exc()
+                result = None
+
+            with self.condition:
+                self.current = None
+                if result:
+                    self.results[key] = result
+
+    def discard(self, key):
+        """Forget any job or result for an area"""
+        with self.condition:
+            self.jobs.pop(key, None)
+            self.results.pop(key, None)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.jobs.clear()
+            self.results.clear()
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+
+layout_worker = LayoutWorker()
+
+
+def unregister():
+    layout_worker.stop()
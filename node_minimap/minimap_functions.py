@@ -1,56 +1,250 @@
 from __future__ import annotations
+import bpy
+import blf
 from mathutils import Vector as V
-from ..shared.helpers import Rectangle, vec_lerp, vec_multiply
-from ..shared.functions import get_prefs, pos_to_fac, get_node_dims, draw_lines_from_quad_2d
+from . import layout
+from .layout import Layout, LayoutPrefs, NodeRecord, build_layout
+from .layout_worker import LayoutJob
+from ..shared.helpers import Rectangle, vec_lerp
+from ..shared.resources import LazyModule
+from ..shared.functions import get_prefs, pos_to_fac, draw_lines_from_quad_2d
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Tuple
 if TYPE_CHECKING:
     from .shader_cache import ShaderCache, CacheContainer
 
+np = LazyModule("numpy")
+
+# The node attributes that are included in the tree fingerprint, with the number of values and type of each
+FINGERPRINT_ATTRS = [
+    ("location", 2, "f4"),
+    ("dimensions", 2, "f4"),
+    ("width", 1, "f4"),
+    ("color", 3, "f4"),
+    ("use_custom_color", 1, "?"),
+    ("select", 1, "?"),
+]
+
+# How many times each node tree has been updated by the depsgraph, by session uid
+tree_update_counts = {}
+
+# The operators that move or scale nodes interactively. The node editor runs most of them through macros,
+# like node.translate_attach for G, so those are included too
+TRANSFORM_OPERATORS = {
+    "transform.translate",
+    "transform.resize",
+    "transform.rotate",
+    "transform.transform",
+    "node.translate_attach",
+    "node.translate_attach_remove_on_cancel",
+    "node.detach_translate_attach",
+    "node.duplicate_move",
+    "node.duplicate_move_keep_inputs",
+    "node.duplicate_move_linked",
+    "node.move_detach_links",
+    "node.move_detach_links_release",
+    "node.resize",
+}
+
+
+def get_node_records(node_tree) -> List[NodeRecord]:
+    """Read the nodes of a tree into the plain records used by the layout engine"""
+    if not node_tree:
+        return []
+    nodes = list(node_tree.nodes)
+    indices = {node.name: i for i, node in enumerate(nodes)}
+    return [get_node_record(node, indices) for node in nodes]
+
+
+def get_node_record(node, indices) -> NodeRecord:
+    """Read a single node into a record. indices maps node names to their index"""
+    parent = node.parent
+    return NodeRecord(
+        name=node.name,
+        location=tuple(node.location),
+        width=node.width,
+        height=node.dimensions[1],
+        parent=indices[parent.name] if parent else -1,
+        is_frame=node.type == "FRAME",
+        is_reroute=node.type == "REROUTE",
+        label=node.label,
+    )
+
+
+def get_link_indices(node_tree, indices) -> List[Tuple[int, int]]:
+    """Read the links of a tree as (from, to) pairs of node indices. indices maps node names to their index"""
+    if not node_tree:
+        return []
+    return [
+        (indices[link.from_node.name], indices[link.to_node.name]) for link in node_tree.links if not link.is_hidden
+    ]
+
+
+def get_tree_key(node_tree):
+    """Get a key that identifies a node tree for this session, even if it is renamed"""
+    return getattr(node_tree, "session_uid", None) or node_tree.name
+
+
+def get_window_key(window) -> tuple:
+    """Get a key that identifies a window and the screen it is showing. Only the names are used,
+    as direct references to windows and screens can't be kept safely"""
+    return (str(window), window.screen.name)
+
+
+def get_operator_idname(operator) -> str:
+    """Get the python style idname of an operator (e.g. "node.select"), as running operators have the C style one"""
+    idname = operator.bl_idname
+    if "_OT_" in idname:
+        module, name = idname.split("_OT_", 1)
+        idname = f"{module.lower()}.{name}"
+    return idname
 
-def get_map_area(context, area, node_area) -> Rectangle:
-    """Returns a rectangle representing the size, shape and position of the minimap box"""
-    region = area.regions[3]
-    # We need to take into account the size of the header
-    region_height = region.height - (area.regions[0].height / 2)
-    region_height = region.height
 
+def is_transforming(context) -> bool:
+    """Whether nodes are being moved or scaled by a modal operator in the current window.
+    Window.modal_operators was only added in Blender 4.2, so in earlier versions this is always False"""
+    for operator in getattr(context.window, "modal_operators", ()):
+        if get_operator_idname(operator) in TRANSFORM_OPERATORS:
+            return True
+    return False
+
+
+def get_window_screen(context, window_key):
+    """Get the screen of the window with the given key,
+    or None if the window has been closed, or is showing a different screen now"""
+    for window in context.window_manager.windows:
+        if str(window) == window_key[0]:
+            screen = window.screen
+            return screen if screen.name == window_key[1] else None
+    return None
+
+
+def get_tree_fingerprint(node_tree) -> tuple:
+    """Get a cheap summary of everything in the tree that affects the minimap, that changes whenever any of it does.
+    The node attributes are all read with foreach_get and hashed together, so this is much faster than looking at
+    each node individually"""
+    return get_tree_data(node_tree)[0]
+
+
+def get_tree_data(node_tree) -> Tuple[tuple, Dict[str, np.ndarray]]:
+    """Get the fingerprint of the tree, along with the node attributes that it was made from, as an (N, size) array
+    for each of FINGERPRINT_ATTRS in the order of the nodes. Comparing these with the ones from the last update
+    finds the nodes that have changed, without having to look at every node from python"""
+    nodes = node_tree.nodes
+    count = len(nodes)
+    buffers = []
+    data = {}
+    for attr, size, dtype in FINGERPRINT_ATTRS:
+        buffer = np.empty(count * size, dtype=dtype)
+        nodes.foreach_get(attr, buffer)
+        buffers.append(buffer.tobytes())
+        data[attr] = buffer.reshape(count, size)
+    key = get_tree_key(node_tree)
+    names = tuple(nodes.keys())
+    fingerprint = (
+        key,
+        count,
+        len(node_tree.links),
+        hash(b"".join(buffers)),
+        hash(names),
+        tree_update_counts.get(key, 0),
+        # Node groups that aren't used anywhere don't get depsgraph updates, so relinking them has to be seen directly
+        get_link_key(node_tree, names),
+    )
+    return fingerprint, data
+
+
+def get_link_key(node_tree, node_names) -> int:
+    """Get a hash of which nodes each link connects, and whether it is hidden. Unlike the number of links, this changes
+    when a link is moved to another node, or when one link is removed and another added"""
+    indices = {name: i for i, name in enumerate(node_names)}
+    return hash(tuple(
+        (indices[link.from_node.name], indices[link.to_node.name], link.is_hidden) for link in node_tree.links
+    ))
+
+
+def get_node_pointers(node_tree) -> int:
+    """Get a hash of the memory addresses of the nodes in the tree. Nodes that are removed and added again with the
+    same names are different nodes, and the old ones are freed, so this is used to find out when the node caches'
+    references aren't valid anymore. It has to look at every node, so it isn't part of the fingerprint"""
+    return hash(tuple(node.as_pointer() for node in node_tree.nodes))
+
+
+def get_changed_rows(data: Dict[str, np.ndarray], other: Dict[str, np.ndarray], attrs=None) -> np.ndarray:
+    """Get the indices of the nodes that are different between two results of get_tree_data, going by the given
+    attributes, or all of them. Both need to have the same nodes in the same order"""
+    changed = np.zeros(len(data[FINGERPRINT_ATTRS[0][0]]), dtype=bool)
+    for attr in attrs or data:
+        changed |= (data[attr] != other[attr]).any(axis=1)
+    return np.flatnonzero(changed)
+
+
+@bpy.app.handlers.persistent
+def count_tree_updates(scene, depsgraph=None):
+    """Count depsgraph updates of node trees, so that changes that can't be read in bulk (like relinking nodes)
+    still change the fingerprint of the tree"""
+    if not depsgraph:
+        return
+    for update in depsgraph.updates:
+        data = update.id.original
+        node_tree = data if isinstance(data, bpy.types.NodeTree) else getattr(data, "node_tree", None)
+        if node_tree:
+            key = get_tree_key(node_tree)
+            tree_update_counts[key] = tree_update_counts.get(key, 0) + 1
+
+
+def get_layout_prefs(context, area) -> LayoutPrefs:
+    """Get the preferences that affect the layout of the minimap in the given area"""
     prefs = get_prefs(context)
-    size = min(max(region.width * prefs.size, prefs.min_size), prefs.max_size)
-    size = V((size, size))
-    size.y *= (node_area.size.y / node_area.size.x)
+    return LayoutPrefs(
+        size=prefs.size,
+        min_size=prefs.min_size,
+        max_size=prefs.max_size,
+        offset=tuple(prefs.offset),
+        anchor_corner=prefs.anchor_corner,
+        show_context_path=area.spaces[0].overlay.show_context_path,
+    )
 
-    padding = V(prefs.offset)
 
-    area_size = V([region.width, region_height])
-    corner = prefs.anchor_corner
+def get_layout(context, area, node_tree) -> Layout:
+    """Lay out the minimap for the given area and node tree"""
+    region = area.regions[3]
+    records = get_node_records(node_tree)
+    return build_layout(records, region.width, region.height, get_layout_prefs(context, area))
 
-    # If breadcrumbs are enabled, move the minimap down so they don't overlap
-    if corner == "TL":
-        show_path = area.spaces[0].overlay.show_context_path
-        if show_path:
-            padding.y += 30
 
-    min_co = V((0, 0))
-    max_co = V((0, 0))
+def get_layout_job(context, area, node_tree) -> LayoutJob:
+    """Take a snapshot of everything needed to lay out the minimap for the given area,
+    so that it can be laid out without touching any Blender data"""
+    prefs = get_prefs(context)
+    region = area.regions[3]
+    records = get_node_records(node_tree)
+    indices = {record.name: i for i, record in enumerate(records)}
+    show_links = prefs.show_links and prefs.show_non_frames
+    return LayoutJob(
+        records=records,
+        layout_indices=indices,
+        region_width=region.width,
+        region_height=region.height,
+        prefs=get_layout_prefs(context, area),
+        links=get_link_indices(node_tree, indices) if show_links else None,
+        link_count=len(node_tree.links) if node_tree else 0,
+        link_key=get_link_key(node_tree, tuple(indices)) if node_tree else None,
+        only_top_level=prefs.only_top_level,
+    )
 
-    # corner is a string in ["BL", "TR", "TL", "BR"] for bottom-left, top-right, etc.
-    if "B" in corner:
-        min_co.y = padding.y
-        max_co.y = min_co.y + size.y
-    else:
-        max_co.y = area_size.y - padding.y
-        min_co.y = max_co.y - size.y
 
-    if "L" in corner:
-        min_co.x = padding.x
-        max_co.x = min_co.x + size.x
-    else:
-        max_co.x = area_size.x - padding.x
-        min_co.x = max_co.x - size.x
+def get_map_area(context, area, node_area) -> Rectangle:
+    """Returns a rectangle representing the size, shape and position of the minimap box"""
+    region = area.regions[3]
+    node_rect = (*node_area.min, *node_area.max)
+    rect = layout.get_map_area(region.width, region.height, node_rect, get_layout_prefs(context, area))
+    return rect_to_rectangle(rect)
+
 
-    map_area = Rectangle(min_co=min_co, max_co=max_co)
-    return map_area
+def rect_to_rectangle(rect) -> Rectangle:
+    """Convert a rectangle tuple from the layout engine to a Rectangle"""
+    return Rectangle(rect[:2], rect[2:])
 
 
 def node_area_to_map_area(coords, node_area, map_area) -> V:
@@ -60,25 +254,112 @@ def node_area_to_map_area(coords, node_area, map_area) -> V:
     return loc
 
 
-def get_node_rect(node, node_area, map_area, scale, loc) -> Rectangle:
-    """Returns a rectangle representing the minimap version of this node"""
-    dims = node.dimensions.copy()
-    dims.x = node.width
-    dims.y *= -1
-    dims = get_node_dims(node)
-    dims = vec_multiply(dims, scale)
-    loc = node_area_to_map_area(loc, node_area, map_area)
-    node_rect = Rectangle(loc, loc + dims)
-    return node_rect
+def map_area_to_node_area(coords, node_area, map_area) -> V:
+    """Converts the coords from minimap space to local node space"""
+    fac = pos_to_fac(coords, map_area)
+    loc = vec_lerp(fac, node_area.min, node_area.max)
+    return loc
 
 
 def draw_view_box(view_area, node_area, map_area, color, line_width=2):
-    """Draw the box representing the 2D camera view"""
-    view_area.min = node_area_to_map_area(view_area.min, node_area, map_area)
-    view_area.max = node_area_to_map_area(view_area.max, node_area, map_area)
-    view_box = Rectangle(view_area.min, view_area.max)
-    view_box.crop(map_area)
-    draw_lines_from_quad_2d(view_box.coords, color, width=line_width)
+    """Draw the box representing the 2D camera view.
+    view_area is converted to minimap space in place, and the box is cropped to the edges of the minimap"""
+    full, cropped = layout.get_view_box(
+        (*view_area.min, *view_area.max),
+        (*node_area.min, *node_area.max),
+        (*map_area.min, *map_area.max),
+    )
+    view_area.min = V(full[:2])
+    view_area.max = V(full[2:])
+    draw_lines_from_quad_2d(rect_to_rectangle(cropped).coords, color, width=line_width)
+
+
+def get_view_rect(region) -> Rectangle:
+    """Returns a rectangle representing the area of node space currently shown in the region"""
+    region_to_view = region.view2d.region_to_view
+    return Rectangle(region_to_view(0, 0), region_to_view(region.width, region.height))
+
+
+def get_fitted_view_rect(target: Rectangle, region, padding=1.4) -> Rectangle:
+    """Returns a rectangle in node space that contains the target rectangle,
+    but with the same aspect ratio as the region so that it can be applied without distortion"""
+    target_min = target.true_min
+    size = target.true_max - target_min
+    center = target_min + size / 2
+    aspect = region.width / max(region.height, 1)
+    size.x = max(size.x, abs(size.y) * aspect)
+    size.y = size.x / aspect
+    half_size = size * padding / 2
+    return Rectangle(center - half_size, center + half_size)
+
+
+def set_view_rect(context, area, view_rect: Rectangle):
+    """Move the view of the area so that it shows the given rectangle in node space.
+    This is done with a single zoom border operator rather than by selecting nodes and calling view_selected,
+    so the selection isn't changed and the depsgraph isn't updated."""
+    region = area.regions[3]
+    view_to_region = region.view2d.view_to_region
+    rmin = view_to_region(*view_rect.true_min, clip=False)
+    rmax = view_to_region(*view_rect.true_max, clip=False)
+    with context.temp_override(area=area, space=area.spaces[0], region=region):
+        bpy.ops.view2d.zoom_border(
+            xmin=int(rmin[0]),
+            xmax=int(rmax[0]),
+            ymin=int(rmin[1]),
+            ymax=int(rmax[1]),
+            wait_for_input=False,
+        )
+
+
+def zoom_to_node(context, area, node_cache):
+    """Fit the view of the area to a cached node, using the cached node space rectangle"""
+    region = area.regions[3]
+    set_view_rect(context, area, get_fitted_view_rect(node_cache.view_rect, region))
+
+
+def center_view_on(context, area, point):
+    """Center the view of the area on a point in node space, without changing the zoom level"""
+    region = area.regions[3]
+    view_rect = get_view_rect(region)
+    offset = V(point) - view_rect.center
+    set_view_rect(context, area, view_rect + offset)
+
+
+HUD_PHASES = ["Change detection", "Batch rebuild", "Node draw", "Label draw", "View box"]
+
+
+def draw_performance_hud(shader_cache, area_cache, map_area, prefs):
+    """Draw the rolling average per frame timings of each phase of drawing the minimap next to it"""
+    timer = area_cache.timer
+    lines = [("Area bookkeeping", shader_cache.timer.get_time("Area bookkeeping"))]
+    lines += [(name, timer.get_time(name)) for name in HUD_PHASES]
+    total = sum(time for _, time in lines)
+    text = [f"{name}: {time * 1000:.3f} ms" for name, time in lines]
+    text.append(f"Total: {total * 1000:.3f} ms")
+    text.append(f"Nodes: {timer.get_count('Nodes'):.0f}")
+    text.append(f"Rebuilds: {timer.get_count('Rebuilds'):.1f}")
+    text.append(f"Skipped updates: {timer.get_count('Skipped updates') * 100:.0f}%")
+
+    if bpy.app.version < (4, 0, 0):
+        blf.size(0, 11, 72)
+    else:
+        blf.size(0, 11)
+    color = prefs.text_color
+    blf.color(0, color[0], color[1], color[2], color[3])
+    line_height = blf.dimensions(0, "Ag")[1] * 1.5
+    width = max(blf.dimensions(0, line)[0] for line in text)
+
+    # Draw on whichever side of the minimap is closest to the center of the area
+    padding = 10
+    if "L" in prefs.anchor_corner:
+        posx = map_area.maxx + padding
+    else:
+        posx = map_area.minx - padding - width
+    posy = map_area.miny + line_height * (len(text) - 1)
+    for line in text:
+        blf.position(0, posx, posy, 0)
+        blf.draw(0, line)
+        posy -= line_height
 
 
 def get_minimap_cache(context) -> CacheContainer:
@@ -88,4 +369,25 @@ def get_minimap_cache(context) -> CacheContainer:
 
 def get_shader_cache(context) -> ShaderCache:
     """Returns the scene shader cache"""
-    return get_minimap_cache(context).shader_cache
\ No newline at end of file
+    return get_minimap_cache(context).shader_cache
+
+
+def get_gpu_usage(context=None) -> dict:
+    """Get how much GPU memory the minimap is using, in bytes. The result has the total, the budget,
+    the usage of each area and of each (area, tree) pair, and the number of nodes and trees with batches.
+    Returns None if the minimap isn't enabled"""
+    context = context or bpy.context
+    shader_cache = get_shader_cache(context)
+    if not shader_cache:
+        return None
+    usage = shader_cache.gpu_resources.get_usage()
+    usage["budget"] = get_prefs(context).gpu_memory_budget * 1024 ** 2
+    return usage
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(count_tree_updates)
+
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(count_tree_updates)
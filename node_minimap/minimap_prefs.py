@@ -2,8 +2,10 @@ import bpy
 from bpy.props import BoolProperty, EnumProperty, FloatVectorProperty, FloatProperty, IntProperty, IntVectorProperty,\
     BoolVectorProperty
 from . import operators
+from ..shared import manifest
 from ..shared.functions import get_prefs
-from .minimap_functions import get_minimap_cache, get_shader_cache
+from .gpu_resources import format_size
+from .minimap_functions import get_gpu_usage, get_minimap_cache, get_shader_cache
 from ..shared.ui import draw_enabled_button, draw_inline_prop, draw_section
 from ..shared.icons import icon_collections
 
@@ -18,6 +20,8 @@ class MinimapAddonPrefs():
         shader_cache = get_shader_cache(context)
         if not shader_cache:
             return
+        # The caches of trees that aren't being shown would be out of date too
+        shader_cache.tree_caches.clear()
         for area_cache in shader_cache.areas.values():
             area_cache.tag_update = True
 
@@ -25,11 +29,17 @@ class MinimapAddonPrefs():
         shader_cache = get_shader_cache(context)
         if not shader_cache:
             return
+        shader_cache.tree_caches.clear()
         for area_cache in shader_cache.areas.values():
             area_cache.tag_update = True
             for node in area_cache.all_nodes:
                 node.update_color(context, node.node)
 
+    def update_tree_cache_size(self, context):
+        shader_cache = get_shader_cache(context)
+        if shader_cache:
+            shader_cache.tree_caches.resize(self.tree_cache_size)
+
     def update_label(self, context):
         return
 
@@ -68,14 +78,27 @@ class MinimapAddonPrefs():
         update=update_minimap,
     )
 
+    show_links: BoolProperty(
+        name="Show links",
+        description="Whether to draw the links between nodes. Chains of reroutes are drawn as a single link",
+        default=True,
+        update=update_minimap,
+    )
+
     zoom_to_nodes: BoolProperty(
-        name="Zoom to nodes (can be slow)",
-        description="""When a node is clicked in the minimap, focus on that node. Be aware that this causes a scene \
-update, so it's best to turn this off when using node trees that take a long time to evaluate""",
+        name="Zoom to nodes",
+        description="When a node is clicked in the minimap, focus on that node",
         default=True,
         update=update_minimap,
     )
 
+    scroll_zoom: BoolProperty(
+        name="Scroll to zoom",
+        description="""Whether scrolling over the minimap zooms it in and out, rather than zooming the view.\
+ While zoomed in, only the part of the tree that can be seen is drawn, and middle mouse dragging moves around it""",
+        default=True,
+    )
+
     show_non_full_frames: BoolProperty(
         name="Show non full frames",
         description="""Whether to show frames that don't contain any nodes. There currently isn't a good way to get\
@@ -186,6 +209,27 @@ the location of these nodes from the python api, so if this is on, they may appe
         update=update_minimap,
     )
 
+    highlight_color: FloatVectorProperty(
+        name="Highlight color",
+        description="The color used to highlight the node under the mouse, and the box select rectangle",
+        size=4,
+        subtype="COLOR",
+        default=(1, 1, 1, 0.6),
+        min=0,
+        max=1,
+        update=update_minimap,
+    )
+
+    search_color: FloatVectorProperty(
+        name="Search color",
+        description="The color used to outline the nodes that match the search",
+        size=4,
+        subtype="COLOR",
+        default=(1, 0.6, 0, 0.9),
+        min=0,
+        max=1,
+    )
+
     background_color: FloatVectorProperty(
         name="Background color",
         description="The color of the minimap background",
@@ -215,6 +259,33 @@ the location of these nodes from the python api, so if this is on, they may appe
         update=update_minimap,
     )
 
+    link_color: FloatVectorProperty(
+        name="Link color",
+        description="The color of the links between nodes",
+        size=4,
+        subtype="COLOR",
+        default=(0.6, 0.6, 0.6, 0.5),
+        min=0,
+        max=1,
+        update=update_minimap,
+    )
+
+    rounded_frames: BoolProperty(
+        name="Rounded frames",
+        description="Draw frames with rounded corners",
+        default=False,
+        update=update_minimap,
+    )
+
+    frame_corner_radius: FloatProperty(
+        name="Corner radius",
+        description="How rounded the corners of frames are",
+        default=5,
+        min=1,
+        max=20,
+        update=update_minimap,
+    )
+
     use_node_colors: BoolProperty(
         name="Use node colors",
         description="Whether to draw nodes with the colors of their categories",
@@ -270,6 +341,80 @@ the location of these nodes from the python api, so if this is on, they may appe
         subtype="PIXEL",
     )
 
+    # PERFORMANCE
+
+    show_performance_hud: BoolProperty(
+        name="Performance HUD",
+        description="Show the time taken by each part of drawing the minimap, averaged over the last few redraws",
+        default=False,
+    )
+
+    build_time_budget: FloatProperty(
+        name="Build time budget",
+        description="""When the minimap is first shown for a large node tree, it is built a bit at a time in the\
+ background, to avoid freezing the UI. This is how many milliseconds can be spent building it each time""",
+        default=8,
+        min=1,
+        max=100,
+        subtype="UNSIGNED",
+    )
+
+    threaded_layout: BoolProperty(
+        name="Background layout",
+        description="""Work out the layout of large node trees on a background thread, so that moving lots of nodes\
+ doesn't slow down the UI. The minimap may lag slightly behind the node editor while it's being done""",
+        default=True,
+    )
+
+    transform_update_rate: IntProperty(
+        name="Transform update rate",
+        description="""How many times per second the minimap is updated while nodes are being moved or scaled.\
+ Only the nodes that are moving are updated, and the bounds of the minimap stay the same until they are placed""",
+        default=30,
+        min=1,
+        soft_max=120,
+    )
+
+    tree_cache_size: IntProperty(
+        name="Tree cache size",
+        description="""The number of nodes to keep cached for trees that were shown recently, so that the minimap\
+ appears straight away when switching back to one of them. The least recently shown trees are removed first""",
+        default=50000,
+        min=0,
+        update=update_tree_cache_size,
+    )
+
+    prefetch_groups: BoolProperty(
+        name="Prefetch node groups",
+        description="""While you're not doing anything, build the minimaps of the node groups in the current tree\
+ in the background, so that they appear straight away when you go into one""",
+        default=True,
+    )
+
+    gpu_memory_budget: IntProperty(
+        name="GPU memory budget",
+        description="""The most GPU memory in MB that the minimap can use. When it uses more than this, the caches of\
+ the trees and areas that were drawn least recently are freed""",
+        default=256,
+        min=1,
+        max=16384,
+    )
+
+    record_trace: BoolProperty(
+        name="Record trace",
+        description="""Record how long each part of the minimap takes every frame, so that it can be saved as a trace\
+ and viewed in chrome://tracing or ui.perfetto.dev""",
+        default=False,
+    )
+
+    trace_buffer_size: IntProperty(
+        name="Trace length",
+        description="The number of most recent spans to keep when recording a trace",
+        default=20000,
+        min=1000,
+        max=1000000,
+    )
+
     sections = 6
     show_sections: BoolVectorProperty(
         name="Show section",
@@ -305,6 +450,7 @@ the location of these nodes from the python api, so if this is on, they may appe
             layout.separator(factor=factor)
             icon_value = icons["enable on load.png"].icon_id
             row.prop(prefs, "enable_on_load", text="", icon_value=icon_value, toggle=True)
+            draw_search(layout, context)
 
         # Grid flow allows the UI to adapt to areas of different widths.
         layout = layout.grid_flow(row_major=True, even_columns=True, columns=0 if is_prefs else 1)
@@ -317,17 +463,11 @@ the location of these nodes from the python api, so if this is on, they may appe
         draw_inline_prop(col, prefs, "enable_on_load", "Auto enable", factor=factor, alignment="LEFT")
         draw_inline_prop(col, prefs, "only_top_level", factor=factor, alignment="LEFT")
         draw_inline_prop(col, prefs, "show_non_frames", factor=factor, alignment="LEFT")
+        draw_inline_prop(col, prefs, "show_links", factor=factor, alignment="LEFT")
         draw_inline_prop(col, prefs, "show_non_full_frames", factor=factor, alignment="LEFT")
-        if context.area.type == "NODE_EDITOR" and len(context.space_data.node_tree.nodes) > 100\
-            and prefs.zoom_to_nodes and context.space_data.node_tree.type == "GEOMETRY":
-            row = col.row(align=True)
-            box = col.box().column(align=True)
-            row.alert = True
-            box.label(text="This node tree has more than 100")
-            box.label(text="nodes, evaluation may be slow")
-        else:
-            row = col.row(align=True)
+        row = col.row(align=True)
         draw_inline_prop(row, prefs, "zoom_to_nodes", factor=factor, alignment="LEFT")
+        draw_inline_prop(col, prefs, "scroll_zoom", factor=factor, alignment="LEFT")
 
         col = draw_section(layout, title="Shape", **show_args)
         factor = 0.3
@@ -341,8 +481,15 @@ the location of these nodes from the python api, so if this is on, they may appe
         draw_inline_prop(col, prefs, "line_width")
         draw_inline_prop(col, prefs, "outline_color")
         draw_inline_prop(col, prefs, "view_outline_color")
+        draw_inline_prop(col, prefs, "highlight_color")
+        draw_inline_prop(col, prefs, "search_color")
+        if prefs.show_links:
+            draw_inline_prop(col, prefs, "link_color")
         draw_inline_prop(col, prefs, "background_color", "Background")
         draw_inline_prop(col, prefs, "node_transparency")
+        draw_inline_prop(col, prefs, "rounded_frames")
+        if prefs.rounded_frames:
+            draw_inline_prop(col, prefs, "frame_corner_radius")
         draw_inline_prop(col, prefs, "use_node_colors", "One node color", invert=True)
         if not prefs.use_node_colors:
             draw_inline_prop(col, prefs, "node_color")
@@ -357,8 +504,54 @@ the location of these nodes from the python api, so if this is on, they may appe
         col = draw_section(layout, title="Controls", **show_args)
         col.label(text="Click and drag to pan the view")
         col.label(text="Double click to view all")
+        col.label(text="Shift/Ctrl drag to box select/deselect")
         if prefs.zoom_to_nodes:
             col.label(text="Click on a node to zoom to it")
+        col.label(text="Click on empty space to center the view")
+        col.label(text="Up/Down arrow over the minimap to go through search matches")
+        if prefs.scroll_zoom:
+            col.label(text="Scroll over the minimap to zoom it, and middle mouse drag to move it")
+
+        col = draw_section(layout, title="Performance", **show_args)
+        draw_inline_prop(col, prefs, "show_performance_hud")
+        draw_inline_prop(col, prefs, "build_time_budget")
+        draw_inline_prop(col, prefs, "threaded_layout")
+        draw_inline_prop(col, prefs, "transform_update_rate")
+        draw_inline_prop(col, prefs, "tree_cache_size")
+        draw_inline_prop(col, prefs, "prefetch_groups")
+        draw_inline_prop(col, prefs, "gpu_memory_budget")
+        usage = get_gpu_usage(context)
+        if usage:
+            areas, trees = len(usage["areas"]), len(usage["trees"])
+            col.label(text=f"GPU memory used: {format_size(usage['total'])} by {areas} areas and {trees} trees")
+        stats = manifest.stats
+        if stats["used_manifest"]:
+            saved = (stats["discovery_time"] - stats["time"]) * 1000
+            col.label(
+                text=f"Registered in {stats['time'] * 1000:.1f} ms using the cached manifest ({saved:.1f} ms saved)")
+        else:
+            col.label(text=f"Registered in {stats['time'] * 1000:.1f} ms")
+        draw_inline_prop(col, prefs, "record_trace")
+        if prefs.record_trace:
+            draw_inline_prop(col, prefs, "trace_buffer_size")
+            col.operator("node.minimap_save_trace", icon="EXPORT")
+
+
+def draw_search(layout: bpy.types.UILayout, context):
+    """Draw the search field, with buttons to go through the matches"""
+    row = layout.row(align=True)
+    row.prop(context.window_manager, "minimap_search", text="", icon="VIEWZOOM")
+    sub = row.row(align=True)
+    shader_cache = get_shader_cache(context)
+    area_cache = shader_cache.areas.get(str(context.area)) if shader_cache else None
+    sub.enabled = bool(area_cache and area_cache.search_matches)
+    sub.operator("node.minimap_search_cycle", text="", icon="TRIA_UP").backwards = True
+    sub.operator("node.minimap_search_cycle", text="", icon="TRIA_DOWN").backwards = False
+    if area_cache and context.window_manager.minimap_search:
+        count = len(area_cache.search_matches)
+        position = area_cache.search_position + 1
+        text = f"{position} of {count} matches" if position else f"{count} matches"
+        layout.label(text=text)
 
 
 @bpy.app.handlers.persistent
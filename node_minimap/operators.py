@@ -1,12 +1,23 @@
 import bpy
 from mathutils import Vector as V
+from ..shared.helpers import Rectangle
 from ..shared.functions import get_area, get_prefs
-from .minimap_functions import get_shader_cache
+from .minimap_functions import center_view_on, get_minimap_cache, get_shader_cache, map_area_to_node_area,\
+    zoom_to_node
 from .draw_handlers import draw_callback_px, handler_create
 from .shader_cache import ShaderCache
 
 handlers = []
 
+# How many times per second the view is moved while panning the minimap
+PAN_RATE = 60
+
+# How much each step of the scroll wheel zooms the minimap in or out
+MAP_ZOOM_STEP = 1.25
+
+# How far (in pixels) the mouse can move between pressing and releasing for it to still count as a click
+CLICK_DRAG_THRESHOLD = 3
+
 
 # Data class for storing event info
 class CustomEvent():
@@ -62,14 +73,22 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
     idx: bpy.props.IntProperty()
 
     def cancel(self, context):
+        self.remove_pan_timer(context)
         handlers.remove(self.handler)
         bpy.types.SpaceNodeEditor.draw_handler_remove(self.handler, 'WINDOW')
 
     def modal(self, context, event: bpy.types.Event):
+        trace = get_minimap_cache(context).trace
+        start = trace.begin()
+        result = self.handle_event(context, event)
+        trace.end("Modal event", start, "events", event=event.type, value=event.value, area=self.area)
+        return result
 
+    def handle_event(self, context, event: bpy.types.Event):
         prefs = get_prefs(context)
         area = get_area(self, context)
         if event.type in {'ESC'} or not prefs.is_enabled:
+            self.remove_pan_timer(context)
             context.window.cursor_modal_restore()
             bpy.types.SpaceNodeEditor.draw_handler_remove(self.handler, 'WINDOW')
             handlers.remove(self.handler)
@@ -78,6 +97,7 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
             return {'CANCELLED'}
 
         if not area:
+            self.remove_pan_timer(context)
             bpy.types.SpaceNodeEditor.draw_handler_remove(self.handler, 'WINDOW')
             handlers.remove(self.handler)
             return {'CANCELLED'}
@@ -97,10 +117,67 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
         if self.map_area:
             on_minimap = self.map_area.isinside(self.mouse_pos_abs)
 
-        self.prev_is_pannings.insert(0, self.is_panning)
-        # 7 seems to be the number of events that occur between clicking down and then releasing
-        if len(self.prev_is_pannings) > 7:
-            del self.prev_is_pannings[-1]
+        area_cache = None
+        shader_cache = get_shader_cache(context)
+        if shader_cache:
+            area_cache = shader_cache.areas.get(str(area))
+
+        # Middle mouse dragging moves the part of the tree shown while the minimap is zoomed in
+        if self.is_map_panning:
+            if event.type == 'MOUSEMOVE':
+                if area_cache:
+                    area_cache.pan_map(self.mouse_pos - self.prev_mouse_pos)
+                return {'RUNNING_MODAL'}
+            if event.type == "MIDDLEMOUSE" and event.value == "RELEASE":
+                self.is_map_panning = False
+                return {'RUNNING_MODAL'}
+
+        # The scroll wheel zooms the minimap around the mouse, rather than zooming the view
+        if on_minimap and area_cache and prefs.scroll_zoom:
+            if event.type in {"WHEELUPMOUSE", "WHEELDOWNMOUSE"}:
+                factor = MAP_ZOOM_STEP if event.type == "WHEELUPMOUSE" else 1 / MAP_ZOOM_STEP
+                area_cache.zoom_map(factor, self.mouse_pos_abs)
+                return {'RUNNING_MODAL'}
+            if event.type == "MIDDLEMOUSE" and event.value == "PRESS" and area_cache.is_zoomed:
+                self.is_map_panning = True
+                self.hover_node = None
+                return {'RUNNING_MODAL'}
+
+        # Box select is done by holding shift (select) or ctrl (deselect) and dragging on the minimap
+        if self.select_box:
+            if event.type == 'MOUSEMOVE':
+                self.select_box.max = self.mouse_pos_abs.copy()
+                return {'RUNNING_MODAL'}
+            if event.type == "LEFTMOUSE" and event.value == "RELEASE":
+                if area_cache:
+                    for node_cache in area_cache.get_nodes_in_rect(self.select_box):
+                        # Nodes might have been removed since the last redraw, so the held reference could be freed.
+                        # Look it up again by name, and skip the node if it's gone
+                        node_cache.resolve()
+                        node = node_cache.node
+                        if node:
+                            node.select = not self.box_deselect
+                self.select_box = None
+                return {'RUNNING_MODAL'}
+
+        if on_minimap and event.type == "LEFTMOUSE" and event.value == "PRESS" and (event.shift or event.ctrl):
+            self.select_box = Rectangle(self.mouse_pos_abs, self.mouse_pos_abs)
+            self.box_deselect = event.ctrl
+            return {'RUNNING_MODAL'}
+
+        # The arrow keys go through the search matches while the mouse is over the minimap
+        if on_minimap and area_cache and event.type in {"UP_ARROW", "DOWN_ARROW"} and event.value == "PRESS":
+            node_cache = area_cache.cycle_search(-1 if event.type == "UP_ARROW" else 1)
+            if node_cache:
+                zoom_to_node(context, area, node_cache)
+                return {'RUNNING_MODAL'}
+
+        # Find the node under the mouse so that it can be highlighted
+        if event.type == 'MOUSEMOVE':
+            hover_node = None
+            if on_minimap and area_cache and not self.is_panning:
+                hover_node = area_cache.get_node_at(self.mouse_pos_abs)
+            self.hover_node = hover_node
 
         if event.type == "LEFTMOUSE":
 
@@ -111,38 +188,35 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
             # If you know how please tell me :)
             if on_minimap and event.value != "RELEASE":
                 # Check for a double click by seeing if there is another mouse click in the most recent events
-                if event.type in self.prev_event_types:
+                self.is_double_click = event.type in self.prev_event_types
+                if self.is_double_click:
                     with context.temp_override(area=area, space=area.spaces[0], region=area.regions[3]):
                         bpy.ops.node.view_all()
+                self.press_pos = self.mouse_pos_abs.copy()
                 context.window.cursor_modal_set("SCROLL_XY")
-                self.is_panning = True
+                self.start_panning(context)
 
-            try:
-                area_cache = get_shader_cache(context).areas[str(area)]
-            except KeyError:
+            if not area_cache:
                 return {'PASS_THROUGH'}
 
-            # Zoom to node only if single click and not panning
-            # To get whether it is a single click we need to look at the past events to see
-            # whether is_panning was True then.
-            # This can be slow on heavy node trees as setting which nodes are selected seems to update the depsgraph...
-            # If anyone knows a way to stop this, it would be greatly appreciated
-            if prefs.zoom_to_nodes:
-                if on_minimap and (self.prev_is_pannings[-1] is not True and "PRESS" in self.prev_event_values):
-                    for node_cache in area_cache.all_nodes:
-                        if not node_cache.parent and node_cache.node_rect.isinside(self.mouse_pos_abs):
-                            node = node_cache.node
-                            node.id_data.nodes.active = node
-                            for n in node.id_data.nodes:
-                                n.select = False
-                            node.select = True
-                            with context.temp_override(area=area, space=area.spaces[0], region=area.regions[3]):
-                                bpy.ops.node.view_selected("EXEC_DEFAULT")
-                            break
+            # Zoom to node (or center the view on the clicked point) only when a single click is released, not after
+            # dragging to pan the view, or on the release that finishes a double click, as that would undo view_all.
+            # The view is moved directly from the cached node positions, so the selection isn't changed
+            if on_minimap and event.value == "RELEASE" and self.press_pos and not self.is_double_click and\
+                    (self.mouse_pos_abs - self.press_pos).length <= CLICK_DRAG_THRESHOLD:
+                # Any movement during the click isn't a drag, so it shouldn't move the view away from the target
+                self.pan_delta = V((0, 0))
+                node_cache = area_cache.get_node_at(self.mouse_pos_abs) if prefs.zoom_to_nodes else None
+                if node_cache:
+                    zoom_to_node(context, area, node_cache)
+                else:
+                    point = map_area_to_node_area(self.mouse_pos_abs, area_cache.zoom_window, area_cache.map_area)
+                    center_view_on(context, area, point)
 
             if event.value == "RELEASE":
+                self.press_pos = None
                 context.window.cursor_modal_restore()
-                self.is_panning = False
+                self.stop_panning(context, area)
 
         if on_minimap:
             self.prev_events.insert(0, CustomEvent(event))
@@ -150,11 +224,14 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
                 del self.prev_events[-1]
 
         if self.is_panning:
-            delta = self.mouse_pos - self.prev_mouse_pos
-            multiplier = 1 + (1 - prefs.size)
-            delta *= multiplier * (self.map_area.size.x / self.view_area.size.x)
-            with context.temp_override(area=area, space=area.spaces[0], region=area.regions[3]):
-                bpy.ops.view2d.pan(deltax=int(delta.x), deltay=int(delta.y))
+            # Accumulate the mouse movement, and only move the view once per timer tick,
+            # as calling the pan operator for every mouse event is slow with high polling rate mice.
+            if event.type == 'MOUSEMOVE':
+                delta = self.mouse_pos - self.prev_mouse_pos
+                multiplier = 1 + (1 - prefs.size)
+                self.pan_delta += delta * multiplier * (self.map_area.size.x / self.view_area.size.x)
+            elif event.type == 'TIMER':
+                self.flush_pan(context, area)
             return {'RUNNING_MODAL'}
         else:
             if on_minimap:
@@ -166,6 +243,40 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
 
         return {'PASS_THROUGH'}
 
+    def start_panning(self, context):
+        """Start a timer that is used to apply the accumulated pan delta once per redraw"""
+        if self.is_panning:
+            return
+        self.is_panning = True
+        self.pan_delta = V((0, 0))
+        self.pan_timer = context.window_manager.event_timer_add(1 / PAN_RATE, window=context.window)
+
+    def stop_panning(self, context, area):
+        """Apply any remaining pan delta, and remove the timer"""
+        if not self.is_panning:
+            return
+        self.flush_pan(context, area)
+        self.is_panning = False
+        self.remove_pan_timer(context)
+
+    def remove_pan_timer(self, context):
+        if self.pan_timer:
+            context.window_manager.event_timer_remove(self.pan_timer)
+            self.pan_timer = None
+
+    def flush_pan(self, context, area):
+        """Move the view by the whole pixels of the accumulated pan delta in a single operator call.
+        The fractional part is carried over to the next flush, so slow movements aren't lost."""
+        delta = self.pan_delta
+        deltax = round(delta.x)
+        deltay = round(delta.y)
+        if not deltax and not deltay:
+            return
+        delta.x -= deltax
+        delta.y -= deltay
+        with context.temp_override(area=area, space=area.spaces[0], region=area.regions[3]):
+            bpy.ops.view2d.pan(deltax=deltax, deltay=deltay)
+
     @property
     def prev_event_types(self):
         return [event.type for event in self.prev_events]
@@ -193,14 +304,78 @@ class MINIMAP_OT_DrawAreaMinimap(bpy.types.Operator):
         self.mouse_pos = V((0, 0))
         self.mouse_pos_abs = V((0, 0))
         self.is_panning = False
+        self.is_map_panning = False
+        self.pan_delta = V((0, 0))
+        self.pan_timer = None
+        self.hover_node = None
+        self.select_box = None
+        self.box_deselect = False
         self.prev_events = []
-        self.prev_is_pannings = []
+        # Where the left mouse button was pressed on the minimap, and whether that press was a double click
+        self.press_pos = None
+        self.is_double_click = False
         self.times = set()
 
         context.window_manager.modal_handler_add(self)
         return {'RUNNING_MODAL'}
 
 
+class MINIMAP_OT_CycleSearch(bpy.types.Operator):
+    """Move the view to the next node that matches the minimap search"""
+    bl_idname = "node.minimap_search_cycle"
+    bl_label = "Next search match"
+    bl_description = "Move the view to the next node that matches the search"
+
+    backwards: bpy.props.BoolProperty(
+        name="Backwards",
+        description="Go to the previous match instead",
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.area and context.area.type == "NODE_EDITOR" and get_shader_cache(context)
+
+    def execute(self, context):
+        area = context.area
+        area_cache = get_shader_cache(context).areas.get(str(area))
+        node_cache = area_cache.cycle_search(-1 if self.backwards else 1) if area_cache else None
+        if not node_cache:
+            self.report({"INFO"}, "No nodes match the search")
+            return {"CANCELLED"}
+        zoom_to_node(context, area, node_cache)
+        area.tag_redraw()
+        return {"FINISHED"}
+
+
+class MINIMAP_OT_SaveTrace(bpy.types.Operator):
+    """Save the recorded minimap trace as a json file, which can be opened in chrome://tracing or ui.perfetto.dev"""
+    bl_idname = "node.minimap_save_trace"
+    bl_label = "Save minimap trace"
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH", default="minimap_trace.json")
+
+    filter_glob: bpy.props.StringProperty(default="*.json", options={"HIDDEN"})
+
+    @classmethod
+    def poll(cls, context):
+        return bool(get_minimap_cache(context).trace.events)
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        trace = get_minimap_cache(context).trace
+        filepath = bpy.path.ensure_ext(self.filepath, ".json")
+        try:
+            trace.save(filepath)
+        except OSError as e:
+            self.report({'ERROR'}, f"Could not save trace: {e}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Saved {len(trace.events)} spans to {filepath}")
+        return {'FINISHED'}
+
+
 def unregister():
     # Removes handlers left over if the operator is not stopped before reloading the addon
     global handlers
@@ -0,0 +1,134 @@
+"""
+An inverted index for finding nodes by their name, label or type.
+
+Each node is split into lowercase tokens (e.g. "ShaderNodeMath" gives "shadernodemath", "shader", "node" and "math"),
+and the index maps every token to the nodes that have it. A query is split in the same way, and a node matches if every
+word of the query is the start of one of its tokens, so looking up a query only touches the nodes that match it.
+
+The index is updated as nodes are added to and removed from the area cache, rather than being built again for each
+query. This doesn't use Blender, so the items can be anything hashable (they are node caches in practice).
+"""
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, Set
+
+# Runs of letters and numbers, which are the words of names and queries
+WORD_RE = re.compile(r"[^\W_]+")
+# The parts of a camel case word, e.g. "ShaderNodeMath" or "RGBCurve"
+CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+@lru_cache(maxsize=4096)
+def get_text_tokens(text: str) -> frozenset:
+    """Split some text into the tokens that are stored in the index.
+    This is cached, as most of the text of a tree (node types and default names) is the same for lots of nodes"""
+    tokens = set()
+    for word in WORD_RE.findall(text):
+        tokens.add(word.lower())
+        parts = CAMEL_RE.findall(word)
+        if len(parts) > 1:
+            tokens.update(part.lower() for part in parts)
+    return frozenset(tokens)
+
+
+def get_tokens(texts: Iterable[str]) -> Set[str]:
+    tokens = set()
+    for text in texts:
+        if text:
+            tokens |= get_text_tokens(text)
+    return tokens
+
+
+def get_query_words(query: str) -> list[str]:
+    """Split a search query into the words that each need to match"""
+    return [word.lower() for word in WORD_RE.findall(query)]
+
+
+class SearchIndex():
+    """Maps tokens to the items that have them"""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[Hashable]] = {}
+        self.item_tokens: Dict[Hashable, Set[str]] = {}
+        # All tokens in order, for finding the ones that start with a query word. This is only sorted again when a
+        # token is added or removed, which doesn't happen very often once a tree has been indexed
+        self.sorted_tokens = []
+        self.is_sorted = True
+        # Incremented whenever anything changes, so that the results of a query can be reused until then
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.item_tokens)
+
+    def __contains__(self, item):
+        return item in self.item_tokens
+
+    def add(self, item, texts: Iterable[str]):
+        """Add an item to the index, or update it if its text has changed"""
+        tokens = get_tokens(texts)
+        current = self.item_tokens.get(item)
+        if current == tokens:
+            return
+        if current is not None:
+            self.remove(item)
+        self.item_tokens[item] = tokens
+        for token in tokens:
+            items = self.postings.get(token)
+            if items is None:
+                items = self.postings[token] = set()
+                self.is_sorted = False
+            items.add(item)
+        self.generation += 1
+
+    def remove(self, item):
+        tokens = self.item_tokens.pop(item, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            items = self.postings[token]
+            items.discard(item)
+            if not items:
+                del self.postings[token]
+                self.is_sorted = False
+        self.generation += 1
+
+    def clear(self):
+        self.postings.clear()
+        self.item_tokens.clear()
+        self.sorted_tokens = []
+        self.is_sorted = True
+        self.generation += 1
+
+    def get_prefix_matches(self, prefix: str) -> Set[Hashable]:
+        """Get all items with a token that starts with prefix.
+        If only one token does, its set is returned directly rather than copied, so it mustn't be modified"""
+        if not self.is_sorted:
+            self.sorted_tokens = sorted(self.postings)
+            self.is_sorted = True
+        tokens = self.sorted_tokens
+        postings = self.postings
+        start = end = bisect_left(tokens, prefix)
+        while end < len(tokens) and tokens[end].startswith(prefix):
+            end += 1
+        if end - start == 1:
+            return postings[tokens[start]]
+        matches = set()
+        for i in range(start, end):
+            matches |= postings[tokens[i]]
+        return matches
+
+    def query(self, query: str) -> Set[Hashable]:
+        """Get the items that match every word of the query.
+        The result can be a set that belongs to the index, so it mustn't be modified"""
+        words = get_query_words(query)
+        if not words:
+            return set()
+        # Start with the word with the fewest matches, so that the intersections are as small as possible
+        results = sorted((self.get_prefix_matches(word) for word in words), key=len)
+        matches = results[0]
+        for result in results[1:]:
+            if not matches:
+                break
+            matches = matches & result
+        return matches
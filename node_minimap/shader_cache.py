@@ -1,11 +1,23 @@
 import bpy
 import blf
+from collections import deque
+from time import perf_counter
 from typing import Dict, List
 from mathutils import Vector as V
-from ..shared.helpers import get_active_tree, get_alt_node_tree_name, vec_divide
+from .layout import collapse_reroutes, cull_link_verts, filter_links, get_ancestors, get_area_transform,\
+    get_link_verts, get_rects_area, get_scale, get_zoom_transform, get_zoom_window, layout_label, node_to_map,\
+    relayout_nodes
+from ..shared.helpers import DummyTimer, DummyTraceRecorder, FrameTimer, LRUCache, Polygon, RectArray, Rectangle,\
+    SpatialGrid, TraceRecorder, get_active_group_path, get_alt_node_tree_name
 from ..shared.functions import draw_lines_from_quads_2d_batch, draw_quads_2d_batch, get_batch_from_quads_2d,\
-    get_batch_lines_from_quads_2d, get_node_area, get_node_color, get_node_loc, get_prefs
-from .minimap_functions import get_map_area, get_node_rect
+    get_batch_from_verts_2d, get_batch_lines_from_quads_2d, get_node_color, get_prefs, pos_to_fac
+from .gpu_resources import MAP_BATCHES_SIZE, GPUResources, get_verts_size
+from .layout_worker import THREADED_LAYOUT_MIN, LayoutResult, compute_layout, layout_worker
+from .search import SearchIndex
+from .minimap_functions import get_changed_rows, get_layout_job, get_link_indices, get_link_key, get_map_area,\
+    get_node_pointers, get_node_record, get_shader_cache, get_tree_data, get_tree_key, get_window_key,\
+    get_window_screen, is_transforming, map_area_to_node_area, rect_to_rectangle
+from ..shared.resources import LazyModule
 """
 The caching system makes understanding how the minimap drawing works quite a lot harder, so if you want to do that,
 I'd advise getting the first release on GitHub, and looking at that first. It will be a lot slower though.
@@ -19,81 +31,937 @@ rather than every redraw like previously.
 """
 
 
+np = LazyModule("numpy")
+
+# The number of new nodes above which their caches are built over several redraws, rather than all at once
+INCREMENTAL_BUILD_MIN = 500
+
+# How long the user needs to be idle for before the node groups in the current tree are prefetched
+PREFETCH_DELAY = 0.5
+
+# Areas that have been drawn more recently than this (in seconds) are never freed to stay under the GPU memory budget,
+# as they would just be built again straight away
+AREA_EVICT_DELAY = 1
+
+# The fraction of the nodes that can move before the whole tree is laid out again, rather than just the moved ones,
+# as laying out lots of nodes one by one is slower than doing it all in one go
+PARTIAL_RELAYOUT_MAX = 0.2
+
+# How far the minimap can be zoomed in, as a multiple of the size that fits the whole tree
+MAX_MAP_ZOOM = 64
+
+# Everything that the area cache stores about the tree it is showing, which is kept when switching to another tree
+TREE_STATE_ATTRS = [
+    "all_nodes",
+    "node_lookup",
+    "index",
+    "build_queue",
+    "layout",
+    "layout_indices",
+    "node_area",
+    "map_area",
+    "scale",
+    "node_rects",
+    "map_rects",
+    "base_transform",
+    "quad_verts",
+    "line_verts",
+    "quad_batch",
+    "outline_batch",
+    "link_batch",
+    "links",
+    "link_verts",
+    "link_count",
+    "link_key",
+    "link_size",
+    "search_index",
+    "map_zoom",
+    "zoom_center",
+    "fingerprint",
+    "node_data",
+    "node_pointers",
+    "region_size",
+    "current_tree_key",
+    "reference_generation",
+]
+
+
 class CacheContainer():
     """Only here because you can't modify top level attributes,
     and a new instance of ShaderCache is created every time the operator is run"""
     shader_cache = None
+    # Records spans for saving as a Chrome trace. This is a dummy unless enabled in the preferences
+    trace = DummyTraceRecorder()
+    # Incremented whenever the references to nodes held by the caches might have become invalid (e.g. after undo),
+    # so that node caches can tell if theirs are stale. See NodeCache.node
+    reference_generation = 0
+
+    @classmethod
+    def set_tracing(cls, enabled, max_events=20000):
+        """Switch between a real and dummy trace recorder, or resize the buffer of the current one"""
+        if enabled == cls.trace.enabled and (not enabled or max_events == cls.trace.max_events):
+            return
+        cls.trace = TraceRecorder(max_events) if enabled else DummyTraceRecorder()
 
 
 class ShaderCache():
     """
     The global cache for areas and nodes. The hierarchy is like this:
-    Scene -> ShaderCache -> AreaCache -> NodeCache
+    Scene -> ShaderCache -> WindowCache -> AreaCache -> NodeCache
     where '->' means 'parent of'.
     """
 
     def __init__(self):
-        """This level doesn't cache anything, it just acts as a parent for the currently visible areas."""
+        """This level doesn't cache anything, it just acts as a parent for the open windows,
+        and holds the data that is shared between them."""
+        self.windows = {}
+        self.windows: Dict[tuple, WindowCache]
+        # The area caches of every window, keyed by area name, as that's how they're usually looked up.
+        # Area names are unique across all windows, so they don't clash
         self.areas = {}
         self.areas: Dict[str, AreaCache]
+        # The size of every GPU batch created by the caches, by area, tree and node
+        self.gpu_resources = GPUResources()
+        # The caches of trees that have been shown in each area recently, keyed by (area name, tree key),
+        # so that switching back to them doesn't mean building everything again
+        self.tree_caches = LRUCache(get_prefs(bpy.context).tree_cache_size, on_evict=self.forget_tree_state)
+        # Timers used for the performance HUD. These are dummies unless it is enabled
+        self.timer = DummyTimer()
+
+    @property
+    def is_timing(self):
+        return isinstance(self.timer, FrameTimer)
+
+    def set_timing(self, enabled):
+        """Switch the timers of this and all area caches between real and dummy timers"""
+        if enabled == self.is_timing:
+            return
+        self.timer = FrameTimer() if enabled else DummyTimer()
+        for area_cache in self.areas.values():
+            area_cache.timer = FrameTimer() if enabled else DummyTimer()
 
     @property
     def area_ids(self):
         """Return a list of area ids (str(area))"""
-        return {cache.area_name for cache in self.areas.values()}
+        return set(self.areas.keys())
 
     def update(self, context):
         """Called once per redraw
-        This checks to see if there are any new areas, or if any have been removed,
-        and adds/removes the respective AreaCache"""
+        This checks to see if there are any new areas in the window being drawn, or if any have been removed,
+        and adds/removes the respective AreaCache. The areas of other windows are left alone, so that they don't
+        need to be built again when they are next drawn, unless the window has been closed."""
+        window_key = get_window_key(context.window)
+        window_cache = self.windows.get(window_key)
+        if not window_cache:
+            window_cache = self.windows[window_key] = WindowCache(window_key)
+
         area_names = set()
         for area in context.screen.areas:
             if area.type == "NODE_EDITOR" and area.spaces[0].node_tree:
                 area_names.add(str(area))
 
-                if str(area) not in self.area_ids:
-                    self.areas[str(area)] = AreaCache(context, area)
+                if str(area) not in window_cache.areas:
+                    area_cache = AreaCache(context, area, timing=self.is_timing)
+                    window_cache.areas[str(area)] = area_cache
+                    self.areas[str(area)] = area_cache
+
+        for cache in [c for c in window_cache.areas.values() if c.area_name not in area_names]:
+            self.remove_area(cache)
 
-        remove = set()
-        for cache in self.areas.values():
-            if cache.area_name not in area_names:
-                remove.add(cache)
+        # Remove windows that have been closed, or that are showing a different screen now
+        if len(self.windows) > 1:
+            open_keys = {get_window_key(window) for window in context.window_manager.windows}
+            for key in [key for key in self.windows if key not in open_keys]:
+                for cache in list(self.windows[key].areas.values()):
+                    self.remove_area(cache)
+                del self.windows[key]
 
-        for cache in remove:
+        self.enforce_gpu_budget(context)
+
+    def remove_area(self, cache: "AreaCache"):
+        """Remove an area cache, along with everything that is stored for it"""
+        window_cache = self.windows.get(cache.window_key)
+        if window_cache:
+            window_cache.areas.pop(cache.area_name, None)
+        if self.areas.get(cache.area_name) is cache:
             del self.areas[cache.area_name]
+        layout_worker.discard(cache.area_name)
+        self.tree_caches.remove_where(lambda key: key[0] == cache.area_name)
+        self.gpu_resources.remove_area(cache.area_name)
+
+    def forget_tree_state(self, key, state):
+        """Called when the cache of a tree that isn't shown is removed from the tree caches"""
+        self.gpu_resources.remove_tree(*key)
+
+    def enforce_gpu_budget(self, context):
+        """Free the least recently used caches until the GPU memory used by the minimap is under the budget.
+        Trees that aren't being shown go first, and then areas that haven't been drawn for a while,
+        such as those in other windows. Areas are created again when they are next drawn."""
+        resources = self.gpu_resources
+        budget = get_prefs(context).gpu_memory_budget * 1024 ** 2
+        if resources.total_size <= budget:
+            return
+        trace = CacheContainer.trace
+        start = trace.begin()
+        freed = resources.total_size
+        while resources.total_size > budget and len(self.tree_caches):
+            self.tree_caches.evict_oldest()
+
+        # The areas of the window being drawn are about to be used, so they are always kept
+        now = perf_counter()
+        window_key = get_window_key(context.window)
+        stale = [
+            cache for cache in self.areas.values()
+            if cache.window_key != window_key and now - cache.last_drawn > AREA_EVICT_DELAY
+        ]
+        for cache in sorted(stale, key=lambda cache: cache.last_drawn):
+            if resources.total_size <= budget:
+                break
+            self.remove_area(cache)
+        self.timer.count("GPU evictions")
+        trace.end("GPU budget", start, "cache", freed=freed - resources.total_size)
+
+    def refresh_references(self):
+        """Resolve the nodes of every shown area again, after an undo or anything else that invalidates them.
+        Trees that aren't shown right now are resolved when they next are (see AreaCache.update)"""
+        for area_cache in self.areas.values():
+            node_tree = area_cache.node_tree
+            if node_tree and get_tree_key(node_tree) == area_cache.current_tree_key:
+                area_cache.refresh_references(node_tree)
+
+
+class WindowCache():
+    """Represents a window showing a particular screen, and holds the caches of the areas in it"""
+
+    def __init__(self, window_key):
+        self.window_key = window_key
+        self.areas = {}
+        self.areas: Dict[str, AreaCache]
 
 
 class AreaCache():
     """Represents an area, and caches it's attributes (mainly size and node tree)"""
 
-    def __init__(self, context, area):
+    def __init__(self, context, area, timing=False):
         """Store initial cached attributes"""
+        self.timer = FrameTimer() if timing else DummyTimer()
         self.all_nodes = []
         self.all_nodes: List[NodeCache]
+        # The same node caches by node name
+        self.node_lookup: Dict[str, NodeCache] = {}
+        # Spatial index of the minimap space node rectangles, used for picking nodes under the mouse
+        self.index = SpatialGrid()
+        # The names of nodes that still need a cache when building incrementally. See start_build
+        self.build_queue = deque()
+        # All links are drawn with a single batch, which is None if there are no links to draw
+        self.link_batch = None
+        # The (from, to) node indices of the links that are drawn, for moving them without reading them again
+        self.links = None
+        self.link_verts = None
+        self.link_count = 0
+        # The hash of the links that the link batch was made from, so that it's made again when they're reconnected
+        self.link_key = None
+        self.link_size = 0
+        # The node caches whose location or width has changed in the current update. See NodeCache.update
+        self.moved_nodes: List[NodeCache] = []
+        # Whether nodes are being moved or scaled, and the nodes that were selected when it started.
+        # See update_transform
+        self.in_transform = False
+        self.transform_nodes: List[NodeCache] = []
+        self.last_transform_update = 0
+        self.redraw_scheduled = False
+        # The names, labels and types of the cached nodes, for searching. See update_search
+        self.search_index = SearchIndex()
+        self.search_key = None
+        self.search_matches: List[NodeCache] = []
+        self.search_position = -1
+        # The outlines of all nodes that match the search are drawn with a single batch
+        self.search_batch = None
+        self.search_size = 0
+        # How far the minimap is zoomed in, and the node space point it is zoomed in around. See update_zoom
+        self.map_zoom = 1
+        self.zoom_center = None
+        self.zoom_key = None
+        # The nodes that can be seen while zoomed in, in the order they are drawn, or None if it isn't zoomed in
+        self.visible_nodes = None
+        # The (scale, offset x, offset y) from the whole minimap to the part being shown
+        self.map_transform = (1, 0, 0)
+        # The batches are made in the minimap space of the last full layout, so if the bounds of the tree have changed
+        # since then, this (scale, offset x, offset y) moves them to where they are now. See update_bounds
+        self.base_transform = (1, 0, 0)
+        self.bounds_outdated = False
+        # Only the links that can be seen while zoomed in are drawn, with their own batch
+        self.zoom_link_batch = None
+        self.zoom_link_size = 0
+        # Layouts are numbered so that ones finished by the background thread can be ignored if they're out of date
+        self.layout_generation = 0
+        self.applied_generation = 0
+        self.waiting_for_layout = False
+        shader_cache = get_shader_cache(context)
+        self.gpu_resources = shader_cache.gpu_resources if shader_cache else GPUResources()
+        self.last_drawn = perf_counter()
+        # The reference generation that the node caches were last resolved in
+        self.reference_generation = CacheContainer.reference_generation
         self.area_name = str(area)
+        # The window and screen that the area is in, as the area might not be in the screen of the current context
+        self.window_key = get_window_key(context.window)
+        self.area_index = 0
+        # The key that the path to the active group was last worked out for. See node_tree
+        self.tree_path_key = None
+        self.group_path = None
         # get size (regions[0]) minus the n-panel (regions[1])
         self.region_size = V((area.regions[0].width - area.regions[1].width, area.regions[0].height))
-        self.update_areas(context, force=True)
-        self.current_node_tree_name = self.node_tree.name
+        # Used to lay out a tree other than the one shown in the area, when prefetching
+        self.tree_override = None
+        self.prefetch_scheduled = False
+        self.last_change = perf_counter()
+        self.current_tree_key = get_tree_key(self.node_tree)
+        self.update_areas(context, force=True, wait=True)
         self.tag_update = False
+        self.nodes_added = False
+        # The fingerprint of the tree at the last update, and how many updates have been skipped because of it
+        self.fingerprint = None
+        # The node attributes that the fingerprint was made from, used to find the nodes that have changed
+        self.node_data = None
+        # The hash of the node addresses, checked when the fingerprint changes. See get_node_pointers
+        self.node_pointers = None
+        self.skipped_updates = 0
+        self.full_updates = 0
         self.quad_batch = get_batch_from_quads_2d(self.map_area.coords)
         self.outline_batch = get_batch_lines_from_quads_2d(self.map_area.coords)
 
-    def update_areas(self, context, force=False):
+    def update_areas(self, context, force=False, wait=False):
         """Update cached node and map area
         (the rectangles representing local node space and minimap space respectively), along with region size and scale
-        (The scale factor between the node and map areas)"""
+        (The scale factor between the node and map areas).
+        For big trees the layout is done on a background thread, and swapped in by swap_layout once it's finished,
+        unless wait is True, which is needed when nodes have been added, as their caches need the new layout."""
         # get size (regions[0]) minus the n-panel (regions[1])
         current_size = V((self.area.regions[0].width - self.area.regions[1].width, self.area.regions[0].height))
         if force or self.region_size != current_size:
-            self.node_area = get_node_area(self.node_tree)
-            self.map_area = get_map_area(context, self.area, self.node_area)
-            self.scale = vec_divide(self.map_area.size, self.node_area.size)
-            self.quad_batch = get_batch_from_quads_2d(self.map_area.coords)
-            self.outline_batch = get_batch_lines_from_quads_2d(self.map_area.coords)
-            for node_cache in self.all_nodes:
-                node_cache.update_loc_dims(node_cache.node)
             self.region_size = current_size
+            prev_phase = self.timer.switch("Batch rebuild")
+            # Take a snapshot of the whole tree to be laid out in one go, rather than node by node,
+            # as the locations of frames depend on their children
+            job = get_layout_job(context, self.area, self.node_tree)
+            self.layout_generation += 1
+            job.generation = self.layout_generation
+            if wait or not get_prefs(context).threaded_layout or len(job.records) < THREADED_LAYOUT_MIN:
+                self.apply_layout(context, compute_layout(job))
+            else:
+                layout_worker.submit(self.area_name, job)
+                if not self.waiting_for_layout:
+                    self.waiting_for_layout = True
+                    bpy.app.timers.register(self.check_layout, first_interval=0.005)
+            self.timer.switch(prev_phase)
+
+    def apply_layout(self, context, result: LayoutResult):
+        """Update the cache from a finished layout"""
+        trace = CacheContainer.trace
+        start = trace.begin()
+        self.applied_generation = result.job.generation
+        self.layout = result.layout
+        self.layout_indices = result.job.layout_indices
+        self.node_area = rect_to_rectangle(self.layout.node_area)
+        self.map_area = rect_to_rectangle(self.layout.map_area)
+        self.scale = V(self.layout.scale)
+        self.node_rects = result.node_rects
+        self.map_rects = result.map_rects
+        self.base_transform = (1, 0, 0)
+        self.bounds_outdated = False
+        # The vertices for every node are created at once, and then sliced for each node batch
+        self.quad_verts = result.quad_verts
+        self.line_verts = result.line_verts
+        self.quad_batch = get_batch_from_quads_2d(self.map_area.coords)
+        self.outline_batch = get_batch_lines_from_quads_2d(self.map_area.coords)
+        for node_cache in self.all_nodes:
+            node_cache.update_loc_dims(node_cache.node)
+        self.link_count = result.job.link_count
+        self.link_key = result.job.link_key
+        self.links = result.links
+        self.set_link_verts(result.link_verts)
+        trace.end("Rebuild", start, "cache", area=self.area_name, nodes=len(self.all_nodes))
+
+    def swap_layout(self, context):
+        """Swap in the newest layout from the background thread, if one has finished since the last redraw"""
+        result = layout_worker.take(self.area_name)
+        # A layout might have been done on the main thread since the job was started, which is always newer
+        if result and result.job.generation > self.applied_generation:
+            prev_phase = self.timer.switch("Batch rebuild")
+            self.apply_layout(context, result)
+            self.timer.switch(prev_phase)
+
+    def check_layout(self):
+        """Timer that redraws the area once the background layout has finished,
+        as otherwise it wouldn't be shown until something else caused a redraw"""
+        if layout_worker.is_pending(self.area_name):
+            return 0.005
+        self.waiting_for_layout = False
+        area = self.area
+        if area:
+            area.tag_redraw()
+        return None
+
+    @property
+    def is_building(self):
+        return bool(self.build_queue)
+
+    @property
+    def build_progress(self):
+        """The fraction of the node caches that have been built so far"""
+        total = len(self.all_nodes) + len(self.build_queue)
+        return len(self.all_nodes) / total if total else 1
+
+    def start_build(self, node_names):
+        """Create the caches for the given nodes a bit at a time, with a timer, rather than all at once in the draw
+        callback, so that showing a huge node tree doesn't freeze the UI. The layout of the whole tree has already
+        been calculated, so the nodes that have been built can be drawn in their final position straight away."""
+        # The timer stops itself once the queue is empty, so it only needs registering if it was empty before
+        was_building = self.is_building
+        self.build_queue.extend(node_names)
+        if not was_building and self.build_queue:
+            bpy.app.timers.register(self.build_step, first_interval=0)
+
+    def build_step(self):
+        """Called by the build timer. Returns the time until the next step,
+        or None once everything has been built (as needed by bpy.app.timers)"""
+        shader_cache = get_shader_cache(bpy.context)
+        # Stop if the minimap has been disabled, or this area has been closed since the last step
+        if not shader_cache or shader_cache.areas.get(self.area_name) is not self or not self.node_tree:
+            self.build_queue.clear()
+            return None
+
+        self.build(get_prefs(bpy.context).build_time_budget / 1000)
+        area = self.area
+        if area:
+            area.tag_redraw()
+        return 0.01 if self.build_queue else None
+
+    def build(self, budget=None):
+        """Build node caches from the queue until budget seconds have passed, or until it is empty if budget is None"""
+        trace = CacheContainer.trace
+        start = trace.begin()
+        end = perf_counter() + budget if budget is not None else float("inf")
+        built = 0
+        node_tree = self.node_tree
+        node_names = self.node_names
+        nodes = node_tree.nodes
+        while self.build_queue and perf_counter() < end:
+            name = self.build_queue.popleft()
+            node = nodes.get(name)
+            # Nodes that are removed or renamed while building are picked up by the usual update instead
+            if not node or name in node_names or name not in self.layout_indices:
+                continue
+            node_cache = NodeCache(node, self, node_tree)
+            node_cache.update_loc_dims(node)
+            self.add_node_cache(node_cache)
+            node_names.add(name)
+            built += 1
+        trace.end("Incremental build", start, "cache", area=self.area_name, nodes=built)
+
+    def update_links(self, context, node_tree):
+        """Rebuild the batch of all links in the tree from the current layout"""
+        self.link_count = len(node_tree.links) if node_tree else 0
+        self.link_key = get_link_key(node_tree, tuple(node_tree.nodes.keys())) if node_tree else None
+        prefs = get_prefs(context)
+        if not prefs.show_links or not prefs.show_non_frames or not self.link_count:
+            self.links = None
+            self.set_link_verts(None)
+            return
+        records = self.layout.records
+        links = get_link_indices(node_tree, self.layout_indices)
+        links = collapse_reroutes(links, [record.is_reroute for record in records])
+        if prefs.only_top_level:
+            links = filter_links(links, [record.parent == -1 for record in records])
+        self.links = links
+        self.set_link_verts(get_link_verts(links, self.layout.map_rects))
+
+    def add_node_cache(self, node_cache: "NodeCache"):
+        self.all_nodes.append(node_cache)
+        self.node_lookup[node_cache.node_name] = node_cache
+
+    def relayout_moved(self, context, moved: List["NodeCache"], keep_bounds=False) -> bool:
+        """Lay out only the nodes that have moved, along with everything inside them and the frames around them,
+        rather than the whole tree, so that moving a node costs as much as the number of frames it is in.
+        If they have changed the bounds of the tree, the minimap is fitted to them again with update_bounds,
+        unless keep_bounds is True. Returns False if this isn't possible (e.g. a node has moved into a frame),
+        and the whole tree needs laying out"""
+        if len(moved) > len(self.all_nodes) * PARTIAL_RELAYOUT_MAX:
+            return False
+        trace = CacheContainer.trace
+        start = trace.begin()
+        layout = self.layout
+        indices = self.layout_indices
+        lookup = self.node_lookup
+        changed = [indices[c.node_name] for c in moved if c.node_name in indices]
+        if len(changed) != len(moved):
+            return False
+        # The frames around the nodes are read again as well, as their size changes with their children
+        records = {}
+        for i in changed + get_ancestors(layout, changed):
+            node_cache = lookup.get(layout.records[i].name)
+            node = node_cache.node if node_cache else None
+            if not node:
+                return False
+            records[i] = get_node_record(node, indices)
+        result = relayout_nodes(layout, records, self.node_area.bounds)
+        if result is None:
+            return False
+        affected, bounds_changed = result
+
+        # Any layout that is still being worked out on the background thread doesn't have this change
+        self.applied_generation = self.layout_generation
+        rects = RectArray(layout.map_rects[affected])
+        self.map_rects.data[affected] = rects.data
+        self.node_rects.data[affected] = layout.node_rects[affected]
+        self.quad_verts[affected] = rects.quad_verts()
+        self.line_verts[affected] = rects.line_verts()
+        for i in affected:
+            node_cache = lookup.get(layout.records[i].name)
+            if node_cache:
+                node_cache.update_loc_dims()
+        if self.links is not None:
+            self.set_link_verts(get_link_verts(self.links, layout.map_rects))
+        # The search highlights and the visible nodes are found again from the new positions
+        self.search_key = None
+        self.zoom_key = None
+        self.bounds_outdated = self.bounds_outdated or bounds_changed
+        if self.bounds_outdated and not keep_bounds:
+            self.update_bounds(context)
+        self.timer.count("Partial relayouts")
+        trace.end("Partial relayout", start, "cache", area=self.area_name, nodes=len(affected), bounds=bounds_changed)
+        return True
+
+    def update_bounds(self, context):
+        """Fit the minimap to where the nodes are now, after they've been laid out by relayout_moved.
+        None of the node or link batches are made again, they are drawn with base_transform instead"""
+        trace = CacheContainer.trace
+        start = trace.begin()
+        layout = self.layout
+        self.node_area = rect_to_rectangle(get_rects_area(layout.node_rects))
+        self.map_area = get_map_area(context, self.area, self.node_area)
+        node_area, map_area = self.node_area.bounds, self.map_area.bounds
+        self.scale = V(get_scale(node_area, map_area))
+        self.base_transform = get_area_transform(layout.node_area, layout.map_area, node_area, map_area)
+        self.quad_batch = get_batch_from_quads_2d(self.map_area.coords)
+        self.outline_batch = get_batch_lines_from_quads_2d(self.map_area.coords)
+        self.bounds_outdated = False
+        self.zoom_key = None
+        self.timer.count("Bounds updates")
+        trace.end("Bounds update", start, "cache", area=self.area_name)
+
+    def update_changed(self, context, node_tree, fingerprint, node_data) -> bool:
+        """Update only the nodes that are different from the last update, found by comparing the node attributes
+        that the fingerprints were made from. Moved nodes are laid out with relayout_moved.
+        Returns False if the changed nodes can't be found this way, and everything needs updating"""
+        if self.node_data is None:
+            return False
+        changed = get_changed_rows(node_data, self.node_data)
+        if not len(changed):
+            # Something that isn't in the node data has changed, like a label
+            return False
+        nodes = node_tree.nodes
+        lookup = self.node_lookup
+        caches = [lookup.get(nodes[int(i)].name) for i in changed]
+        if not all(caches):
+            return False
+
+        # Nodes can change height without moving, like when they're collapsed
+        resized = get_changed_rows(node_data, self.node_data, ("dimensions",))
+        self.last_change = perf_counter()
+        self.fingerprint = fingerprint
+        self.node_data = node_data
+        for node_cache in caches:
+            node_cache.update(context)
+        moved = self.moved_nodes + [lookup[nodes[int(i)].name] for i in resized]
+        self.moved_nodes = []
+        self.tag_update = False
+        if fingerprint[6] != self.link_key:
+            self.update_links(context, node_tree)
+        if moved and not self.relayout_moved(context, list(dict.fromkeys(moved))):
+            self.update_areas(context, force=True)
+        self.update_areas(context)
+        self.timer.count("Partial updates")
+        return True
+
+    def check_transform(self, context):
+        """Keep track of whether nodes are being moved or scaled by the user. The bounds of the minimap stay the same
+        while they are, and when that ends, they are fitted to the nodes in their new positions"""
+        transforming = is_transforming(context)
+        if transforming == self.in_transform:
+            return
+        self.in_transform = transforming
+        if transforming:
+            self.collect_transform_nodes()
+            self.last_transform_update = 0
+        else:
+            self.transform_nodes = []
+            if self.bounds_outdated:
+                self.update_bounds(context)
+
+    def collect_transform_nodes(self):
+        """Find the nodes that can move during the current transform, which are the selected ones"""
+        transform_nodes = []
+        for node_cache in self.all_nodes:
+            node = node_cache.node
+            if node and node.select:
+                transform_nodes.append(node_cache)
+        self.transform_nodes = transform_nodes
+
+    def update_transform(self, context, node_tree, fingerprint, node_data):
+        """Update the minimap while nodes are being moved or scaled. This is done at most transform_update_rate times
+        a second, only the nodes that are being transformed are checked, and only the ones that moved are laid out"""
+        wait = self.last_transform_update + 1 / get_prefs(context).transform_update_rate - perf_counter()
+        if wait > 0:
+            # The fingerprint isn't stored, so the update happens in the first redraw after the wait
+            self.timer.count("Throttled updates")
+            self.schedule_redraw(wait)
+            return
+        self.last_transform_update = self.last_change = perf_counter()
+        node_caches = self.transform_nodes
+        # node.resize scales the node under the mouse, which doesn't have to be selected,
+        # so any other nodes that have changed size are found from the node data
+        if self.node_data is not None:
+            nodes = node_tree.nodes
+            lookup = self.node_lookup
+            resized = get_changed_rows(node_data, self.node_data, ("width", "dimensions"))
+            transforming = set(node_caches)
+            node_caches = node_caches + [
+                c for c in (lookup.get(nodes[int(i)].name) for i in resized) if c and c not in transforming
+            ]
+        self.fingerprint = fingerprint
+        self.node_data = node_data
+        for node_cache in node_caches:
+            node = node_cache.node
+            if node:
+                node_cache.update(context, node)
+        moved = self.moved_nodes
+        self.moved_nodes = []
+        self.tag_update = False
+        if moved and not self.relayout_moved(context, moved, keep_bounds=True):
+            self.update_areas(context, force=True)
+
+    def schedule_redraw(self, delay):
+        """Redraw the area after a delay, so that the last change is shown even if nothing else causes a redraw"""
+        if self.redraw_scheduled:
+            return
+        self.redraw_scheduled = True
+        bpy.app.timers.register(self.delayed_redraw, first_interval=delay)
+
+    def delayed_redraw(self):
+        self.redraw_scheduled = False
+        area = self.area
+        if area:
+            area.tag_redraw()
+        return None
+
+    def set_link_verts(self, verts):
+        has_links = verts is not None and len(verts)
+        self.link_verts = verts if has_links else None
+        self.link_batch = get_batch_from_verts_2d(verts, "LINES") if has_links else None
+        self.link_size = get_verts_size(verts) if has_links else 0
+        self.track_tree_batches()
+
+    def track_tree_batches(self):
+        """Record the size of the batches that belong to the whole tree rather than to a single node
+        (the background and outline of the minimap, the links and the search highlights)"""
+        size = MAP_BATCHES_SIZE + self.link_size + self.search_size + self.zoom_link_size
+        self.gpu_resources.set(self.area_name, self.current_tree_key, None, size)
+
+    @property
+    def current_match(self) -> "NodeCache":
+        """The search match that was last jumped to, if there is one"""
+        if 0 <= self.search_position < len(self.search_matches):
+            return self.search_matches[self.search_position]
+        return None
+
+    def update_search(self, query):
+        """Find the nodes that match the search query, and create the batch that outlines all of them.
+        This is only done again when the query, the indexed nodes or the layout change, not every redraw"""
+        key = (query, self.search_index.generation, self.applied_generation)
+        if key == self.search_key:
+            return
+        self.search_key = key
+        trace = CacheContainer.trace
+        start = trace.begin()
+        current = self.current_match
+        indices = self.layout_indices
+        matches = [c for c in self.search_index.query(query) if c.node_name in indices] if query else []
+        verts = None
+        if matches:
+            idx = np.fromiter((indices[c.node_name] for c in matches), dtype=np.int64, count=len(matches))
+            # Order them from the top left of the tree to the bottom right, so that cycling through them moves across it
+            rects = self.layout.map_rects[idx]
+            order = np.lexsort((np.minimum(rects[:, 0], rects[:, 2]), -np.maximum(rects[:, 1], rects[:, 3])))
+            matches = [matches[i] for i in order]
+            # Each node's own outline is used, so that the highlight matches rounded frames
+            outlines = [c.outline_verts for c in matches if getattr(c, "can_draw", False)]
+            verts = np.concatenate([np.reshape(v, (-1, 2)) for v in outlines]) if outlines else None
+
+        self.search_matches = matches
+        self.search_position = matches.index(current) if current in matches else -1
+        has_verts = verts is not None and len(verts)
+        self.search_batch = get_batch_from_verts_2d(verts, "LINES") if has_verts else None
+        self.search_size = get_verts_size(verts) if has_verts else 0
+        self.track_tree_batches()
+        trace.end("Search", start, "cache", area=self.area_name, matches=len(matches))
+
+    def cycle_search(self, step=1) -> "NodeCache":
+        """Move to the next (or previous if step is negative) search match, and return it"""
+        count = len(self.search_matches)
+        if not count:
+            return None
+        if self.search_position < 0:
+            self.search_position = 0 if step > 0 else count - 1
+        else:
+            self.search_position = (self.search_position + step) % count
+        return self.current_match
+
+    @property
+    def is_zoomed(self):
+        return self.map_zoom > 1
+
+    @property
+    def zoom_window(self) -> Rectangle:
+        """The part of node space shown by the minimap, which is the whole tree unless it is zoomed in"""
+        return rect_to_rectangle(get_zoom_window(self.node_area.bounds, self.map_zoom, self.zoom_center))
+
+    @property
+    def drawn_nodes(self) -> List["NodeCache"]:
+        """The nodes that need drawing, which are only the ones that can be seen if the minimap is zoomed in"""
+        return self.all_nodes if self.visible_nodes is None else self.visible_nodes
+
+    def set_zoom(self, zoom, center):
+        """Zoom the minimap in around a point in node space. The center is stored after being moved to keep the
+        window inside the tree, so that panning back from past the edge starts moving straight away"""
+        self.map_zoom = min(max(zoom, 1), MAX_MAP_ZOOM)
+        if not self.is_zoomed:
+            self.zoom_center = None
+            return
+        window = get_zoom_window(self.node_area.bounds, self.map_zoom, center)
+        self.zoom_center = ((window[0] + window[2]) / 2, (window[1] + window[3]) / 2)
+
+    def zoom_map(self, factor, point):
+        """Zoom the minimap in (or out if factor is less than 1), keeping the given point in minimap space in the same
+        place, so that whatever is under the mouse stays there"""
+        map_area = self.map_area
+        target = map_area_to_node_area(point, self.zoom_window, map_area)
+        fac = pos_to_fac(point, map_area)
+        zoom = min(max(self.map_zoom * factor, 1), MAX_MAP_ZOOM)
+        node_area = self.node_area
+        size = node_area.size / zoom
+        self.set_zoom(zoom, (target.x + (0.5 - fac.x) * size.x, target.y + (0.5 - fac.y) * size.y))
+
+    def pan_map(self, delta):
+        """Move the part of node space shown while zoomed in, so that it follows a mouse movement in minimap space"""
+        if not self.is_zoomed:
+            return
+        window = self.zoom_window
+        scale = window.size.x / self.map_area.size.x
+        center = window.center
+        self.set_zoom(self.map_zoom, (center.x - delta[0] * scale, center.y - delta[1] * scale))
+
+    def update_zoom(self):
+        """Find the nodes and links that can be seen while the minimap is zoomed in, so that only they are drawn.
+        The nodes are found with the spatial index, so this only costs as much as what is visible. It is done again
+        when the zoom, the nodes or the layout change, not every redraw"""
+        key = (
+            self.map_zoom,
+            self.zoom_center,
+            self.current_tree_key,
+            self.applied_generation,
+            self.base_transform,
+            len(self.index),
+            self.link_batch,
+        )
+        if key == self.zoom_key:
+            return
+        self.zoom_key = key
+        verts = None
+        if not self.is_zoomed:
+            self.visible_nodes = None
+            self.map_transform = self.base_transform
+        else:
+            trace = CacheContainer.trace
+            start = trace.begin()
+            layout = self.layout
+            node_area, map_area = self.node_area.bounds, self.map_area.bounds
+            window = get_zoom_window(node_area, self.map_zoom, self.zoom_center)
+            # The batches are moved by the base transform first, if the bounds have changed since they were made
+            base_scale, base_x, base_y = self.base_transform
+            scale, offsetx, offsety = get_zoom_transform(window, node_area, map_area)
+            self.map_transform = (base_scale * scale, base_x * scale + offsetx, base_y * scale + offsety)
+            # Where the window is in the space of the last full layout, which is the space that the index uses
+            map_window = (
+                *node_to_map(window[0], window[1], layout.node_area, layout.map_area),
+                *node_to_map(window[2], window[3], layout.node_area, layout.map_area),
+            )
+            indices = self.layout_indices
+            found = self.index.query_rect(rect_to_rectangle(map_window))
+            # Keep the order of the tree, so that frames are still drawn behind the nodes in them
+            self.visible_nodes = sorted(found, key=lambda c: indices.get(c.node_name, 0))
+            if self.link_verts is not None:
+                verts = cull_link_verts(self.link_verts, map_window)
+            trace.end("Zoom cull", start, "cache", area=self.area_name, nodes=len(found))
+
+        has_verts = verts is not None and len(verts)
+        self.zoom_link_batch = get_batch_from_verts_2d(verts, "LINES") if has_verts else None
+        self.zoom_link_size = get_verts_size(verts) if has_verts else 0
+        self.track_tree_batches()
+
+    def unzoom_point(self, point) -> V:
+        """Convert a point from where it is drawn in the minimap to where it would be if it wasn't zoomed in,
+        in the minimap space of the last full layout"""
+        scale, offsetx, offsety = self.map_transform
+        return V(((point[0] - offsetx) / scale, (point[1] - offsety) / scale))
+
+    def get_tree_state(self) -> dict:
+        """Get all of the cached data that belongs to the current tree rather than the area"""
+        return {attr: getattr(self, attr) for attr in TREE_STATE_ATTRS}
+
+    def set_tree_state(self, state: dict):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
+    def reset_tree_state(self, node_tree):
+        """Clear the cached data for the current tree, ready for a new tree to be built.
+        New objects are created rather than clearing the old ones, as they may be stored in the tree cache"""
+        self.all_nodes = []
+        self.node_lookup = {}
+        self.index = SpatialGrid()
+        self.build_queue = deque()
+        self.link_batch = None
+        self.links = None
+        self.link_verts = None
+        self.link_count = 0
+        self.link_size = 0
+        self.search_index = SearchIndex()
+        self.map_zoom = 1
+        self.zoom_center = None
+        self.fingerprint = None
+        self.node_data = None
+        self.node_pointers = None
+        self.current_tree_key = get_tree_key(node_tree)
+        self.reference_generation = CacheContainer.reference_generation
+
+    def refresh_references(self, node_tree):
+        """Look up the nodes of all node caches again by name, all in one go. Nodes that have been removed
+        are set to None, and their caches are removed by the next update"""
+        trace = CacheContainer.trace
+        start = trace.begin()
+        nodes = node_tree.nodes
+        for node_cache in self.all_nodes:
+            node_cache.set_node(nodes.get(node_cache.node_name), node_tree)
+        self.reference_generation = CacheContainer.reference_generation
+        self.timer.count("Reference refreshes")
+        trace.end("Refresh references", start, "cache", area=self.area_name, nodes=len(self.all_nodes))
+
+    def switch_tree(self, context, node_tree):
+        """Switch to showing a different tree, storing the cache of the current one so that switching back is instant,
+        and using the stored cache of the new one if there is one"""
+        tree_caches = get_shader_cache(context).tree_caches
+        # The search highlights are specific to the tree being shown, so they are found again for the new one
+        self.search_batch = None
+        self.search_size = 0
+        self.search_key = None
+        self.search_matches = []
+        self.search_position = -1
+        self.zoom_key = None
+        self.zoom_link_batch = None
+        self.zoom_link_size = 0
+        self.track_tree_batches()
+        # Trees that are still being built aren't kept, as the build is specific to the tree being shown
+        if not self.is_building:
+            tree_caches.put((self.area_name, self.current_tree_key), self.get_tree_state(), size=len(self.all_nodes))
+        else:
+            self.gpu_resources.remove_tree(self.area_name, self.current_tree_key)
+        # Ignore any layouts of the old tree that are still being worked out
+        self.applied_generation = self.layout_generation
+
+        state = tree_caches.pop((self.area_name, get_tree_key(node_tree)))
+        if state:
+            self.set_tree_state(state)
+            self.timer.count("Tree cache hits")
+        else:
+            self.reset_tree_state(node_tree)
+            self.update_areas(context, force=True, wait=True)
+
+    def schedule_prefetch(self, context):
+        """Start building the caches of the node groups in the current tree in the background,
+        so that the minimap can be shown straight away when the user goes into one of them"""
+        if self.prefetch_scheduled or not get_prefs(context).prefetch_groups:
+            return
+        self.prefetch_scheduled = True
+        bpy.app.timers.register(self.prefetch_step, first_interval=PREFETCH_DELAY)
+
+    def prefetch_step(self):
+        """Prefetch the next node group. Called by a timer, and returns the time until the next step, or None if done"""
+        shader_cache = get_shader_cache(bpy.context)
+        node_tree = self.node_tree
+        if not shader_cache or shader_cache.areas.get(self.area_name) is not self or not node_tree:
+            return None
+        # Only prefetch while the user is idle, so that it doesn't slow down anything they're doing
+        if self.is_building or perf_counter() - self.last_change < PREFETCH_DELAY:
+            return PREFETCH_DELAY
+
+        tree_caches = shader_cache.tree_caches
+        for node in node_tree.nodes:
+            group = getattr(node, "node_tree", None) if node.type == "GROUP" else None
+            if not group or len(group.nodes) >= INCREMENTAL_BUILD_MIN:
+                continue
+            key = (self.area_name, get_tree_key(group))
+            if key in tree_caches or key[1] == self.current_tree_key:
+                continue
+            trace = CacheContainer.trace
+            start = trace.begin()
+            tree_caches.put(key, self.build_tree_state(bpy.context, group), size=len(group.nodes))
+            trace.end("Prefetch", start, "cache", area=self.area_name, tree=group.name, nodes=len(group.nodes))
+            # One group at a time, so that this never takes too long
+            return 0.05
+
+        self.prefetch_scheduled = False
+        return None
+
+    def build_tree_state(self, context, node_tree) -> dict:
+        """Build the complete cache for a tree that isn't currently shown, without changing the current one"""
+        current = self.get_tree_state()
+        self.reset_tree_state(node_tree)
+        self.tree_override = node_tree
+        try:
+            self.update_areas(context, force=True, wait=True)
+            for node in node_tree.nodes:
+                node_cache = NodeCache(node, self, node_tree)
+                node_cache.update_loc_dims(node)
+                self.add_node_cache(node_cache)
+            self.fingerprint, self.node_data = get_tree_data(node_tree)
+            self.node_pointers = get_node_pointers(node_tree)
+            return self.get_tree_state()
+        finally:
+            self.tree_override = None
+            self.set_tree_state(current)
+
+    def get_node_at(self, point) -> "NodeCache":
+        """Return the top level node under the given point in minimap space.
+        If multiple nodes overlap, the smallest one is returned as it will be the one drawn on top"""
+        found = None
+        found_area = 0
+        for node_cache in self.index.query_point(self.unzoom_point(point)):
+            if node_cache.parent or not node_cache.can_draw:
+                continue
+            size = node_cache.node_rect.size
+            area = abs(size.x * size.y)
+            if not found or area < found_area:
+                found = node_cache
+                found_area = area
+        return found
+
+    def get_nodes_in_rect(self, rect: Rectangle) -> List["NodeCache"]:
+        """Return all visible nodes that overlap the given rectangle in minimap space.
+        Frames are only included if they are completely inside it, in the same way as box select in the node editor"""
+        rect = Rectangle(self.unzoom_point(rect.min), self.unzoom_point(rect.max))
+        overlapping = self.index.query_rect(rect)
+        contained = self.index.query_rect(rect, contained=True)
+        return [c for c in overlapping if c.can_draw and (not c.is_frame or c in contained)]
 
     @property
     def node_names(self):
@@ -104,16 +972,48 @@ class AreaCache():
     def area(self):
         """Return the area data block. Only the name is cached,
         as Blender can go funky when you keep direct references to data blocks for a long time"""
-        for area in bpy.context.screen.areas:
+        screen = get_window_screen(bpy.context, self.window_key)
+        if not screen:
+            return None
+        areas = screen.areas
+        # Check where it was last time first, as the areas of a screen rarely change
+        if self.area_index < len(areas) and str(areas[self.area_index]) == self.area_name:
+            return areas[self.area_index]
+        for i, area in enumerate(areas):
             if str(area) == self.area_name:
+                self.area_index = i
                 return area
         return None
 
     @property
     def node_tree(self):
-        """Get the node tree for this area. Same as above"""
+        """Get the node tree for this area. Same as above.
+        How to get from the base tree of the area to the group being edited is cached,
+        and only worked out again when the base tree, its active node or the editor breadcrumbs change"""
+        if self.tree_override:
+            return self.tree_override
         area = self.area
-        tree = get_active_tree(bpy.context, area)
+        if not area:
+            return None
+        space = area.spaces[0]
+        tree = space.node_tree
+        if not tree:
+            return None
+        path = space.path
+        active = tree.nodes.active
+        key = (get_tree_key(tree), len(path), active.name if active else "")
+        if key != self.tree_path_key:
+            self.tree_path_key = key
+            # The breadcrumbs are specific to this editor, so if there are any, they can be used directly
+            self.group_path = None if len(path) else get_active_group_path(bpy.context, tree)
+
+        if self.group_path is None:
+            return path[-1].node_tree
+        for name in self.group_path:
+            node = tree.nodes.get(name)
+            if not node or not node.node_tree:
+                break
+            tree = node.node_tree
         return tree
 
     def update(self, context, node_tree):
@@ -121,29 +1021,97 @@ class AreaCache():
         Updates the node cache to include new nodes, and removes nodes that aren't in the tree anymore.
         A side effect of this system is that when the name of a node is changed, the cache for that node is removed,
         and then recreated in the next draw call, causing a slight jump. Not a big problem though."""
+        self.last_drawn = perf_counter()
         nt = node_tree
         if nt:
-            if nt.name != self.current_node_tree_name:
-                self.all_nodes.clear()
-                self.update_areas(context, force=True)
-                self.current_node_tree_name = nt.name
+            self.check_transform(context)
+            # Most redraws are caused by something other than the tree changing (like the view moving),
+            # so if the tree looks exactly the same as last time, there's nothing to update.
+            # While building, the missing nodes are being added by the build timer, so they don't need checking for
+            fingerprint, node_data = get_tree_data(nt)
+            if fingerprint == self.fingerprint and not self.tag_update and\
+                    (len(nt.nodes) == len(self.all_nodes) or self.is_building):
+                self.skipped_updates += 1
+                self.timer.count("Skipped updates")
+                self.update_areas(context)
+                self.schedule_prefetch(context)
+                return
+            # Nodes can be removed and added again with the same names between redraws, which frees the old ones.
+            # Reading the node addresses looks at every node, so it's only done once something has changed
+            if get_tree_key(nt) == self.current_tree_key:
+                pointers = get_node_pointers(nt)
+                if self.node_pointers is not None and pointers != self.node_pointers:
+                    self.refresh_references(nt)
+                self.node_pointers = pointers
+            # While nodes are being moved, only they are updated, as long as nothing else about the tree has changed
+            if self.in_transform and self.can_update_moved(nt, fingerprint):
+                self.update_transform(context, nt, fingerprint, node_data)
+                return
+            # Otherwise, if the same nodes are there, only the ones that have changed are updated
+            if self.can_update_moved(nt, fingerprint) and self.update_changed(context, nt, fingerprint, node_data):
+                self.schedule_prefetch(context)
+                return
+            self.last_change = perf_counter()
+            if get_tree_key(nt) != self.current_tree_key:
+                self.switch_tree(context, nt)
+            # Removing nodes frees them, so if any might have been removed, the references to them can't be used
+            if self.reference_generation != CacheContainer.reference_generation or\
+                    not same_node_names(fingerprint, self.fingerprint):
+                self.refresh_references(nt)
+            self.fingerprint = fingerprint
+            self.node_data = node_data
+            self.full_updates += 1
             # add missing nodes
-            if len(nt.nodes) != len(self.all_nodes):
-                self.tag_update = True
-                for node in nt.nodes:
-                    if node.name not in self.node_names:
-                        self.all_nodes.append(NodeCache(node, self, nt))
+            if len(nt.nodes) != len(self.all_nodes) and not self.is_building:
+                node_names = self.node_names
+                missing = [node for node in nt.nodes if node.name not in node_names]
+                if len(missing) >= INCREMENTAL_BUILD_MIN:
+                    # The layout is worked out for the whole tree now, but the node caches are built over time
+                    if any(node.name not in self.layout_indices for node in missing):
+                        self.update_areas(context, force=True, wait=True)
+                    self.start_build([node.name for node in missing])
+                else:
+                    self.tag_update = True
+                    self.nodes_added = True
+                    prev_phase = self.timer.switch("Batch rebuild")
+                    for node in missing:
+                        self.add_node_cache(NodeCache(node, self, nt))
+                    self.timer.switch(prev_phase)
 
             # delete removed nodes
             for cache in list(self.all_nodes):
-                node = self.node_tree.nodes.get(cache.node_name)
+                node = cache.node
                 if node:
-                    cache.update(context)
+                    cache.update(context, node)
                 else:
                     self.all_nodes.remove(cache)
+                    self.node_lookup.pop(cache.node_name, None)
+                    self.index.remove(cache)
+                    self.search_index.remove(cache)
+                    self.gpu_resources.remove_node(self.area_name, self.current_tree_key, cache.node_name)
+
+            # Links don't affect the layout, so only the link batch needs to be rebuilt when they change
+            if not self.tag_update and fingerprint[6] != self.link_key:
+                prev_phase = self.timer.switch("Batch rebuild")
+                self.update_links(context, nt)
+                self.timer.switch(prev_phase)
 
-        self.update_areas(context, force=self.tag_update)
+        self.update_areas(context, force=self.tag_update, wait=self.nodes_added)
+        # Nodes that have just been added (e.g. by duplicating) might be being moved as well
+        if self.in_transform and self.nodes_added:
+            self.collect_transform_nodes()
         self.tag_update = False
+        self.nodes_added = False
+        self.moved_nodes = []
+
+    def can_update_moved(self, node_tree, fingerprint) -> bool:
+        """Whether the only thing that could have changed since the last update is the nodes moving,
+        so that the moved nodes can be laid out by themselves rather than updating everything"""
+        return not self.tag_update and not self.is_building and\
+            get_tree_key(node_tree) == self.current_tree_key and\
+            self.reference_generation == CacheContainer.reference_generation and\
+            same_node_names(fingerprint, self.fingerprint) and\
+            len(node_tree.nodes) == len(self.all_nodes)
 
 
 class NodeCache():
@@ -157,6 +1125,7 @@ class NodeCache():
         self.draw = node.type != "REROUTE"
         self.node_name = node.name
         self.area_cache = area_cache
+        self.set_node(node, node_tree)
 
         self.color = node.color.copy()
         self.location = node.location.copy()
@@ -165,6 +1134,8 @@ class NodeCache():
         self.is_frame = node.type == "FRAME"
         self.select = node.select
         self.use_custom_color = node.use_custom_color
+        self.label = node.label
+        area_cache.search_index.add(self, self.get_search_texts(node))
 
         # check if it is ashader or compositor node tree that is bound to either a material or scene,
         # and doesn't show up in bpy.data.node_groups
@@ -175,16 +1146,41 @@ class NodeCache():
             self.node_tree_name = get_alt_node_tree_name(node_tree)
         self.tree_type = node_tree.type
 
-        self.update_loc_dims(node)
+        # The location and size are set by the area cache once the whole tree has been laid out
         self.update_color(bpy.context, node)
         theme = bpy.context.preferences.themes[0].node_editor
         self.active_color = list(theme.node_active) + [0.9]  # add alpha channel
         self.selected_color = list(theme.node_selected) + [0.9]  # add alpha channel
 
+    def set_node(self, node, node_tree):
+        """Store direct references to the node and its tree, which are valid until the reference generation changes"""
+        self._node = node
+        self._node_tree = node_tree
+        self.generation = CacheContainer.reference_generation
+
+    def resolve(self):
+        """Look up the node and its tree by name, for when the stored references might be stale"""
+        node_tree = self.find_node_tree()
+        self.set_node(node_tree.nodes.get(self.node_name) if node_tree else None, node_tree)
+
     @property
     def node_tree(self):
-        """Get the node tree of this node. Direct references can't be kept because they are removed on undo,
-        So only the name is cached, and the actual data block is got dynamically"""
+        """Get the node tree of this node. Direct references are removed on undo, so they are only used if nothing
+        has happened since they were stored that could invalidate them. Otherwise, they are looked up again by name.
+        Usually, they are refreshed for all nodes at once straight after the undo, so that this is never needed."""
+        if self.generation != CacheContainer.reference_generation:
+            self.resolve()
+        return self._node_tree
+
+    @property
+    def node(self):
+        """Get the node data block for this cache. Same deal as above"""
+        if self.generation != CacheContainer.reference_generation:
+            self.resolve()
+        return self._node
+
+    def find_node_tree(self):
+        """Find the node tree of this node by name"""
         nt = bpy.data.node_groups.get(self.node_tree_name)
         # Check if nt is bound to material or scene (shader or compositing)
         if not nt:
@@ -196,39 +1192,47 @@ class NodeCache():
                     nt = data[self.node_tree_name].node_tree
         return nt
 
-    @property
-    def node(self):
-        """Get the node data block for this cache. Same deal as above"""
-        return self.node_tree.nodes.get(self.node_name)
-
-    def get_is_frame_used(self):
-        """Check if a frame has any children. If it doesn't and the setting in preferences is off, it won't be rendered
-        This is because it doesn't seem to be possible to get the visual location of a frame if it doesn't have any
-        child nodes..."""
-        node = self.node
-        for n in node.id_data.nodes:
-            if n.parent == node:
-                return True
-        return False
-
     def update_loc_dims(self, node=None):
-        """Update cached data relating to location and size"""
+        """Update cached data relating to location and size from the layout of the area cache"""
         if not node:
             node = self.node
-        self.visual_location = get_node_loc(node)
-        self.node_rect = get_node_rect(
-            node,
-            self.area_cache.node_area,
-            self.area_cache.map_area,
-            self.area_cache.scale,
-            self.visual_location,
+        area_cache = self.area_cache
+        i = area_cache.layout_indices[self.node_name]
+        self.visual_location = V(area_cache.layout.visual_locations[i])
+        # The node space rectangle, used for moving the view to this node
+        self.view_rect = area_cache.node_rects[i]
+        self.node_rect = area_cache.map_rects[i]
+        prefs = get_prefs(bpy.context)
+        if self.is_frame and prefs.rounded_frames:
+            # The bevelled outline is only made when the frame geometry changes, not every draw
+            polygon = Polygon(self.node_rect.coords).bevelled(radius=prefs.frame_corner_radius)
+        else:
+            polygon = None
+        if polygon and len(polygon.verts) > 2:
+            tris, lines = polygon.tris_array(), polygon.lines_array()
+        else:
+            tris, lines = area_cache.quad_verts[i], area_cache.line_verts[i]
+        self.batch = get_batch_from_verts_2d(tris, "TRIS")
+        self.outline_batch = get_batch_from_verts_2d(lines, "LINES")
+        # Kept so that the search highlights can be drawn with the same outline
+        self.outline_verts = lines
+        area_cache.gpu_resources.set(
+            area_cache.area_name,
+            area_cache.current_tree_key,
+            self.node_name,
+            get_verts_size(tris) + get_verts_size(lines),
         )
-        self.batch = get_batch_from_quads_2d(self.node_rect.coords)
-        self.outline_batch = get_batch_lines_from_quads_2d(self.node_rect.coords)
-        self.is_frame_used = self.get_is_frame_used()
-        self.can_draw = self.check_can_draw(bpy.context)
+        area_cache.index.insert(self, self.node_rect)
+        area_cache.timer.count("Rebuilds")
+        self.is_frame_used = area_cache.layout.frame_used[i]
         self.parent = node.parent
-        self.update_label(node)
+        self.can_draw = self.check_can_draw(bpy.context)
+        self.label = node.label
+        self.label_lines = None
+
+    def get_search_texts(self, node):
+        """The text that this node can be found by when searching"""
+        return (node.name, node.label, node.bl_idname, node.type)
 
     def update_color(self, context, node):
         """Update cached data relating to color"""
@@ -238,14 +1242,6 @@ class NodeCache():
         else:
             self.theme_color = get_node_color(bpy.context, node)
 
-    def update_label(self, node):
-        self.label = node.label
-        node_rect = self.node_rect
-        dims = blf.dimensions(0, node.label)
-        posx = (node_rect.minx + (node_rect.maxx - node_rect.minx) / 2) - dims[0] / 2
-        posy = node_rect.miny - dims[1]
-        self.label_pos = V((posx, posy))
-
     def check_can_draw(self, context):
         prefs = get_prefs(context)
         return not (not self.draw or\
@@ -273,82 +1269,92 @@ class NodeCache():
             if node == node_tree.nodes.active:
                 draw_lines_from_quads_2d_batch(self.outline_batch, self.active_color, line_width)
 
-    def draw_label(self):
+    def draw_label(self, transform=(1, 0, 0)):
+        """Draw the label of this frame. transform is the (scale, offset x, offset y) of the minimap when it is zoomed
+        in. The label is laid out again at the zoomed in size, so that small frames get a label once they are big
+        enough, but moving the window around only moves it"""
         prefs = get_prefs(bpy.context)
         if self.is_frame and self.label and (not prefs.show_non_frames or prefs.only_top_level):
-            # self.update_label(self.node)
-            node_size = self.node_rect.size
-            size = min(node_size.x, abs(node_size.y) * 5)
-            if size < prefs.min_frame_size:
+            # The label layout only needs to be worked out again if the text, the frame size or the zoom changes
+            label = self.node.label
+            scale, offsetx, offsety = transform
+            key = (label, prefs.text_wrap, prefs.min_frame_size, scale)
+            if self.label_lines is None or self.label_key != key:
+                trace = CacheContainer.trace
+                start = trace.begin()
+                self.label_size, self.label_lines = layout_label(
+                    label,
+                    (*(self.node_rect.min * scale), *(self.node_rect.max * scale)),
+                    measure_text,
+                    min_frame_size=prefs.min_frame_size,
+                    text_wrap=prefs.text_wrap,
+                )
+                self.label_key = key
+                trace.end("Label layout", start, "draw", node=self.node_name)
+            if not self.label_lines:
                 return
 
-            minsize = 50
-            size = max(size, minsize)
-            # size = max(node_size.x, minsize)
-            blf.size(0, size, 10)
-
+            blf.size(0, self.label_size, 10)
             color = prefs.text_color
             blf.color(0, color[0], color[1], color[2], color[3])
+            for line in self.label_lines:
+                blf.position(0, line.x + offsetx, line.y + offsety, 0)
+                blf.draw(0, line.text)
 
-            node = self.node
-
-            dims = blf.dimensions(0, node.label)
-            node_rect = self.node_rect
-            posx = (node_rect.minx + (node_rect.maxx - node_rect.minx) / 2) - dims[0] / 2
-            posy = node_rect.miny - dims[1]
-
-            # words
-            if prefs.text_wrap:
-                words = node.label.split()
-                string = ""
-                prev_dims = (0, 0)
-                lines = []
-                for i, word in enumerate(words):
-                    next_word = words[i + 1] if i != len(words) - 1 else ""
-                    string = string + " " + word
-                    dims = blf.dimensions(0, string)
-
-                    # check if next word will overlap with sides
-                    next_dims = blf.dimensions(0, string + next_word)
-                    if next_dims[0] > size or i == len(words) - 1:
-                        posy -= prev_dims[1] + dims[1] * 0.3
-                        posx = (node_rect.minx + (node_rect.maxx - node_rect.minx) / 2) - dims[0] / 2
-                        lines.append({"string": string, "posx": posx, "posy": posy, "dims": dims})
-                        # blf.position(0, posx, posy, 0)
-                        # blf.draw(0, string)
-                        string = ""
-                        prev_dims = dims
-
-                total_height = sum([line["dims"][1] for line in lines])
-                total_width = max([line["dims"][0] for line in lines])
-                if total_height > node_size.y:
-                    blf.size(0, max(int(abs(node_size.y)), minsize), 10)
-                    # blf.size(0, max(size-abs(node_size.y), minsize), 10)
-                if total_width > node_size.x:
-                    blf.size(0, max(int(int(abs(node_size.x))), minsize), 10)
-
-                for line in lines:
-                    blf.position(0, line["posx"], line["posy"], 0)
-                    blf.draw(0, line["string"])
-            else:
-                blf.position(0, posx, posy, 0)
-                blf.draw(0, node.label)
-
-    def update(self, context):
+    def update(self, context, node=None):
         """Called once per node per area per draw (a.k.a a lot). This is where the most optimisation has been done"""
-        node = self.node
-        if not self.area_cache.tag_update and node.location != self.location or node.width != self.width:
+        if not node:
+            node = self.node
+        if node.location != self.location or node.width != self.width:
             self.location = node.location.copy()
             self.width = node.width
             self.area_cache.tag_update = True
+            self.area_cache.moved_nodes.append(self)
         if node.use_custom_color != self.use_custom_color or node.color != self.color:
             self.update_color(context, node)
             self.use_custom_color = node.use_custom_color
             self.color = node.color.copy()
-        # if node.label != self.label:
-        #     self.update_label(node)
+        if node.label != self.label:
+            self.label = node.label
+            self.label_lines = None
+            self.area_cache.search_index.add(self, self.get_search_texts(node))
+
+
+def measure_text(text, size):
+    """Get the dimensions of some text at the given font size"""
+    blf.size(0, size, 10)
+    return blf.dimensions(0, text)
+
+
+def same_node_names(fingerprint, other) -> bool:
+    """Whether two tree fingerprints have the same nodes, going by their number and names"""
+    return other is not None and fingerprint[1] == other[1] and fingerprint[4] == other[4]
+
+
+@bpy.app.handlers.persistent
+def invalidate_references(*args):
+    """Called after undo, redo and loading a file, all of which free the nodes that the caches hold references to"""
+    CacheContainer.reference_generation += 1
+    shader_cache = get_shader_cache(bpy.context)
+    if shader_cache:
+        shader_cache.refresh_references()
+
+
+reference_handlers = [
+    bpy.app.handlers.undo_post,
+    bpy.app.handlers.redo_post,
+    bpy.app.handlers.load_post,
+]
 
 
 # register the top level cache
 def register():
-    bpy.types.WindowManager.minimap_cache = CacheContainer()
\ No newline at end of file
+    bpy.types.WindowManager.minimap_cache = CacheContainer()
+    for handlers in reference_handlers:
+        handlers.append(invalidate_references)
+
+
+def unregister():
+    for handlers in reference_handlers:
+        if invalidate_references in handlers:
+            handlers.remove(invalidate_references)
\ No newline at end of file
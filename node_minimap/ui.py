@@ -56,10 +56,26 @@ def draw_header_button(self, context):
     row.popover("MINIMAP_PT_settings_panel", text="")
 
 
+def update_search(self, context):
+    """Redraw all node editors, so that they show the new search matches"""
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == "NODE_EDITOR":
+                area.tag_redraw()
+
+
 # Add a button to the header
 def register():
     bpy.types.NODE_HT_header.append(draw_header_button)
+    # This is on the window manager rather than the preferences, so that it isn't saved
+    bpy.types.WindowManager.minimap_search = bpy.props.StringProperty(
+        name="Search",
+        description="Find nodes by name, label or type. The matching nodes are outlined in the minimap",
+        options={"TEXTEDIT_UPDATE"},
+        update=update_search,
+    )
 
 
 def unregister():
     bpy.types.NODE_HT_header.remove(draw_header_button)
+    del bpy.types.WindowManager.minimap_search
@@ -4,7 +4,8 @@ import inspect
 import pkgutil
 import importlib
 from pathlib import Path
-from . import icons
+from time import perf_counter
+from . import icons, manifest
 
 __all__ = (
     "init",
@@ -30,8 +31,27 @@ def init():
     global modules
     global ordered_classes
 
+    start = perf_counter()
+    # Use the order found last time if none of the source files have changed
+    if manifest.load():
+        try:
+            modules = [importlib.import_module("." + name, manifest.PACKAGE) for name in manifest.loaded["modules"]]
+            ordered_classes = [manifest.import_class(*names) for names in manifest.loaded["classes"]]
+            manifest.stats.update(
+                used_manifest=True,
+                time=perf_counter() - start,
+                discovery_time=manifest.loaded["discovery_time"],
+            )
+            return
+        except (ImportError, AttributeError):
+            manifest.remove()
+
     modules = get_all_submodules(Path(__file__).parent.parent)
     ordered_classes = get_ordered_classes_to_register(modules)
+    discovery_time = perf_counter() - start
+    manifest.stats.update(used_manifest=False, time=discovery_time, discovery_time=discovery_time)
+    preferences = importlib.import_module(".preferences", __package__)
+    manifest.save(modules, ordered_classes, preferences.all_prefs, discovery_time)
 
 
 def register():
@@ -3,26 +3,53 @@ import bpy
 import gpu
 
 from pathlib import Path
+from contextlib import contextmanager
 from gpu.types import GPUBatch
 from typing import TYPE_CHECKING
 from mathutils import Vector as V
 from bpy.types import Area, Event, KeyMapItem
 from gpu_extras.batch import batch_for_shader
 from .helpers import Rectangle, vec_divide, vec_min, vec_max
+from .resources import register_resource
 
 if TYPE_CHECKING:
     from .preferences import NodeExtrasPrefs
 
-if bpy.app.version < (4, 0, 0):
-    sh_2d_uni = gpu.shader.from_builtin('2D_UNIFORM_COLOR')
-    sh_2d_flat = gpu.shader.from_builtin("2D_FLAT_COLOR")
-else:
-    sh_2d_uni = gpu.shader.from_builtin('UNIFORM_COLOR')
-    sh_2d_flat = gpu.shader.from_builtin("FLAT_COLOR")
-sh_2d_uniform_float = sh_2d_uni.uniform_float
-sh_2d_uni_bind = sh_2d_uni.bind
 
-sh_2d_flat_bind = sh_2d_flat.bind
+class DummyShader():
+    """Used instead of the builtin shaders in background mode, where there is no GPU context to create them in"""
+
+    def bind(self):
+        return
+
+    def uniform_float(self, name, value):
+        return
+
+
+class DummyBatch():
+    """Returned instead of a GPUBatch when the shader is a DummyShader. Drawing it does nothing"""
+
+    def draw(self, shader=None):
+        return
+
+
+def get_builtin_shader(name):
+    """Get a builtin shader, using the old name in blender versions before 4.0"""
+    if bpy.app.version < (4, 0, 0):
+        name = "2D_" + name
+    return gpu.shader.from_builtin(name)
+
+
+# The shaders are only compiled when something is first drawn
+uniform_shader = register_resource("uniform_color_shader", lambda: get_builtin_shader("UNIFORM_COLOR"), DummyShader)
+flat_shader = register_resource("flat_color_shader", lambda: get_builtin_shader("FLAT_COLOR"), DummyShader)
+
+
+def get_batch(shader, batch_type, content) -> GPUBatch:
+    """Create a batch for the shader, or a batch that doesn't draw anything if it is a dummy shader"""
+    if isinstance(shader, DummyShader):
+        return DummyBatch()
+    return batch_for_shader(shader, batch_type, content)
 
 
 def load_shader(frag_path: Path, vert_path: Path, geom_path: Path = "") -> gpu.types.GPUShader:
@@ -55,12 +82,13 @@ def load_shader(frag_path: Path, vert_path: Path, geom_path: Path = "") -> gpu.t
 # https://github.com/K-410/blender-scripts/blob/master/2.8/code_editor.py
 def draw_quads_2d(sequence, color):
     """Draw a rectangle from the given coordinates"""
+    shader = uniform_shader.get()
     qseq, = [(x1, y1, y2, x1, y2, x2) for (x1, y1, y2, x2) in (sequence,)]
     uv = [(0, 0, 1, 0, 1, 1) for (x1, y1, y2, x2) in (sequence,)]
-    batch = batch_for_shader(sh_2d_uni, 'TRIS', {'pos': qseq, 'uv': uv})
+    batch = get_batch(shader, 'TRIS', {'pos': qseq, 'uv': uv})
     gpu.state.blend_set('ALPHA')
-    sh_2d_uni("color", [*color])
-    batch.draw(sh_2d_uni)
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
 
 
 # def get_batch_from_quads_2d(sequence) -> GPUBatch:
@@ -75,8 +103,9 @@ def draw_quads_2d(sequence, color):
 
 def get_batch_from_quads_2d(sequence) -> GPUBatch:
     """Return the batch for a rectangle from the given coordinates"""
+    shader = uniform_shader.get()
     qseq, = [(x1, y1, y2, x1, y2, x2) for (x1, y1, y2, x2) in (sequence,)]
-    batch = batch_for_shader(sh_2d_uni, 'TRIS', {'pos': qseq})
+    batch = get_batch(shader, 'TRIS', {'pos': qseq})
     return batch
 
 
@@ -96,73 +125,109 @@ def get_batch_from_quads_2d(sequence) -> GPUBatch:
 
 def draw_quads_2d_batch(batch, color):
     """Draw a rectangle batch with the given color"""
+    shader = uniform_shader.get()
     gpu.state.blend_set('ALPHA')
-    sh_2d_uni_bind()
-    sh_2d_uniform_float("color", [*color])
-    batch.draw(sh_2d_uni)
+    shader.bind()
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
 
 
 def draw_lines_from_quad_2d(sequence, color, width=1):
     """Draw the outline of a rectangle from the given coordinates and width"""
+    shader = uniform_shader.get()
     # top/bottom, left/right
     # drawn in pairs of 2
     qseq, = [(tl, bl, bl, br, br, tr, tr, tl) for (tl, tr, br, bl) in (sequence,)]
-    batch = batch_for_shader(sh_2d_uni, 'LINES', {'pos': qseq})
+    batch = get_batch(shader, 'LINES', {'pos': qseq})
     gpu.state.line_width_set(width)
-    sh_2d_uni_bind()
-    sh_2d_uniform_float("color", [*color])
-    batch.draw(sh_2d_uni)
+    shader.bind()
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
 
 
 def get_batch_lines_from_quads_2d(sequence) -> GPUBatch:
     """return the batch of the outline of a rectangle from the given coordinates"""
+    shader = uniform_shader.get()
     # top/bottom, left/right
     # drawn in pairs of 2
     qseq, = [(tl, bl, bl, br, br, tr, tr, tl) for (tl, tr, br, bl) in (sequence,)]
-    batch = batch_for_shader(sh_2d_uni, 'LINES', {'pos': qseq})
+    batch = get_batch(shader, 'LINES', {'pos': qseq})
     return batch
 
 
+def get_batch_from_verts_2d(verts, batch_type="TRIS") -> GPUBatch:
+    """Return a batch from an array of vertices that are already in the right order, e.g. from RectArray.quad_verts"""
+    shader = uniform_shader.get()
+    return get_batch(shader, batch_type, {'pos': verts})
+
+
 def draw_lines_from_quads_2d_batch(batch, color, width):
     """Draw a rectangle line batch with the given color and width"""
+    shader = uniform_shader.get()
     gpu.state.line_width_set(width)
-    sh_2d_uni_bind()
-    sh_2d_uniform_float("color", [*color])
-    batch.draw(sh_2d_uni)
+    shader.bind()
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
 
 
 def draw_lines_uniform(coords, color, width=1):
     """Draw lines from the given coords and color"""
+    shader = uniform_shader.get()
     gpu.state.line_width_set(width)
-    batch = batch_for_shader(sh_2d_uni, 'LINES', {'pos': coords})
-    sh_2d_uni_bind()
-    sh_2d_uniform_float("color", [*color])
-    batch.draw(sh_2d_uni)
+    batch = get_batch(shader, 'LINES', {'pos': coords})
+    shader.bind()
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
     gpu.state.line_width_set(1)
 
 
 def draw_lines_flat(coords, colors, width=1):
     """Draw lines from the given coords and color"""
+    shader = flat_shader.get()
     gpu.state.line_width_set(width)
-    batch = batch_for_shader(sh_2d_flat, 'LINES', {'pos': coords, 'color': colors})
-    sh_2d_flat_bind()
-    batch.draw(sh_2d_flat)
+    batch = get_batch(shader, 'LINES', {'pos': coords, 'color': colors})
+    shader.bind()
+    batch.draw(shader)
     gpu.state.line_width_set(1)
 
 
 def draw_tris_flat(coords, colors):
     """Draw tris from the given coords and color"""
-    batch = batch_for_shader(sh_2d_flat, 'TRIS', {'pos': coords, 'color': colors})
-    sh_2d_flat_bind()
-    batch.draw(sh_2d_flat)
+    shader = flat_shader.get()
+    batch = get_batch(shader, 'TRIS', {'pos': coords, 'color': colors})
+    shader.bind()
+    batch.draw(shader)
 
 
 def draw_tris_uniform(coords, color):
     """Draw tris from the given coords and color"""
-    batch = batch_for_shader(sh_2d_uni, 'TRIS', {'pos': coords})
-    sh_2d_uni_bind()
-    sh_2d_uniform_float("color", [*color])
-    batch.draw(sh_2d_uni)
+    shader = uniform_shader.get()
+    batch = get_batch(shader, 'TRIS', {'pos': coords})
+    shader.bind()
+    shader.uniform_float("color", [*color])
+    batch.draw(shader)
+
+
+@contextmanager
+def clip_to_rect(rect: Rectangle):
+    """Crop everything drawn inside the block to a rectangle in region space"""
+    # The current scissor is the whole region, in window space
+    previous = gpu.state.scissor_get()
+    minx, miny, maxx, maxy = rect.bounds
+    gpu.state.scissor_set(int(previous[0] + minx), int(previous[1] + miny), int(maxx - minx), int(maxy - miny))
+    try:
+        yield
+    finally:
+        gpu.state.scissor_set(*previous)
+
+
+@contextmanager
+def transform_2d(scale, offset):
+    """Scale everything drawn inside the block, and then move it by offset"""
+    with gpu.matrix.push_pop():
+        gpu.matrix.translate(offset)
+        gpu.matrix.scale((scale, scale))
+        yield
 
 
 def get_node_dims(node) -> V:
@@ -323,9 +388,17 @@ def get_active_area(context, mouse_pos, area_type) -> Area:
     return None
 
 
+def get_window_areas(context):
+    """Iterate over the areas of every open window, starting with the current one"""
+    yield from context.screen.areas
+    for window in context.window_manager.windows:
+        if window.screen != context.screen:
+            yield from window.screen.areas
+
+
 def get_area(self, context) -> Area:
-    """Get the area for this node tree"""
-    for area in context.screen.areas:
+    """Get the area for this node tree. It can be in any window, not just the one of the context"""
+    for area in get_window_areas(context):
         if str(area) == self.area:
             return area
     return context.area
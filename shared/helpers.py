@@ -1,14 +1,18 @@
+from __future__ import annotations
 import bpy
-import numpy as np
+import json
 from math import pi
 from statistics import mean
 from dataclasses import dataclass
 from mathutils import Vector as V
-from mathutils.geometry import intersect_point_tri_2d, interpolate_bezier, area_tri
 from bpy.types import NodeTree, Area, Operator
 from time import perf_counter
 from typing import List
 from collections import deque, OrderedDict
+from .resources import LazyModule
+
+# Imported the first time it is used
+np = LazyModule("numpy")
 
 # Console text colours
 WHITE = '\033[37m'
@@ -73,6 +77,154 @@ class Timer():
             print(string)
 
 
+class FrameTimer(Timer):
+    """Timer that splits each frame up into a sequence of named phases, and averages the total time spent in each
+    phase per frame. Only one phase is active at a time, so switching to a nested phase pauses the outer one.
+    Counters can also be added to for each frame, and are averaged in the same way."""
+
+    __slots__ = ["phase", "phase_start", "frame_times", "counters", "frame_counters"]
+
+    def __init__(self, average_of=20):
+        super().__init__(average_of)
+        self.phase = None
+        self.phase_start = 0
+        self.frame_times = {}
+        self.counters = OrderedDict()
+        self.frame_counters = {}
+
+    def switch(self, name):
+        """Stop timing the current phase and start timing a new one. Returns the name of the previous phase."""
+        now = perf_counter()
+        prev = self.phase
+        if prev:
+            self.frame_times[prev] = self.frame_times.get(prev, 0) + now - self.phase_start
+        self.phase = name
+        self.phase_start = now
+        return prev
+
+    def count(self, name, amount=1):
+        """Add to a counter for this frame"""
+        self.frame_counters[name] = self.frame_counters.get(name, 0) + amount
+
+    def end_frame(self):
+        """Add the totals of this frame to the rolling averages.
+        Phases and counters that weren't used this frame are counted as zero."""
+        self.switch(None)
+        for values, frame_values in ((self.end_times, self.frame_times), (self.counters, self.frame_counters)):
+            for name in frame_values.keys() - values.keys():
+                values[name] = deque(maxlen=self.average_of)
+            for name, prev_values in values.items():
+                prev_values.append(frame_values.get(name, 0))
+            frame_values.clear()
+
+    def get_count(self, name):
+        return mean(self.counters[name]) if name in self.counters else 0
+
+    def get_time(self, name):
+        return mean(self.end_times[name]) if name in self.end_times else 0
+
+
+class DummyTimer():
+    """Class that immitates FrameTimer, but doesn't time anything.
+    Used so that timing code can be left in place and cost (almost) nothing when it isn't needed."""
+
+    __slots__ = []
+
+    def start(self, name):
+        return
+
+    def stop(self, name):
+        return
+
+    def switch(self, name):
+        return None
+
+    def count(self, name, amount=1):
+        return
+
+    def end_frame(self):
+        return
+
+
+class TraceRecorder():
+    """Records individual spans of time into a ring buffer, so that the last few thousand can be saved in the
+    Chrome trace event format, and looked at in chrome://tracing or https://ui.perfetto.dev.
+    Unlike Timer, nothing is averaged, so single slow frames can be found.
+    Recording a span is just two perf_counter calls and appending a tuple, so it can be left on while working."""
+
+    __slots__ = ["events", "frame", "origin"]
+
+    def __init__(self, max_events=20000):
+        self.events = deque(maxlen=max_events)
+        self.frame = 0
+        self.origin = perf_counter()
+
+    @property
+    def enabled(self):
+        return True
+
+    @property
+    def max_events(self):
+        return self.events.maxlen
+
+    def begin(self) -> float:
+        """Return the start time of a span, to be passed to end()"""
+        return perf_counter()
+
+    def end(self, name, start, category="minimap", **args):
+        """Record a span from the start time until now. Any keyword arguments are shown in the trace viewer"""
+        self.events.append((name, category, start, perf_counter(), self.frame, args))
+
+    def next_frame(self):
+        self.frame += 1
+
+    def clear(self):
+        self.events.clear()
+
+    def to_dict(self) -> dict:
+        """Convert the recorded spans to the Chrome trace event format"""
+        origin = self.origin
+        trace_events = []
+        for name, category, start, end, frame, args in self.events:
+            trace_events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 1,
+                "tid": 1,
+                "args": dict(args, frame=frame),
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def save(self, filepath):
+        with open(filepath, "w") as f:
+            json.dump(self.to_dict(), f)
+
+
+class DummyTraceRecorder():
+    """Class that immitates TraceRecorder, but doesn't record anything"""
+
+    __slots__ = []
+
+    enabled = False
+    max_events = 0
+    events = ()
+
+    def begin(self):
+        return 0
+
+    def end(self, name, start, category="minimap", **args):
+        return
+
+    def next_frame(self):
+        return
+
+    def clear(self):
+        return
+
+
 class Rectangle():
     """Helper class to represent a rectangle"""
 
@@ -122,6 +274,12 @@ class Rectangle():
     def true_max(self):
         return vec_max(self.min, self.max)
 
+    @property
+    def bounds(self):
+        """Return the true min x, min y, max x and max y as a tuple of floats"""
+        minx, miny, maxx, maxy = self.minx, self.miny, self.maxx, self.maxy
+        return min(minx, maxx), min(miny, maxy), max(minx, maxx), max(miny, maxy)
+
     def __str__(self):
         return f"Rectangle(V({self.minx}, {self.miny}), V({self.maxx}, {self.maxy}))"
 
@@ -163,13 +321,367 @@ class Rectangle():
         self.max = vec_max(self.max, rectangle.min)
 
 
+class RectArray():
+    """Stores any number of rectangles in a single (N, 4) numpy array of min x, min y, max x, max y,
+    so that operations can be done on all of them at once rather than creating new vectors for each one.
+    Like Rectangle, min isn't guaranteed to be less than max, so use the true_ versions when that matters.
+    Indexing returns a RectView, which can be used anywhere that a Rectangle can."""
+
+    __slots__ = ["data"]
+
+    def __init__(self, data=()):
+        self.data = np.array(data, dtype=np.float64).reshape(-1, 4)
+
+    @classmethod
+    def from_rectangles(cls, rectangles: List[Rectangle]) -> "RectArray":
+        return cls([(*r.min[:2], *r.max[:2]) for r in rectangles])
+
+    @classmethod
+    def from_corners(cls, mins, maxs) -> "RectArray":
+        """Create from two (N, 2) arrays of min and max corners"""
+        return cls(np.hstack((np.reshape(mins, (-1, 2)), np.reshape(maxs, (-1, 2)))))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i) -> "RectView":
+        if isinstance(i, slice):
+            return RectArray(self.data[i])
+        return RectView(self, i)
+
+    def __iter__(self):
+        return (RectView(self, i) for i in range(len(self.data)))
+
+    def __repr__(self):
+        return f"RectArray({len(self)} rectangles)"
+
+    @property
+    def mins(self) -> np.ndarray:
+        return self.data[:, :2]
+
+    @property
+    def maxs(self) -> np.ndarray:
+        return self.data[:, 2:]
+
+    @property
+    def true_mins(self) -> np.ndarray:
+        return np.minimum(self.mins, self.maxs)
+
+    @property
+    def true_maxs(self) -> np.ndarray:
+        return np.maximum(self.mins, self.maxs)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return self.maxs - self.mins
+
+    @property
+    def centers(self) -> np.ndarray:
+        return (self.mins + self.maxs) / 2
+
+    def normalized(self) -> "RectArray":
+        """Return a copy where min is always less than max"""
+        return RectArray.from_corners(self.true_mins, self.true_maxs)
+
+    def union(self) -> Rectangle:
+        """Return the rectangle that contains all of the rectangles"""
+        if not len(self):
+            return Rectangle()
+        return Rectangle(self.true_mins.min(axis=0), self.true_maxs.max(axis=0))
+
+    def intersection(self, rect: Rectangle) -> "RectArray":
+        """Return the overlap of each rectangle with another one.
+        Rectangles that don't overlap it end up with a size of 0 or less, so check with intersects() first"""
+        rmin, rmax = _rect_bounds(rect)
+        return RectArray.from_corners(np.maximum(self.true_mins, rmin), np.minimum(self.true_maxs, rmax))
+
+    def intersects(self, rect: Rectangle) -> np.ndarray:
+        """Return a boolean array of which rectangles overlap another one"""
+        rmin, rmax = _rect_bounds(rect)
+        return np.all((self.true_mins <= rmax) & (self.true_maxs >= rmin), axis=1)
+
+    def inside(self, rect: Rectangle) -> np.ndarray:
+        """Return a boolean array of which rectangles are completely inside another one"""
+        rmin, rmax = _rect_bounds(rect)
+        return np.all((self.true_mins >= rmin) & (self.true_maxs <= rmax), axis=1)
+
+    def contains_point(self, point) -> np.ndarray:
+        """Return a boolean array of which rectangles contain a point"""
+        point = np.asarray(point[:2], dtype=np.float64)
+        return np.all((self.true_mins <= point) & (self.true_maxs >= point), axis=1)
+
+    def crop(self, rect: Rectangle):
+        """Crop all rectangles to the inside of another one, in the same way as Rectangle.crop"""
+        rmin = np.asarray(rect.min[:2], dtype=np.float64)
+        rmax = np.asarray(rect.max[:2], dtype=np.float64)
+        self.data[:, :2] = np.minimum(np.maximum(self.mins, rmin), rmax)
+        self.data[:, 2:] = np.maximum(np.minimum(self.maxs, rmax), rmin)
+
+    def scaled(self, scale, origin=(0, 0)) -> "RectArray":
+        """Return a copy scaled around the origin"""
+        origin = np.tile(np.asarray(origin[:2], dtype=np.float64), 2)
+        scale = np.tile(np.broadcast_to(np.asarray(scale, dtype=np.float64), (2, )), 2)
+        return RectArray((self.data - origin) * scale + origin)
+
+    def translated(self, offset) -> "RectArray":
+        """Return a copy moved by the offset"""
+        offset = np.tile(np.broadcast_to(np.asarray(offset, dtype=np.float64), (2, )), 2)
+        return RectArray(self.data + offset)
+
+    def remapped(self, from_area: Rectangle, to_area: Rectangle) -> "RectArray":
+        """Return a copy converted from the space of one rectangle to another, e.g. from node space to minimap space"""
+        from_min = np.asarray(from_area.min[:2], dtype=np.float64)
+        to_min = np.asarray(to_area.min[:2], dtype=np.float64)
+        from_size = np.asarray(from_area.max[:2], dtype=np.float64) - from_min
+        to_size = np.asarray(to_area.max[:2], dtype=np.float64) - to_min
+        scale = np.divide(to_size, from_size, out=np.zeros(2), where=from_size != 0)
+        return self.translated(-from_min).scaled(scale).translated(to_min)
+
+    def corners(self) -> np.ndarray:
+        """Return the four corners of each rectangle in the same order as Rectangle.coords, as an (N, 4, 2) array"""
+        x0, y0, x1, y1 = self.data.T
+        return np.stack((x0, y0, x1, y0, x1, y1, x0, y1), axis=1).reshape(-1, 4, 2)
+
+    def quad_verts(self) -> np.ndarray:
+        """Return the vertices of two triangles for each rectangle, as an (N, 6, 2) array"""
+        return self.corners()[:, [0, 1, 2, 0, 2, 3]].astype(np.float32)
+
+    def line_verts(self) -> np.ndarray:
+        """Return the vertices of the outline of each rectangle as pairs of points, as an (N, 8, 2) array"""
+        return self.corners()[:, [0, 3, 3, 2, 2, 1, 1, 0]].astype(np.float32)
+
+
+class RectView(Rectangle):
+    """A single rectangle in a RectArray. Reading and writing it reads and writes the array directly"""
+
+    __slots__ = ["array", "index"]
+
+    def __init__(self, array: RectArray, index: int):
+        self.array = array
+        self.index = index
+
+    def _get_min(self):
+        return V(self.array.data[self.index, :2])
+
+    def _set_min(self, value):
+        self.array.data[self.index, :2] = value[:2]
+
+    def _get_max(self):
+        return V(self.array.data[self.index, 2:])
+
+    def _set_max(self, value):
+        self.array.data[self.index, 2:] = value[:2]
+
+    min = property(_get_min, _set_min)
+    max = property(_get_max, _set_max)
+    minx = property(fget=lambda self: float(self.array.data[self.index, 0]))
+    miny = property(fget=lambda self: float(self.array.data[self.index, 1]))
+    maxx = property(fget=lambda self: float(self.array.data[self.index, 2]))
+    maxy = property(fget=lambda self: float(self.array.data[self.index, 3]))
+
+    @property
+    def coords(self):
+        """Return coordinates for drawing"""
+        x0, y0, x1, y1 = self.array.data[self.index].tolist()
+        return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+    @property
+    def bounds(self):
+        x0, y0, x1, y1 = self.array.data[self.index].tolist()
+        return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+    def __str__(self):
+        return f"RectView(V({self.minx}, {self.miny}), V({self.maxx}, {self.maxy}))"
+
+
+def _rect_bounds(rect: Rectangle):
+    """Get the true min and max of a rectangle as numpy arrays"""
+    rmin = np.asarray(rect.min[:2], dtype=np.float64)
+    rmax = np.asarray(rect.max[:2], dtype=np.float64)
+    return np.minimum(rmin, rmax), np.maximum(rmin, rmax)
+
+
+class SpatialGrid():
+    """A uniform grid that buckets rectangles by the cells they overlap,
+    so that finding what is under a point is O(1) rather than a loop over every rectangle.
+    Keys can be any hashable object, and are stored alongside their bounds as plain floats
+    to avoid creating new vectors for each test."""
+
+    __slots__ = ["cell_size", "cells", "bounds"]
+
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, key):
+        return key in self.bounds
+
+    def _cell_range(self, minx, miny, maxx, maxy):
+        size = self.cell_size
+        for x in range(int(minx // size), int(maxx // size) + 1):
+            for y in range(int(miny // size), int(maxy // size) + 1):
+                yield x, y
+
+    def insert(self, key, rect: Rectangle):
+        """Add a rectangle to the grid, replacing the previous one if the key already exists"""
+        if key in self.bounds:
+            self.remove(key)
+        bounds = rect.bounds
+        self.bounds[key] = bounds
+        cells = self.cells
+        for cell in self._cell_range(*bounds):
+            bucket = cells.get(cell)
+            if bucket is None:
+                cells[cell] = bucket = set()
+            bucket.add(key)
+
+    def remove(self, key):
+        """Remove a key from the grid if it exists"""
+        bounds = self.bounds.pop(key, None)
+        if bounds is None:
+            return
+        cells = self.cells
+        for cell in self._cell_range(*bounds):
+            bucket = cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+
+    def query_point(self, point) -> list:
+        """Return the keys of all rectangles that contain the point"""
+        x, y = point[0], point[1]
+        size = self.cell_size
+        bucket = self.cells.get((int(x // size), int(y // size)))
+        if not bucket:
+            return []
+        bounds = self.bounds
+        found = []
+        for key in bucket:
+            minx, miny, maxx, maxy = bounds[key]
+            if minx <= x <= maxx and miny <= y <= maxy:
+                found.append(key)
+        return found
+
+    def query_rect(self, rect: Rectangle, contained=False) -> set:
+        """Return the keys of all rectangles that overlap the given one.
+        If contained is True, only return those that are completely inside it"""
+        qminx, qminy, qmaxx, qmaxy = rect.bounds
+        cells = self.cells
+        candidates = set()
+        for cell in self._cell_range(qminx, qminy, qmaxx, qmaxy):
+            bucket = cells.get(cell)
+            if bucket:
+                candidates.update(bucket)
+
+        bounds = self.bounds
+        found = set()
+        for key in candidates:
+            minx, miny, maxx, maxy = bounds[key]
+            if contained:
+                if qminx <= minx and maxx <= qmaxx and qminy <= miny and maxy <= qmaxy:
+                    found.add(key)
+            elif minx <= qmaxx and qminx <= maxx and miny <= qmaxy and qminy <= maxy:
+                found.add(key)
+        return found
+
+
+class LRUCache():
+    """A cache that keeps the most recently used values, and removes the least recently used ones when the total size
+    of all values goes over max_size. The size of each value is given when it is added, e.g. the number of nodes.
+    on_evict is called with the key and value of everything that is removed by the cache itself, rather than by pop"""
+
+    __slots__ = ["max_size", "values", "sizes", "total_size", "on_evict"]
+
+    def __init__(self, max_size, on_evict=None):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.sizes = {}
+        self.total_size = 0
+        self.on_evict = on_evict
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        """Get a value, marking it as the most recently used"""
+        if key not in self.values:
+            return default
+        self.values.move_to_end(key)
+        return self.values[key]
+
+    def put(self, key, value, size=1):
+        """Add a value, and remove the least recently used ones if there's now too much in the cache.
+        Values bigger than max_size aren't added at all"""
+        self.pop(key)
+        if size > self.max_size:
+            if self.on_evict:
+                self.on_evict(key, value)
+            return
+        self.values[key] = value
+        self.sizes[key] = size
+        self.total_size += size
+        self.evict()
+
+    def pop(self, key, default=None):
+        """Remove and return a value"""
+        if key not in self.values:
+            return default
+        self.total_size -= self.sizes.pop(key)
+        return self.values.pop(key)
+
+    def evict(self):
+        while self.total_size > self.max_size and self.values:
+            self.evict_oldest()
+
+    def evict_oldest(self):
+        """Remove the least recently used value"""
+        key = next(iter(self.values))
+        value = self.pop(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def resize(self, max_size):
+        self.max_size = max_size
+        self.evict()
+
+    def remove_where(self, predicate):
+        """Remove every value whose key matches the predicate"""
+        for key in [key for key in self.values if predicate(key)]:
+            value = self.pop(key)
+            if self.on_evict:
+                self.on_evict(key, value)
+
+    def clear(self):
+        if self.on_evict:
+            for key, value in self.values.items():
+                self.on_evict(key, value)
+        self.values.clear()
+        self.sizes.clear()
+        self.total_size = 0
+
+
 class Polygon():
-    """Helper class to represent a polygon of n points"""
+    """Helper class to represent a polygon of n points.
+    The vertices are also stored as a numpy array, and the results of the more expensive operations (center,
+    tessellation, bevelling) are cached until the vertices are changed."""
 
-    __slots__ = ["_verts", "color", "active", "tri_len"]
+    __slots__ = ["_verts", "_array", "_cache", "color", "active", "tri_len"]
 
     def __init__(self, verts: list[V] = []):
         self.verts: list[V]
+        self._cache = {}
         self.verts = verts
         self.tri_len = 0
 
@@ -179,148 +691,161 @@ class Polygon():
 
     @verts.setter
     def verts(self, points):
-        if not points:
+        if not len(points):
             return
-        points = [V(p) for p in points]
-        self._verts = points
+        self._array = np.array([tuple(p)[:2] for p in points], dtype=np.float64)
+        self._verts = [V(p) for p in points]
+        self._cache.clear()
+
+    @property
+    def array(self) -> np.ndarray:
+        """The vertices as an (N, 2) array"""
+        return getattr(self, "_array", np.zeros((0, 2)))
+
+    def _cached(self, key, func):
+        cache = self._cache
+        if key not in cache:
+            cache[key] = func()
+        return cache[key]
 
     def center(self) -> V:
         """Get the centeroid of this polygon (mean of all points)"""
-        arr = np.array(list(tuple(v) for v in self.verts))
-        length = arr.shape[0]
-        sum_x = np.sum(arr[:, 0])
-        sum_y = np.sum(arr[:, 1])
-        final = V((sum_x / length, sum_y / length))
-        return final
+        return V(self._cached("center", lambda: self.array.mean(axis=0)))
 
     def bounds(self) -> Rectangle:
         """Return a rectangle representing the bounding box of the polygon"""
-        # TODO: If I ever use this a lot, convert to numpy
-        verts = self.verts
-        v_min = V(100000, 100000)
-        v_max = V(-100000, -100000)
-        for v in verts:
-            v_min = vec_min(v_min, v)
-            v_max = vec_max(v_max, v)
-        return Rectangle(v_min, v_max)
+        arr = self.array
+        if not len(arr):
+            return Rectangle((100000, 100000), (-100000, -100000))
+        return Rectangle(arr.min(axis=0), arr.max(axis=0))
 
     def is_inside(self, point: V) -> bool:
-        """Check if a point is inside this polygon"""
-        verts = self.verts
-        # center = verts[0]
-        center = self.center()
-        for i, vert in enumerate(verts):
-            if intersect_point_tri_2d(point, vert, verts[i - 1], center):
-                return True
-        return False
-
-    def as_tris(self, individual:bool = False) -> list[V]:
+        """Check if a point is inside this polygon, by testing it against a fan of triangles around the center"""
+        arr = self.array
+        if not len(arr):
+            return False
+        center = self._cached("center", lambda: arr.mean(axis=0))
+        p = np.asarray(point[:2], dtype=np.float64)
+        a = arr
+        b = np.roll(arr, 1, axis=0)
+
+        def side(p1, p2, p3):
+            return (p1[..., 0] - p3[..., 0]) * (p2[..., 1] - p3[..., 1]) -\
+                (p2[..., 0] - p3[..., 0]) * (p1[..., 1] - p3[..., 1])
+
+        d1 = side(p, a, b)
+        d2 = side(p, b, center)
+        d3 = side(p, center, a)
+        has_neg = (d1 < 0) | (d2 < 0) | (d3 < 0)
+        has_pos = (d1 > 0) | (d2 > 0) | (d3 > 0)
+        return bool(np.any(~(has_neg & has_pos)))
+
+    def tris_array(self) -> np.ndarray:
+        """Return the tris making up this polygon (a fan around the first point) as an (N * 3, 2) float32 array,
+        ready to be used as a vertex buffer"""
+
+        def tessellate():
+            arr = self.array
+            first = np.broadcast_to(arr[:1], arr.shape)
+            return np.stack((arr, np.roll(arr, 1, axis=0), first), axis=1).reshape(-1, 2).astype(np.float32)
+
+        return self._cached("tris", tessellate)
+
+    def lines_array(self) -> np.ndarray:
+        """Return the outline of this polygon as pairs of points, as an (N * 2, 2) float32 array"""
+
+        def outline():
+            arr = self.array
+            return np.stack((arr, np.roll(arr, 1, axis=0)), axis=1).reshape(-1, 2).astype(np.float32)
+
+        return self._cached("lines", outline)
+
+    def as_tris(self, individual: bool = False) -> list[V]:
         """Return the tris making up this polygon"""
-        verts = self.verts
-        if not verts:
+        if not self.verts:
             return []
-        points = []
-        add = points.append if individual else points.extend
-        center = verts[0]
-        for i, vert in enumerate(verts):
-            add([vert, self.verts[i - 1], center])
-        self.tri_len = len(points)
-        return points
+        tris = [V(p) for p in self.tris_array().tolist()]
+        if individual:
+            tris = [tris[i:i + 3] for i in range(0, len(tris), 3)]
+        self.tri_len = len(tris)
+        return tris
 
     def as_lines(self, individual=False) -> list[list[V]]:
         """Return the lines making up the outline of this polygon as a single list"""
-        # TODO: optimise by using slices
-        points = []
-        add = points.append if individual else points.extend
-        verts = self.verts
-        for i, v1 in enumerate(verts):
-            add([v1, self.verts[i - 1]])
-        return points
+        lines = [V(p) for p in self.lines_array().tolist()]
+        if individual:
+            lines = [lines[i:i + 2] for i in range(0, len(lines), 2)]
+        return lines
 
     def area(self) -> float:
         """Return the total area of this polygon"""
-        area = 0
-        for tri in self.as_tris(individual=True):
-            area += area_tri(tri[0], tri[1], tri[2])
-        return area
+        tris = self.tris_array().astype(np.float64).reshape(-1, 3, 2)
+        a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+        cross = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        return float(np.abs(cross).sum() / 2)
 
     def normals(self) -> list[V]:
         """Return a list containing the normal direction of each point"""
-        verts = self.verts
-        normals = []
-        append = normals.append
-        for i, v in enumerate(verts):
-            v_prev = verts[i - 1]
-            v_next = verts[(i + 1) % (len(verts))]
-
-            from_prev = (v - v_prev).normalized()
-            from_next = (v - v_next).normalized()
-            append((from_prev + from_next).normalized())
-        return normals
+        arr = self.array
+        from_prev = _normalized(arr - np.roll(arr, 1, axis=0))
+        from_next = _normalized(arr - np.roll(arr, -1, axis=0))
+        return [V(n) for n in _normalized(from_prev + from_next).tolist()]
 
     def distance_to_edges(self, point: V, edges: List[List[V]] = None) -> float:
         """Get the minimum distance of a point from a list of edges.
         Code adapted from from: https://www.fundza.com/vectors/point2line/index.html"""
-        edges = edges if edges else self.as_lines(individual=True)
-        distances = []
-        append = distances.append
-        for edge in edges:
-            start = edge[0]
-            end = edge[1]
-
-            line_vec = start - end
-            pnt_vec = start - point
-            line_len = line_vec.length
-            line_unitvec = line_vec.normalized()
-
-            try:
-                pnt_vec_scaled = pnt_vec * 1.0 / line_len
-            except ZeroDivisionError:
-                continue
-            t = line_unitvec.dot(pnt_vec_scaled)
-            t = max(0, min(1, t))
-
-            nearest = line_vec * t
-            dist = (nearest - pnt_vec).length
-            append(dist)
-        if distances:
-            return min(distances)
+        if edges:
+            edges = np.array([[tuple(v)[:2] for v in edge] for edge in edges], dtype=np.float64)
         else:
+            edges = self.lines_array().astype(np.float64).reshape(-1, 2, 2)
+        line_vecs = edges[:, 0] - edges[:, 1]
+        pnt_vecs = edges[:, 0] - np.asarray(point[:2], dtype=np.float64)
+        line_lens_sq = np.einsum("ij,ij->i", line_vecs, line_vecs)
+        valid = line_lens_sq > 0
+        if not np.any(valid):
             return 700000000
+        line_vecs = line_vecs[valid]
+        pnt_vecs = pnt_vecs[valid]
+        t = np.clip(np.einsum("ij,ij->i", line_vecs, pnt_vecs) / line_lens_sq[valid], 0, 1)
+        nearest = line_vecs * t[:, None]
+        return float(np.min(np.linalg.norm(nearest - pnt_vecs, axis=1)))
 
-    def bevelled(self, radius=15, min_res=3, max_res=6):
+    def bevelled(self, radius=15, min_res=3, max_res=6) -> "Polygon":
         """Smooth the corners by using bezier interpolation between the last point,
         the current point and the next point."""
-        bevelled = []
-        verts = self.verts
-        extend = bevelled.extend
-        for i, vert in enumerate(verts):
-            vert = V(vert)
-            prev_vert = V(verts[i - 1])
-            next_vert = V(verts[(i + 1) % len(verts)])
-
-            to_prev = prev_vert - vert
-            to_next = next_vert - vert
-
-            # make prev and next vert a set distance away from the current vert
-            # in effect, this controls the size of the smoothing
-            prev_vert = to_prev.normalized() * min(radius, to_prev.length / radius) + vert
-            next_vert = to_next.normalized() * min(radius, to_next.length / radius) + vert
-
-            # Use fewer vertices on angles that need it less
-            try:
-                angle = to_prev.angle(to_next)
-            except ValueError:
-                # This happens very rarely when there is a zero length vector
-                print("zero length")
-                continue
-            res = int(map_range(pi - angle, from_min=0, from_max=pi / 2, to_min=min_res, to_max=max_res))
-
-            # interpolate points
-            points = interpolate_bezier(prev_vert, vert, vert, next_vert, res)
-            extend(points)
-
-        return Polygon(bevelled)
+        return self._cached(("bevelled", radius, min_res, max_res), lambda: self._bevel(radius, min_res, max_res))
+
+    def _bevel(self, radius, min_res, max_res) -> "Polygon":
+        arr = self.array
+        if not len(arr):
+            return Polygon()
+        to_prev = np.roll(arr, 1, axis=0) - arr
+        to_next = np.roll(arr, -1, axis=0) - arr
+        prev_len = np.linalg.norm(to_prev, axis=1)
+        next_len = np.linalg.norm(to_next, axis=1)
+        # Corners with a zero length edge don't have an angle, so they are skipped
+        valid = (prev_len > 0) & (next_len > 0)
+
+        # make prev and next vert a set distance away from the current vert
+        # in effect, this controls the size of the smoothing
+        prev_verts = _normalized(to_prev) * np.minimum(radius, prev_len / radius)[:, None] + arr
+        next_verts = _normalized(to_next) * np.minimum(radius, next_len / radius)[:, None] + arr
+
+        # Use fewer vertices on angles that need it less
+        cos = np.einsum("ij,ij->i", to_prev, to_next) / np.where(valid, prev_len * next_len, 1)
+        angles = np.arccos(np.clip(cos, -1, 1))
+        resolutions = map_range(pi - angles, from_min=0, from_max=pi / 2, to_min=min_res, to_max=max_res).astype(int)
+
+        # interpolate points. Both bezier handles are at the corner, so the curve simplifies to
+        # u^3 * prev + 3ut * corner + t^3 * next
+        points = []
+        for i in np.flatnonzero(valid):
+            t = np.linspace(0, 1, max(resolutions[i], 1))[:, None]
+            u = 1 - t
+            points.append(u**3 * prev_verts[i] + 3 * u * t * arr[i] + t**3 * next_verts[i])
+        if not points:
+            return Polygon()
+        return Polygon(np.concatenate(points))
 
     def __str__(self):
         return f"Polygon({self.verts})"
@@ -329,6 +854,12 @@ class Polygon():
         return self.__str__()
 
 
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    """Normalize an (N, 2) array of vectors, leaving zero length vectors as zero"""
+    lengths = np.linalg.norm(vectors, axis=1)[:, None]
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors, dtype=np.float64), where=lengths != 0)
+
+
 @dataclass
 class Op():
     """A decorator for defining blender Operators that helps to cut down on boilerplate code,
@@ -511,26 +1042,38 @@ def get_uid(other_uids):
 
 
 def get_active_tree(context, area=None) -> NodeTree:
-    """Get nodes from currently edited tree.
+    """Get the tree currently being edited in the area (or the context area).
     If user is editing a group, space_data.node_tree is still the base level (outside group).
-    context.active_node is in the group though, so if space_data.node_tree.nodes.active is not
-    the same as context.active_node, the user is in a group.
-    source: node_wrangler.py"""
+    The breadcrumbs in space_data.path are stored separately for each editor, so the last one is used if there is one,
+    which is correct even if two editors show the same tree at different group depths."""
+    space = context.space_data if not area else area.spaces[0]
+    path = getattr(space, "path", None)
+    if path:
+        return path[-1].node_tree
+    tree = space.node_tree
+    for name in get_active_group_path(context, tree):
+        tree = tree.nodes[name].node_tree
+    return tree
 
-    if not area:
-        tree = context.space_data.node_tree
-    else:
-        tree = area.spaces[0].node_tree
 
+def get_active_group_path(context, tree) -> List[str]:
+    """Get the names of the group nodes that lead from the tree to the one being edited, by following the active nodes.
+    If user is editing a group, context.active_node is in the group, so if tree.nodes.active is not
+    the same as context.active_node, the user is in a group.
+    source: node_wrangler.py"""
+    names = []
     if tree.nodes.active:
         # Check recursively until we find the real active node_tree
         # This wont work if there are two editors open with the same node tree so that a node that is not the
         # correct group can be selected. In that case, simply the deepest node tree will be returned
-        while (tree.nodes.active != context.active_node) and tree.nodes.active.type == "GROUP":
+        active_node = context.active_node
+        while (tree.nodes.active != active_node) and tree.nodes.active.type == "GROUP":
+            names.append(tree.nodes.active.name)
             tree = tree.nodes.active.node_tree
-            continue
+            if not tree or not tree.nodes.active:
+                break
 
-    return tree
+    return names
 
 
 def get_alt_node_tree_name(node_tree) -> str:
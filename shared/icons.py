@@ -1,22 +1,49 @@
 from pathlib import Path
 from bpy.utils import previews
+from .resources import register_resource
 
-icon_collections = {}
-pcolls = []
 
+class DummyIcon():
+    """Used in background mode, where the icons are never drawn, so don't need to be loaded"""
 
-# Add a button to the header
-def register():
-    global icon_collections
+    icon_id = 0
+
+
+class DummyIconCollection(dict):
+
+    def __missing__(self, key):
+        return DummyIcon()
+
+
+class LazyIconCollection():
+    """Stands in for the icon preview collection, and only loads the icons when one is first accessed"""
+
+    def __getitem__(self, key):
+        return icons_resource.get()[key]
 
+    def __contains__(self, key):
+        return key in icons_resource.get()
+
+
+def load_icons():
     # load icons
     path = Path(__file__).parents[1]
     pcoll = previews.new()
     # match all subdirectories named icons and load all pngs in them
     for file in list(path.glob("*/icons/*.png")):
         pcoll.load(file.name, str(file), "IMAGE")
-    icon_collections["icons"] = pcoll
     pcolls.append(pcoll)
+    return pcoll
+
+
+icons_resource = register_resource("icons", load_icons, DummyIconCollection)
+icon_collections = {"icons": LazyIconCollection()}
+pcolls = []
+
+
+def register():
+    # The icons themselves are loaded when they are first used
+    icons_resource.reset()
 
 
 def unregister():
@@ -26,4 +53,6 @@ def unregister():
         try:
             previews.remove(pcoll)
         except KeyError:
-            pass
\ No newline at end of file
+            pass
+    pcolls.clear()
+    icons_resource.reset()
@@ -0,0 +1,117 @@
+"""
+Caches what auto_load and preferences.py find when they search the addon for things to register, so that on later
+startups the modules and classes can be imported directly, without walking the package, inspecting every class and
+resolving type hints to work out the registration order.
+
+The manifest stores the names of the files in each package folder, and the modification time and size of each module,
+and is ignored (and then rewritten) whenever any of them change.
+"""
+import os
+import bpy
+import json
+import tempfile
+import importlib
+from pathlib import Path
+
+VERSION = 1
+ADDON_DIR = Path(__file__).parents[1]
+PACKAGE = __package__.split(".")[0]
+MANIFEST_PATH = ADDON_DIR / "registration_manifest.json"
+
+# The manifest loaded this session, if there was a valid one
+loaded = None
+
+# How long registration took, shown in the preferences
+stats = {"used_manifest": False, "time": 0, "discovery_time": 0}
+
+
+def get_module_path(name) -> Path:
+    """Get the file of a module from its name relative to the addon package"""
+    path = ADDON_DIR.joinpath(*name.split("."))
+    if path.is_dir():
+        return path / "__init__.py"
+    return path.with_suffix(".py")
+
+
+def get_fingerprint(module_names) -> dict:
+    """Get the modification time and size of each module, and the names of the files in each folder that contains
+    a module, so that changed, new and removed modules can all be detected"""
+    paths = [get_module_path(name) for name in module_names]
+    fingerprint = {}
+    for folder in sorted({path.parent for path in paths} | {ADDON_DIR}):
+        with os.scandir(folder) as entries:
+            names = sorted(
+                e.name for e in entries if e.name.endswith(".py") or (e.is_dir() and e.name != "__pycache__"))
+        fingerprint[folder.relative_to(ADDON_DIR).as_posix() + "/"] = names
+    for path in paths:
+        stat = path.stat()
+        fingerprint[path.relative_to(ADDON_DIR).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+    return fingerprint
+
+
+def get_relative_name(name: str) -> str:
+    """Remove the addon package from the start of a module name"""
+    return name[len(PACKAGE) + 1:] if name.startswith(PACKAGE + ".") else name
+
+
+def import_class(module_name, class_name):
+    return getattr(importlib.import_module("." + module_name, PACKAGE), class_name)
+
+
+def load():
+    """Load the manifest, returning None if it doesn't exist or is out of date"""
+    global loaded
+    loaded = None
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version") != VERSION or data.get("blender") != list(bpy.app.version):
+        return None
+    try:
+        if data["fingerprint"] != get_fingerprint(data["modules"]):
+            return None
+    except (OSError, KeyError):
+        return None
+    loaded = data
+    return data
+
+
+def save(modules, classes, pref_classes, discovery_time):
+    """Save the result of discovering the modules and classes to register.
+    If the addon folder can't be written to, nothing is saved, and discovery is just done every time.
+    It is written to a temporary file that then replaces the manifest, so that it is never seen half written."""
+    module_names = [get_relative_name(m.__name__) for m in modules]
+    data = {
+        "version": VERSION,
+        "blender": list(bpy.app.version),
+        "modules": module_names,
+        "classes": [[get_relative_name(cls.__module__), cls.__qualname__] for cls in classes],
+        "prefs": [[get_relative_name(cls.__module__), cls.__qualname__] for cls in pref_classes],
+        "discovery_time": discovery_time,
+        "fingerprint": get_fingerprint(module_names),
+    }
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix=MANIFEST_PATH.name, suffix=".tmp", dir=ADDON_DIR)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(temp_path, MANIFEST_PATH)
+    except OSError:
+        if temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def remove():
+    """Delete the manifest, so that discovery is done again next time"""
+    global loaded
+    loaded = None
+    try:
+        MANIFEST_PATH.unlink()
+    except OSError:
+        pass
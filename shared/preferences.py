@@ -3,6 +3,7 @@ import importlib
 import inspect
 from pathlib import Path
 from bpy.props import EnumProperty
+from . import manifest
 from .icons import icon_collections
 
 PACKAGE = __package__.split(".")[0]
@@ -11,16 +12,21 @@ PACKAGE = __package__.split(".")[0]
 # so that they can be inherited from by the main prefs.
 all_prefs = []
 addon_dir = Path(__file__).parents[1]
-pref_files = addon_dir.glob("*/*_prefs.py")  # preferences files need to end with "_prefs.py"
-
-for file in pref_files:
-    # convert file path to import path. There's probably a better way to do this.
-    import_path = file.as_posix().split(PACKAGE)[-1].replace("/", ".").replace(".py", "")
-    mod = importlib.import_module(import_path, PACKAGE)
-    classes = inspect.getmembers(mod, inspect.isclass)  # Get all classes from the imported module.
-    for name, cls in classes:
-        if "prefs" in name.lower():  # preferences class names must have "prefs" in them
-            all_prefs.append(cls)
+
+if manifest.loaded:
+    # The classes found last time, if nothing has changed since then
+    all_prefs = [manifest.import_class(*names) for names in manifest.loaded["prefs"]]
+else:
+    pref_files = addon_dir.glob("*/*_prefs.py")  # preferences files need to end with "_prefs.py"
+
+    for file in pref_files:
+        # convert file path to import path. There's probably a better way to do this.
+        import_path = file.as_posix().split(PACKAGE)[-1].replace("/", ".").replace(".py", "")
+        mod = importlib.import_module(import_path, PACKAGE)
+        classes = inspect.getmembers(mod, inspect.isclass)  # Get all classes from the imported module.
+        for name, cls in classes:
+            if "prefs" in name.lower():  # preferences class names must have "prefs" in them
+                all_prefs.append(cls)
 
 
 # Inherit from all preferences defined by sub addons
@@ -0,0 +1,81 @@
+"""
+A small registry of things that are slow to create, and that often aren't needed at all (shaders, icons, numpy).
+Each one is only created the first time it's used, rather than when the addon is imported, so that things like
+command line renders with the addon enabled don't pay for them.
+
+Resources can also have a fallback, which is used instead in background mode, where nothing is ever drawn.
+"""
+import importlib
+
+try:
+    import bpy
+    BACKGROUND = bpy.app.background
+except ImportError:
+    # Allow modules that don't need blender (e.g. node_minimap/layout.py) to be used outside of it
+    BACKGROUND = False
+
+resources = {}
+
+
+class Resource():
+    """A value that is created on first use"""
+
+    __slots__ = ["name", "create", "fallback", "value", "is_loaded"]
+
+    def __init__(self, name, create, fallback=None):
+        self.name = name
+        self.create = create
+        self.fallback = fallback
+        self.value = None
+        self.is_loaded = False
+
+    def get(self):
+        if not self.is_loaded:
+            if BACKGROUND and self.fallback is not None:
+                self.value = self.fallback()
+            else:
+                self.value = self.create()
+            self.is_loaded = True
+        return self.value
+
+    def reset(self):
+        """Forget the value, so that it's created again next time it's used"""
+        self.value = None
+        self.is_loaded = False
+
+    def __repr__(self):
+        return f"Resource({self.name}, {'loaded' if self.is_loaded else 'not loaded'})"
+
+
+def register_resource(name, create, fallback=None) -> Resource:
+    """Add a resource to the registry. create (and fallback) are called with no arguments when it's first used"""
+    resource = Resource(name, create, fallback)
+    resources[name] = resource
+    return resource
+
+
+def get_resource(name):
+    return resources[name].get()
+
+
+def get_loaded_resources() -> list[str]:
+    """Get the names of all resources that have been created so far"""
+    return [name for name, resource in resources.items() if resource.is_loaded]
+
+
+def reset_resources():
+    for resource in resources.values():
+        resource.reset()
+
+
+class LazyModule():
+    """Stands in for a module, and only imports it when one of its attributes is first used.
+    Attributes are then stored on this object, so later uses are just a normal attribute lookup."""
+
+    def __init__(self, name):
+        self._resource = resources.get(name) or register_resource(name, lambda: importlib.import_module(name))
+
+    def __getattr__(self, attr):
+        value = getattr(self._resource.get(), attr)
+        setattr(self, attr, value)
+        return value